@@ -0,0 +1,313 @@
+"""HTTP/JSON answering API next to the Streamlit UI.
+
+    python answer_api.py --port 8080
+    python answer_api.py --port 8080 --processes 4   # pre-fork workers
+
+Endpoints:
+
+* ``POST /answer``        ``{"query": "..."}`` -> one result
+* ``POST /answer/batch``  ``{"queries": ["...", ...]}`` -> ``{"results": [...]}``
+* ``GET  /healthz``       200 as soon as the server accepts connections
+* ``GET  /readyz``        200 once the model and KB index are loaded, 503 before
+* ``GET  /metrics``       per-step and per-stage latency histograms, Prometheus
+                          text format (per worker process)
+
+The server is a single asyncio event loop (stdlib only, HTTP/1.1 keep-alive).
+Matching runs in a thread pool so the loop never blocks, query encodes go
+through one shared micro-batching ``EncoderService``, and every request reads
+the current snapshot of one in-process ``KnowledgeBaseStore``, which hot
+reloads like the apps do. Results carry the stage, the answer text (fuzzy and
+semantic matches), the KB row id, the score and the KB version; for a query
+the fuzzy stage does not answer, ``/answer`` also returns up to ``TOP_K``
+fused lexical + semantic candidates.
+
+With ``--processes N`` the parent compiles the KB bundle once and starts N
+worker processes that listen on the same port (``SO_REUSEPORT``, Linux).
+Each worker memory-maps that bundle read-only, so the KB text arrays,
+embeddings and brute-force index live once in the page cache and an extra
+worker costs only its own model.
+
+``--encoder-backend onnx`` / ``onnx-int8`` encode with ONNX Runtime from the
+model exported to ``--model-dir`` (see ``export_encoder.py``); the KB
+embeddings are then built with that backend too.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from engine import METRICS, EncoderService, KnowledgeBaseStore, QueryCache, cached, match_batch, match_query
+from engine.embedding_cache import EmbeddingCache
+from engine.encoders import ENCODER_BACKENDS, TORCH, encoder_cache_key, load_encoder
+from engine.kb_bundle import compile_bundle, current_build, is_fresh
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_QUERIES = 1000
+KB_RELOAD_INTERVAL_S = 5.0
+QUERY_CACHE_SIZE = 4096
+QUERY_CACHE_TTL_S = 600.0
+TOP_K = 5  # fused "did you mean" candidates returned by /answer
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AnswerService:
+    """Owns the model, encoder service and KB store; loads them off the event loop."""
+
+    def __init__(self, kb_path, model_name, cache_dir, load_model=None, index_backend='brute', workers=4,
+                 encoder_backend=TORCH, model_dir=None):
+        self.kb_path = kb_path
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.cache_key = encoder_cache_key(model_name, encoder_backend)
+        self.load_model = load_model or partial(load_encoder, backend=encoder_backend, model_dir=model_dir)
+        self.index_backend = index_backend
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='answer')
+        self.store = None
+        self.encoder = None
+        self.load_error = None
+        self._respond = cached(QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_S), match_query)
+
+    @property
+    def ready(self):
+        return self.store is not None
+
+    def load(self):
+        try:
+            model = self.load_model(self.model_name)
+            self.encoder = EncoderService(model.encode)
+            store = KnowledgeBaseStore(self.kb_path, model.encode, self.cache_key, self.cache_dir,
+                                       index_backend=self.index_backend)
+            store.start_watching(KB_RELOAD_INTERVAL_S)
+            self.store = store
+        except Exception as e:
+            logger.exception("Failed to load the knowledge base")
+            self.load_error = str(e)
+
+    def _result(self, query, snapshot, match):
+        answer = None
+        if match.answered:
+            with METRICS.timed('answer'):
+                answer = snapshot.answer(match.row)
+        return {
+            'query': query,
+            'stage': match.stage,
+            'answer': answer,
+            'answer_id': match.row,
+            'score': match.score,
+            'greeting': match.greeting,
+            'kb_version': snapshot.version,
+            'candidates': [{'answer_id': c.row, 'question': snapshot.knowledge_base.question(c.row), 'score': c.score,
+                            'lexical': c.lexical, 'similarity': c.similarity} for c in match.candidates],
+        }
+
+    def answer(self, query):
+        snapshot = self.store.current
+        return self._result(query, snapshot, self._respond(query, snapshot, self.encoder.encode, TOP_K))
+
+    def answer_batch(self, queries):
+        snapshot = self.store.current
+        matches = match_batch(queries, snapshot, self.encoder.encode)
+        return [self._result(q, snapshot, m) for q, m in zip(queries, matches)]
+
+
+def _query_text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, "Queries must be non-empty strings")
+    return value
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b''
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return method, target.split('?', 1)[0], body, keep_alive
+
+
+def _encode_response(status, payload, keep_alive):
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+    else:
+        body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+class AnswerServer:
+    def __init__(self, service):
+        self.service = service
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.service.executor, fn, *args)
+
+    async def route(self, method, path, body):
+        service = self.service
+        if path == '/healthz':
+            return 200, {'status': 'ok'}
+        if path == '/readyz':
+            if service.ready:
+                return 200, {'status': 'ready', 'kb_version': service.store.version}
+            if service.load_error:
+                return 503, {'status': 'failed', 'error': service.load_error}
+            return 503, {'status': 'loading'}
+        if path == '/metrics':
+            return 200, METRICS.render_prometheus()
+        if path not in ('/answer', '/answer/batch'):
+            raise HTTPError(404, f"No route for {path}")
+        if method != 'POST':
+            raise HTTPError(405, f"{path} only accepts POST")
+        if not service.ready:
+            raise HTTPError(503, "Knowledge base is still loading")
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        start = time.perf_counter()
+        if path == '/answer':
+            result = await self._run(service.answer, _query_text(payload.get('query')))
+            METRICS.observe_response(time.perf_counter() - start)
+        else:
+            queries = payload.get('queries')
+            if not isinstance(queries, list):
+                raise HTTPError(400, "'queries' must be a list")
+            if len(queries) > MAX_BATCH_QUERIES:
+                raise HTTPError(413, f"At most {MAX_BATCH_QUERIES} queries per batch")
+            result = {'results': await self._run(service.answer_batch, [_query_text(q) for q in queries])}
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1e3, 3)
+        return 200, result
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, path, body, keep_alive = request
+                    status, payload = await self.route(method, path, body)
+                except HTTPError as e:
+                    status, payload, keep_alive = e.status, {'error': str(e)}, False
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception:
+                    logger.exception("Unhandled error while answering")
+                    status, payload, keep_alive = 500, {'error': "Internal error"}, False
+                writer.write(_encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host, port, reuse_port=False):
+        server = await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port or None)
+        # Accept connections (and answer /healthz, /readyz) while the model and index load.
+        threading.Thread(target=self.service.load, name='answer-api-load', daemon=True).start()
+        return server
+
+
+async def serve(service, host, port, reuse_port=False):
+    server = await AnswerServer(service).start(host, port, reuse_port)
+    logger.info("Listening on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+    async with server:
+        await server.serve_forever()
+
+
+def prepare_bundle(kb_path, model_name, cache_dir, encoder_backend=TORCH, model_dir=None):
+    """Compile the KB bundle up front so pre-forked workers only attach to it."""
+    bundle_dir = os.path.join(cache_dir, 'bundle')
+    cache_key = encoder_cache_key(model_name, encoder_backend)
+    _, manifest = current_build(bundle_dir)
+    if not is_fresh(manifest, kb_path, cache_key):
+        model = load_encoder(model_name, encoder_backend, model_dir)
+        compile_bundle(kb_path, bundle_dir, model.encode, EmbeddingCache(cache_dir, cache_key))
+
+
+def _serve_worker(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(processName)s: %(message)s")
+    service = AnswerService(args.kb, args.model, args.cache_dir, index_backend=args.index_backend,
+                            workers=args.workers, encoder_backend=args.encoder_backend, model_dir=args.model_dir)
+    try:
+        asyncio.run(serve(service, args.host, args.port, reuse_port=args.processes > 1))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve knowledge-base answers over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--kb', default='dataset.xlsx')
+    parser.add_argument('--cache-dir', default='.kb_cache')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--encoder-backend', choices=ENCODER_BACKENDS, default=TORCH)
+    parser.add_argument('--model-dir', help="exported model for the onnx encoder backends")
+    parser.add_argument('--index-backend', default='brute')
+    parser.add_argument('--workers', type=int, default=4, help="threads running the matching stages")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes sharing the port and KB bundle")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        return _serve_worker(args)
+    prepare_bundle(args.kb, args.model, args.cache_dir, args.encoder_backend, args.model_dir)
+    # Spawn rather than fork: the parent may hold a model and its threads.
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_serve_worker, args=(args,), name=f'answer-api-{i}')
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Headless bulk answering: replay queries from CSV/JSONL against the knowledge base.
+
+    python batch_answer.py tickets.csv --out answers.csv
+
+Input is read and answered in chunks of ``--batch-size`` rows, so memory
+stays flat however large the file is. Every query goes through the same
+``engine.pipeline`` stages as in the apps, via ``match_batch``: the queries
+of a chunk that reach the semantic stage are encoded in one model call and
+searched with one ``kneighbors`` call.
+
+Each output row has the query id, the stage that answered it (``gibberish``,
+``greeting``, ``fuzzy``, ``semantic`` or ``fallback`` when the nearest
+question is too far), the KB row id of the answer, the score (token-sort
+ratio for fuzzy, cosine similarity for semantic/fallback) and the latency.
+Semantic rows are charged an equal share of their chunk's encode + search
+time.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from engine import STAGES, KnowledgeBaseStore, match_batch
+from engine.encoders import ENCODER_BACKENDS, TORCH, encoder_cache_key, load_encoder
+
+OUTPUT_FIELDS = ['id', 'stage', 'answer_id', 'score', 'latency_ms']
+
+
+def read_queries(path, field='query'):
+    """Yield ``(id, query)`` pairs from a CSV or JSONL file.
+
+    Ids come from an ``id`` field when present, otherwise the 1-based row
+    number. JSONL lines may also be bare strings.
+    """
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record, str):
+                    yield n, record
+                else:
+                    yield record.get('id', n), str(record.get(field) or '')
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            if field not in (reader.fieldnames or []):
+                raise ValueError(f"{path} has no '{field}' column")
+            for n, record in enumerate(reader, 1):
+                yield record.get('id') or n, record[field] or ''
+
+
+class ResultWriter:
+    def __init__(self, f, jsonl=False):
+        self.f = f
+        self.jsonl = jsonl
+        if not jsonl:
+            self.writer = csv.writer(f)
+            self.writer.writerow(OUTPUT_FIELDS)
+
+    def write(self, query_id, match):
+        row = [query_id, match.stage, match.row, match.score, round(match.elapsed_ms, 3)]
+        if self.jsonl:
+            self.f.write(json.dumps(dict(zip(OUTPUT_FIELDS, row))) + "\n")
+        else:
+            self.writer.writerow(['' if v is None else v for v in row])
+
+
+def run(records, snapshot, encode_fn, writer, batch_size=512, progress=None):
+    """Answer ``(id, query)`` records chunk by chunk; returns per-stage counts."""
+    counts = dict.fromkeys(STAGES, 0)
+    records = iter(records)
+    total, start = 0, time.perf_counter()
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        matches = match_batch([query for _, query in chunk], snapshot, encode_fn)
+        for (query_id, _), match in zip(chunk, matches):
+            writer.write(query_id, match)
+            counts[match.stage] += 1
+        total += len(chunk)
+        if progress:
+            progress(f"{total} queries, {total / (time.perf_counter() - start):.0f} q/s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of queries against the knowledge base.")
+    parser.add_argument('queries', help="CSV (with a header) or .jsonl file")
+    parser.add_argument('--out', default='-', help="output .csv or .jsonl file, '-' for CSV on stdout")
+    parser.add_argument('--field', default='query', help="column/key holding the query text")
+    parser.add_argument('--kb', default='dataset.xlsx')
+    parser.add_argument('--cache-dir', default='.kb_cache')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--encoder-backend', choices=ENCODER_BACKENDS, default=TORCH)
+    parser.add_argument('--model-dir', help="exported model for the onnx encoder backends")
+    parser.add_argument('--index-backend', default='brute')
+    parser.add_argument('--batch-size', type=int, default=512, help="queries read and answered per chunk")
+    parser.add_argument('--encode-batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    model = load_encoder(args.model, args.encoder_backend, args.model_dir)
+
+    def encode(texts):
+        return model.encode(texts, batch_size=args.encode_batch_size)
+
+    cache_key = encoder_cache_key(args.model, args.encoder_backend)
+    snapshot = KnowledgeBaseStore(args.kb, encode, cache_key, args.cache_dir, index_backend=args.index_backend).current
+
+    def progress(message):
+        print(message, file=sys.stderr, flush=True)
+
+    out = sys.stdout if args.out == '-' else open(args.out, 'w', newline='', encoding='utf-8')
+    try:
+        writer = ResultWriter(out, jsonl=args.out.endswith('.jsonl'))
+        counts = run(read_queries(args.queries, args.field), snapshot, encode, writer,
+                     args.batch_size, progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(" ".join(f"{stage}={n}" for stage, n in counts.items()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Load test for the HTTP answering API.
+
+    python -m benchmarks.bench_answer_api --connections 32 --requests 50
+
+Starts ``answer_api`` on a local port against a synthetic KB with the offline
+stub encoder (simulated per-call cost), waits for ``/readyz``, then opens N
+keep-alive connections that each send M ``/answer`` requests, followed by a
+round of ``/answer/batch`` requests. Reports requests/sec and p50/p95 latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from answer_api import AnswerServer, AnswerService
+from benchmarks.bench_encoder_service import SimulatedModel
+from benchmarks.bench_session_memory import write_sheet
+from benchmarks.common import MODEL_NAME, percentile, synthetic_questions
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def wait_ready(port, timeout=300):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    deadline = time.monotonic() + timeout
+    while True:
+        status, payload = await request(reader, writer, 'GET', '/readyz')
+        if status == 200:
+            writer.close()
+            return payload
+        if payload.get('status') == 'failed' or time.monotonic() > deadline:
+            raise RuntimeError(f"Server not ready: {payload}")
+        await asyncio.sleep(0.1)
+
+
+async def load(port, connections, requests_per_connection, make_payload, path):
+    latencies, statuses = [], []
+
+    async def client(i):
+        rng = random.Random(i)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for _ in range(requests_per_connection):
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, 'POST', path, make_payload(rng))
+            latencies.append((time.perf_counter() - start) * 1e3)
+            statuses.append(status)
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(connections)))
+    return len(latencies) / (time.perf_counter() - start), latencies, statuses
+
+
+def start_server(service):
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    holder = {}
+
+    async def run():
+        server = await AnswerServer(service).start('127.0.0.1', 0)
+        holder['port'] = server.sockets[0].getsockname()[1]
+        started.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=loop.run_until_complete, args=(run(),), daemon=True).start()
+    started.wait()
+    return holder['port']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help="KB size")
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=50, help="requests per connection")
+    parser.add_argument('--batch-size', type=int, default=100, help="queries per /answer/batch request")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--call-ms', type=float, default=8.0)
+    parser.add_argument('--per-text-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kb_api_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        write_sheet(sheet, args.rows)
+        pool = [" ".join(q.split()[::2]) for q in synthetic_questions(args.rows)]
+        service = AnswerService(sheet, MODEL_NAME, os.path.join(workdir, 'cache'),
+                                load_model=lambda name: SimulatedModel(args.call_ms, args.per_text_ms),
+                                workers=args.workers)
+        port = start_server(service)
+        ready = asyncio.run(wait_ready(port))
+        print(f"kb rows: {args.rows}  ready: {ready}")
+
+        runs = [
+            ('/answer', args.requests, lambda rng: {'query': rng.choice(pool)}, 1),
+            ('/answer/batch', max(1, args.requests // 10),
+             lambda rng: {'queries': rng.sample(pool, args.batch_size)}, args.batch_size),
+        ]
+        for path, n, make_payload, per_request in runs:
+            rps, latencies, statuses = asyncio.run(load(port, args.connections, n, make_payload, path))
+            errors = sum(s != 200 for s in statuses)
+            print(f"  {path:14s} {rps:8.1f} req/s ({rps * per_request:8.1f} queries/s)"
+                  f"  p50 {percentile(latencies, 50):7.2f}ms  p95 {percentile(latencies, 95):7.2f}ms"
+                  f"  errors {errors}")
+        stats = service.encoder.stats()
+        print(f"  encoder: {stats['batches']} model calls, mean batch {stats['mean_batch_size']:.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
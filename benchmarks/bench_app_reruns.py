@@ -0,0 +1,290 @@
+"""Server CPU time per chat interaction of a Streamlit front-end.
+
+    python -m benchmarks.bench_app_reruns --app main.py --chats 3 --questions 10
+    python -m benchmarks.bench_app_reruns --app updated_main.py --stub
+
+Starts the app with ``streamlit run`` (headless, on a local port) and drives
+it the way a browser does, over the ``/_stcore/stream`` websocket: it sends
+``BackMsg`` reruns with the widget states of a click, tags the clicks of
+widgets inside a fragment with that fragment's id, and answers the server's
+``auto_rerun`` requests (the response poll, the end-of-chat timer, the sidebar
+stats). Like the browser it keeps the large messages the server marks
+cacheable and lists their hashes in every rerun, so unchanged ones come back
+as a short reference. The first session's page load ('first page') is the
+cold start: the time until it is usable is what a first visitor waits. After
+that warm-up session it opens the page once more, then each chat clicks Start Chat, a
+quick reply, a feedback button, then sends ``--questions`` questions (rating
+each answer) and says bye.
+
+For every kind of interaction it reports the server process's CPU time
+(``/proc/<pid>/stat``, 10 ms ticks, so interactions are averaged) from the
+click until the app settles, including the poll reruns that wait for the
+answer, the protobuf bytes the server sent and the time to its last message.
+It also samples the server's resident memory (``VmRSS``) after every chat, to
+show whether memory keeps growing over a session; ``--option`` passes
+Streamlit config options (``--option runner.postScriptGC=false``) to compare
+settings.
+Every script run, fragment runs included, also pays Streamlit's own fixed
+cost, and a click whose callback reruns other fragments by key takes two
+runs: the callback's and the fragments'. The server is started from the repo
+root, so it reads ``.streamlit/config.toml`` like ``streamlit run`` there. ``--stub`` runs the server
+with the offline stub encoder in place of ``sentence_transformers``, and
+``--model-load-s`` makes loading it take that long, like importing torch and
+reading the real model's weights. Needs ``websockets`` and Linux.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import types
+import urllib.request
+from collections import defaultdict
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from benchmarks.common import StubEncoder, percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = ["Reset password", "vpn is not connecting", "outlook is not syncing my mails",
+             "printer shows offline", "how do I install software", "my account is locked"]
+SETTLE_S = 0.3
+
+
+def serve(app, port, stub, model_load_s, options):
+    if stub:
+        def load_model(name, *args, **kwargs):
+            time.sleep(model_load_s)
+            return StubEncoder()
+
+        shim = types.ModuleType('sentence_transformers')
+        shim.SentenceTransformer = load_model
+        sys.modules['sentence_transformers'] = shim
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', app, '--server.headless', 'true', '--server.port', str(port),
+                '--server.enableXsrfProtection', 'false', '--browser.gatherUsageStats', 'false']
+    for option in options:
+        name, value = option.split('=', 1)
+        sys.argv += ['--' + name, value]
+    cli.main()
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def rss_mib(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_ready(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health'):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def widget_key(widget_id):
+    # Widget ids look like "$$ID-<hash>-<user key or None>".
+    return widget_id.rsplit('-', 1)[-1]
+
+
+class AppClient:
+    def __init__(self, ws):
+        self.ws = ws
+        self.buttons = {}         # widget id -> (label, fragment id, form submitter, message number)
+        self.text_inputs = {}     # user key -> widget id
+        self.timers = {}          # fragment id -> [interval, next due]
+        self.registered = {}      # auto-reruns requested by the current run
+        self.running = False
+        self.last_message = time.monotonic()
+        self.messages = 0
+        self.bytes = 0
+        self.cache = {}           # hash -> cacheable message, as the browser keeps them
+
+    async def rerun(self, widgets=(), fragment_id='', auto=False):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.is_auto_rerun = auto
+        msg.rerun_script.cached_message_hashes.extend(self.cache)
+        for widget_id, field, value in widgets:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            setattr(state, field, value)
+        self.running = True
+        await self.ws.send(msg.SerializeToString())
+
+    def _handle(self, raw):
+        self.bytes += len(raw)
+        self.messages += 1
+        self.last_message = time.monotonic()
+        msg = ForwardMsg()
+        msg.ParseFromString(raw)
+        if msg.WhichOneof('type') == 'ref_hash':
+            msg = self.cache[msg.ref_hash]
+        elif msg.metadata.cacheable:
+            self.cache[msg.hash] = msg
+        kind = msg.WhichOneof('type')
+        if kind == 'session_status_changed':
+            self.running = msg.session_status_changed.script_is_running
+        elif kind == 'script_finished':
+            # Like the browser: a full run keeps only the timers it requested,
+            # a fragment run adds to them.
+            if msg.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                self.timers = {}
+            if msg.script_finished in (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY):
+                now = time.monotonic()
+                self.timers.update((fragment_id, [interval, now + interval])
+                                   for fragment_id, interval in self.registered.items())
+            self.registered = {}
+        elif kind == 'auto_rerun':
+            self.registered[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+        elif kind == 'stop_auto_rerun':
+            for fragment_id in msg.stop_auto_rerun.fragment_ids:
+                self.timers.pop(fragment_id, None)
+        elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            element = msg.delta.new_element
+            if element.WhichOneof('type') == 'button':
+                self.buttons[element.button.id] = (element.button.label, msg.delta.fragment_id,
+                                                   element.button.is_form_submitter, self.messages)
+            elif element.WhichOneof('type') == 'text_input':
+                self.text_inputs[widget_key(element.text_input.id)] = element.text_input.id
+
+    async def settle(self, done=lambda: True, timeout=60):
+        """Process messages and due auto-reruns until ``done()`` holds and the
+        server has been idle for ``SETTLE_S``."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            for fragment_id, timer in list(self.timers.items()):
+                if timer[1] <= now and not self.running:
+                    timer[1] = now + timer[0]
+                    await self.rerun(fragment_id=fragment_id, auto=True)
+            try:
+                self._handle(await asyncio.wait_for(self.ws.recv(), 0.05))
+                continue
+            except asyncio.TimeoutError:
+                pass
+            if not self.running and done() and time.monotonic() - self.last_message >= SETTLE_S:
+                return
+        raise TimeoutError("app did not settle")
+
+    def find_buttons(self, predicate, since=0):
+        """Ids of the buttons matching ``predicate(id, label, fragment id, form
+        submitter)`` that were rendered after message number ``since``."""
+        return [widget_id for widget_id, (label, fragment_id, submitter, seen) in self.buttons.items()
+                if seen > since and predicate(widget_id, label, fragment_id, submitter)]
+
+    async def click(self, widget_id, extra=()):
+        await self.rerun([*extra, (widget_id, 'trigger_value', True)], self.buttons[widget_id][1])
+
+
+def is_feedback(widget_id, label, fragment_id, submitter):
+    return widget_key(widget_id) == 'None' and not submitter
+
+
+async def load_page(port, pid, results, name):
+    cpu, start = cpu_seconds(pid), time.monotonic()
+    ws = await websockets.connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'], max_size=None)
+    client = AppClient(ws)
+    await client.rerun()
+    await client.settle(timeout=600)
+    results[name].append((cpu_seconds(pid) - cpu, client.bytes, client.last_message - start))
+    return client
+
+
+async def drive(port, pid, chats, questions):
+    results = defaultdict(list)
+    rss = []
+    # The first session pays for loading the model and the KB; measure the next.
+    await (await load_page(port, pid, results, 'first page')).ws.close()
+    client = await load_page(port, pid, results, 'page load')
+    async with client.ws:
+        async def step(name, widget_id, done, extra=()):
+            cpu, sent, start, mark = cpu_seconds(pid), client.bytes, time.monotonic(), client.messages
+            await client.click(widget_id, extra)
+            await client.settle(lambda: done(mark))
+            results[name].append((cpu_seconds(pid) - cpu, client.bytes - sent, client.last_message - start))
+            return client.messages
+
+        def start_button(since=0):
+            return client.find_buttons(lambda i, *_: widget_key(i) == 'start_chat_button', since)
+
+        def quick_buttons(since=0):
+            return client.find_buttons(lambda i, *_: widget_key(i).startswith('quick_'), since)
+
+        def feedback_buttons(since=0):
+            return client.find_buttons(is_feedback, since)
+
+        for chat in range(chats):
+            await step('start chat', start_button()[-1], quick_buttons)
+            await step('quick reply', quick_buttons()[0], feedback_buttons)
+            for n in range(questions + 1):
+                await step('feedback', feedback_buttons()[0], lambda mark: True)
+                send = client.find_buttons(lambda i, label, fragment, submitter: submitter)[-1]
+                typed = [(client.text_inputs['input_bar'], 'string_value',
+                          'bye' if n == questions else QUESTIONS[(chat + n) % len(QUESTIONS)])]
+                if n < questions:
+                    await step('send', send, feedback_buttons, typed)
+                else:
+                    mark = await step('bye', send, lambda mark: True, typed)
+                    await client.settle(lambda: bool(start_button(mark)), timeout=30)
+            rss.append(rss_mib(pid))
+        return results, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='main.py')
+    parser.add_argument('--chats', type=int, default=3)
+    parser.add_argument('--questions', type=int, default=10, help="questions per chat before saying bye")
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--stub', action='store_true', help="offline stub encoder instead of the real model")
+    parser.add_argument('--model-load-s', type=float, default=0.0, help="time the stub model takes to load")
+    parser.add_argument('--option', action='append', default=[], metavar='NAME=VALUE',
+                        help="Streamlit config option for the server, e.g. runner.postScriptGC=false")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.app, args.port, args.stub, args.model_load_s, args.option)
+        return
+
+    command = [sys.executable, '-m', 'benchmarks.bench_app_reruns', '--serve', '--app', args.app,
+               '--port', str(args.port), '--model-load-s', str(args.model_load_s)] + (['--stub'] if args.stub else [])
+    command += [f'--option={option}' for option in args.option]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(args.port)
+        results, rss = asyncio.run(drive(args.port, server.pid, args.chats, args.questions))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"app: {args.app}  chats: {args.chats}  questions per chat: {args.questions}"
+          + (f"  options: {' '.join(args.option)}" if args.option else ""))
+    print(f"  {'interaction':12s} {'n':>4s} {'cpu/interaction':>16s} {'sent/interaction':>17s} {'last msg p50':>13s}")
+    for name, samples in results.items():
+        cpu = sum(s[0] for s in samples) / len(samples)
+        sent = sum(s[1] for s in samples) / len(samples)
+        wall = percentile([s[2] * 1e3 for s in samples], 50)
+        print(f"  {name:12s} {len(samples):4d} {cpu * 1e3:14.1f}ms {sent / 1024:15.1f}KB {wall:11.0f}ms")
+    print(f"  server RSS after each chat: {' '.join(f'{m:.0f}' for m in rss)} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Throughput of the batch CLI pipeline vs. answering one query at a time.
+
+    python -m benchmarks.bench_batch_answer --rows 5000 --queries 5000
+
+Writes a synthetic KB and a CSV of queries (paraphrased KB questions,
+greetings, noise), then answers the file with ``batch_answer.run`` and with a
+per-query loop over ``match_query`` as the apps call it (one ``encode``
+and one ``kneighbors`` call per query). Fails if the two disagree on any stage or
+answer. The encoder is the offline stub with a simulated per-call cost.
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from batch_answer import ResultWriter, read_queries, run
+from benchmarks.bench_encoder_service import SimulatedModel
+from benchmarks.bench_session_memory import write_sheet
+from benchmarks.common import MODEL_NAME, synthetic_questions
+from engine import KnowledgeBaseStore, match_query
+from engine.intent_filter import GREETINGS
+
+
+def same_answer(a, b):
+    # (stage, row, score) tuples. Equal-scoring neighbours may come back in either order from a batched
+    # matrix product, so semantic rows only have to agree on the score.
+    if a[0] != b[0]:
+        return False
+    if a[0] in ('semantic', 'fallback'):
+        return abs(a[2] - b[2]) < 1e-3
+    return a[1:] == b[1:]
+
+
+def write_queries(path, rows, n, seed=0):
+    rng = random.Random(seed)
+    questions = synthetic_questions(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'query'])
+        for i in range(n):
+            kind = rng.random()
+            if kind < 0.1:
+                query = rng.choice(GREETINGS)
+            elif kind < 0.15:
+                query = "#$%"
+            else:
+                words = rng.choice(questions).split()
+                query = " ".join(rng.sample(words, max(2, len(words) // 2)))
+            writer.writerow([f"T{i}", query])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help="KB size")
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--call-ms', type=float, default=8.0)
+    parser.add_argument('--per-text-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kb_batch_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        queries = os.path.join(workdir, 'queries.csv')
+        write_sheet(sheet, args.rows)
+        write_queries(queries, args.rows, args.queries)
+        model = SimulatedModel(args.call_ms, args.per_text_ms)
+        snapshot = KnowledgeBaseStore(sheet, model.encode, MODEL_NAME, os.path.join(workdir, 'cache')).current
+
+        start = time.perf_counter()
+        single = [match_query(query, snapshot, model.encode) for _, query in read_queries(queries)]
+        single = [(m.stage, m.row, m.score) for m in single]
+        single_s = time.perf_counter() - start
+
+        out = io.StringIO()
+        start = time.perf_counter()
+        counts = run(read_queries(queries), snapshot, model.encode, ResultWriter(out), args.batch_size)
+        batch_s = time.perf_counter() - start
+        out.seek(0)
+        batched = [(r['stage'], int(r['answer_id']) if r['answer_id'] else None,
+                    float(r['score']) if r['score'] else None) for r in csv.DictReader(out)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    mismatches = sum(not same_answer(a, b) for a, b in zip(single, batched))
+    print(f"kb rows: {args.rows}  queries: {args.queries}  mismatches: {mismatches}")
+    print("  " + " ".join(f"{stage}={n}" for stage, n in counts.items()))
+    print(f"  per-query loop  {args.queries / single_s:9.1f} q/s")
+    print(f"  batch_answer    {args.queries / batch_s:9.1f} q/s  (batch size {args.batch_size})")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Startup benchmark: cold encode vs. warm embedding cache on a synthetic sheet.
+
+    python -m benchmarks.bench_embedding_cache --rows 50000
+    python -m benchmarks.bench_embedding_cache --rows 50000 --stub   # offline
+
+Reports the time to produce the KB embedding matrix for a cold start (no cache),
+a warm start (nothing changed), and a warm start after editing 1% of the rows.
+"""
+import argparse
+import shutil
+import tempfile
+
+from benchmarks.common import MODEL_NAME, load_encoder, synthetic_questions, timed
+from engine.embedding_cache import EmbeddingCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--stub', action='store_true', help="use the offline hashing encoder")
+    args = parser.parse_args()
+
+    encoder = load_encoder(args.stub)
+    questions = synthetic_questions(args.rows)
+    cache_dir = tempfile.mkdtemp(prefix='kb_cache_bench_')
+    try:
+        _, plain = timed(encoder.encode, questions)
+
+        cache = EmbeddingCache(cache_dir, MODEL_NAME)
+        _, cold = timed(cache.encode, questions, encoder.encode)
+        _, warm = timed(EmbeddingCache(cache_dir, MODEL_NAME).encode, questions, encoder.encode)
+
+        edited = list(questions)
+        for i in range(0, len(edited), 100):
+            edited[i] = edited[i] + " (updated)"
+        partial_cache = EmbeddingCache(cache_dir, MODEL_NAME)
+        _, partial = timed(partial_cache.encode, edited, encoder.encode)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"rows: {args.rows}  encoder: {'stub' if args.stub else MODEL_NAME}")
+    print(f"  encode without cache : {plain:8.3f}s")
+    print(f"  cold cache (encode+save): {cold:8.3f}s")
+    print(f"  warm cache (mmap)    : {warm:8.3f}s  ({plain / max(warm, 1e-9):.0f}x faster)")
+    print(f"  1% rows edited       : {partial:8.3f}s  (re-encoded {partial_cache.stats['encoded']} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Load test: per-call ``model.encode`` vs. the micro-batching ``EncoderService``.
+
+    python -m benchmarks.bench_encoder_service --users 32 --queries 20
+
+N simulated users each send M queries concurrently. The stub model behaves
+like CPU transformer inference: one call at a time, a fixed per-call cost
+plus a smaller per-text cost, and deterministic hashing vectors, so the test
+runs offline. Reports throughput and p50/p95 encode latency for both paths.
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import StubEncoder, percentile, synthetic_questions
+from engine.encoder_service import EncoderService
+
+
+class SimulatedModel(StubEncoder):
+    def __init__(self, call_ms, per_text_ms):
+        super().__init__()
+        self.call_s = call_ms / 1000.0
+        self.per_text_s = per_text_ms / 1000.0
+        self._busy = threading.Lock()
+
+    def encode(self, texts, **kwargs):
+        with self._busy:
+            time.sleep(self.call_s + self.per_text_s * len(texts))
+            return super().encode(texts)
+
+
+def load_test(encode, users, queries_per_user, pool, seed=0):
+    latencies = []
+    lock = threading.Lock()
+
+    def user(i):
+        rng = random.Random(seed + i)
+        for _ in range(queries_per_user):
+            start = time.perf_counter()
+            encode([rng.choice(pool)])
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1e3)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=32)
+    parser.add_argument('--queries', type=int, default=20, help="queries per user")
+    parser.add_argument('--distinct', type=int, default=5000, help="size of the query pool")
+    parser.add_argument('--call-ms', type=float, default=8.0)
+    parser.add_argument('--per-text-ms', type=float, default=0.5)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    pool = synthetic_questions(args.distinct)
+    model = SimulatedModel(args.call_ms, args.per_text_ms)
+    runs = [('per-call model.encode', model.encode, None)]
+    for cache_size in (0, 4096):
+        service = EncoderService(model.encode, args.max_batch, args.max_wait_ms, cache_size)
+        runs.append((f"EncoderService cache={cache_size}", service.encode, service))
+
+    print(f"users: {args.users}  queries/user: {args.queries}  pool: {args.distinct}")
+    for label, encode, service in runs:
+        throughput, latencies = load_test(encode, args.users, args.queries, pool)
+        extra = ""
+        if service is not None:
+            stats = service.stats()
+            extra = f"  mean batch {stats['mean_batch_size']:.1f}, cache hits {stats['cache_hits']}"
+        print(f"  {label:26s} {throughput:8.1f} q/s  p50 {percentile(latencies, 50):7.2f}ms"
+              f"  p95 {percentile(latencies, 95):7.2f}ms{extra}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""CPU latency and throughput of the encoder backends, with parity vs. PyTorch.
+
+    python -m benchmarks.bench_encoders --model-dir models/all-MiniLM-L6-v2
+    python -m benchmarks.bench_encoders --backends onnx onnx-int8 --model-dir models/all-MiniLM-L6-v2 --threads 1
+
+For each backend (``torch``, ``onnx``, ``onnx-int8``; the ONNX ones read the
+export written by ``export_encoder.py``) it reports the load time, the
+p50/p95 latency of encoding one query at a time (what a chat message pays)
+and the throughput of encoding the KB questions in batches of ``--batch``
+(what a KB rebuild pays). With ``torch`` in the list, every other backend is
+also compared with it on the KB questions (see ``parity_report``). Needs the
+real model, so it does not run offline.
+"""
+import argparse
+
+from benchmarks.common import percentile, synthetic_questions, timed
+from engine.encoders import ENCODER_BACKENDS, TORCH, load_encoder, parity_report
+from engine.knowledge_base import read_sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=ENCODER_BACKENDS, default=list(ENCODER_BACKENDS))
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--model-dir')
+    parser.add_argument('--kb', default='dataset.xlsx')
+    parser.add_argument('--queries', type=int, default=200, help="single-query encodes timed per backend")
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=0, help="ONNX Runtime intra-op threads, 0 = all cores")
+    args = parser.parse_args()
+
+    questions = read_sheet(args.kb)['questions'].astype(str).tolist()
+    queries = synthetic_questions(args.queries, seed=1)
+    reference = None
+    print(f"KB questions: {len(questions)}  queries: {len(queries)}  batch: {args.batch}")
+    for backend in args.backends:
+        encoder, load_s = timed(load_encoder, args.model, backend, args.model_dir, args.threads)
+        encoder.encode(queries[:8])  # warm-up: first-call allocations, lazy init
+        latencies = [timed(encoder.encode, [query])[1] * 1e3 for query in queries]
+        embeddings, batch_s = timed(encoder.encode, questions, batch_size=args.batch)
+        line = (f"  {backend:10s} load {load_s:6.2f}s  query p50 {percentile(latencies, 50):6.2f}ms"
+                f"  p95 {percentile(latencies, 95):6.2f}ms  batch {len(questions) / batch_s:8.1f} texts/s")
+        if backend == TORCH:
+            reference = embeddings
+        elif reference is not None:
+            report = parity_report(reference, embeddings)
+            line += (f"  min cosine {report['min_cosine']:.5f}"
+                     f"  nearest question agreement {report['neighbour_agreement']:.1%}")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Latency of hybrid top-k retrieval vs. the single-answer cascade.
+
+    python -m benchmarks.bench_hybrid --rows 20000 --queries 300 --top-k 5
+    python -m benchmarks.bench_hybrid --call-ms 0 --per-text-ms 0   # retrieval cost only
+
+Runs the same queries through ``match_query`` without and with ``top_k``
+(lexical + vector top-k fused with reciprocal rank fusion), checks that the
+stage and answer row are unchanged, and reports p50/p95 latency of both
+paths, overall and for the queries the fuzzy stage answers. The encoder is
+the offline stub with the simulated cost of ``bench_encoder_service``
+(``--call-ms`` per call plus ``--per-text-ms`` per text, like CPU
+transformer inference), so a path that encodes when it need not shows up.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+from benchmarks.bench_encoder_service import SimulatedModel
+from benchmarks.bench_session_memory import write_sheet
+from benchmarks.common import MODEL_NAME, StubEncoder, percentile, synthetic_questions
+from engine import FALLBACK, FUZZY, KnowledgeBaseStore, match_query
+
+
+def make_queries(rows, n, seed=0):
+    rng = random.Random(seed)
+    questions = synthetic_questions(rows)
+    queries = []
+    for _ in range(n):
+        words = rng.choice(questions).split()
+        keep = rng.choice((len(words), max(2, len(words) // 2), 3))
+        queries.append(" ".join(rng.sample(words, min(keep, len(words)))))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--call-ms', type=float, default=8.0, help="simulated encoder cost per call")
+    parser.add_argument('--per-text-ms', type=float, default=0.5, help="simulated encoder cost per text")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kb_hybrid_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        write_sheet(sheet, args.rows)
+        snapshot = KnowledgeBaseStore(sheet, StubEncoder().encode, MODEL_NAME, os.path.join(workdir, 'cache')).current
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    encode = SimulatedModel(args.call_ms, args.per_text_ms).encode
+    queries = make_queries(args.rows, args.queries)
+    for q in queries[:5]:
+        match_query(q, snapshot, encode, top_k=args.top_k)
+    cascade = [match_query(q, snapshot, encode) for q in queries]
+    hybrid = [match_query(q, snapshot, encode, top_k=args.top_k) for q in queries]
+
+    changed = sum((a.stage, a.score) != (b.stage, b.score) for a, b in zip(cascade, hybrid))
+    fallbacks = [m for m in hybrid if m.stage == FALLBACK]
+    fuzzy = [i for i, m in enumerate(cascade) if m.stage == FUZZY]
+    print(f"rows: {args.rows}  queries: {args.queries}  top-k: {args.top_k}  changed answers: {changed}  "
+          f"encoder: {args.call_ms:g}ms/call + {args.per_text_ms:g}ms/text")
+    print(f"  fuzzy: {len(fuzzy)}  fallbacks: {len(fallbacks)}, with suggestions: "
+          f"{sum(bool(m.candidates) for m in fallbacks)}")
+    for label, matches in (('cascade', cascade), (f'hybrid top-{args.top_k}', hybrid)):
+        latencies = [m.elapsed_ms for m in matches]
+        fuzzy_latencies = [matches[i].elapsed_ms for i in fuzzy]
+        print(f"  {label:14s} p50 {percentile(latencies, 50):7.2f}ms  p95 {percentile(latencies, 95):7.2f}ms"
+              f"  fuzzy p50 {percentile(fuzzy_latencies, 50):7.2f}ms")
+    return 1 if changed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""Regression check and microbenchmark for the greeting/gibberish pre-filters.
+
+    python -m benchmarks.bench_intent_filter
+
+Runs the original per-message implementations and ``intent_filter`` over the
+same corpus (KB questions, greetings with typos and filler, random noise) and
+fails if any outcome differs, then reports the per-message cost of both.
+
+It also replays the corpus, each message with a trailing "?" and shouted
+with a "!", through ``cached(QueryCache, match_query)`` and fails if a cached
+match differs from the uncached one: the cache key folds case and punctuation,
+which the pre-filters do not. Uses the offline stub encoder for the KB.
+"""
+import argparse
+import random
+import re
+import shutil
+import string
+import sys
+import tempfile
+import timeit
+
+from fuzzywuzzy import fuzz
+
+from benchmarks.common import MODEL_NAME, StubEncoder
+from engine import KnowledgeBaseStore, QueryCache, cached, match_query
+from engine.intent_filter import GREETINGS, is_gibberish, is_greeting
+from engine.knowledge_base import read_sheet
+
+
+def legacy_is_gibberish(text):
+    text = text.strip()
+    if len(text) < 2 or re.fullmatch(r'[^\w\s]+', text) or len(set(text)) < 3:
+        return True
+    words = text.split()
+    if len(words) > 0 and sum(1 for w in words if not w.isalpha()) / len(words) > 0.5:
+        return True
+    return False
+
+
+def legacy_is_greeting(text):
+    greetings = [
+        "hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening",
+        "how are you", "what's up", "sup", "thank you", "thanks", "bye", "goodbye"
+    ]
+    text = text.lower()
+    for greet in greetings:
+        if fuzz.partial_ratio(greet, text) > 80:
+            return greet
+    return None
+
+
+def typo(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+
+def build_corpus(path, size, seed=0):
+    rng = random.Random(seed)
+    questions = read_sheet(path)['questions'].astype(str).tolist()
+    corpus = list(questions)
+    fillers = ["", "there", "team", "!", "?", "again", "so much", "IT support", "please help"]
+    for _ in range(size):
+        kind = rng.random()
+        if kind < 0.35:
+            corpus.append(f"{typo(rng, rng.choice(GREETINGS))} {rng.choice(fillers)}".strip())
+        elif kind < 0.7:
+            q = rng.choice(questions)
+            cut = rng.randint(0, len(q) // 2)
+            corpus.append(typo(rng, q[cut:]))
+        else:
+            alphabet = string.ascii_letters + string.digits + string.punctuation + "  éü"
+            corpus.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40))))
+    return corpus
+
+
+def cache_mismatches(path, corpus):
+    """Messages whose ``cached`` match differs from ``match_query``'s."""
+    workdir = tempfile.mkdtemp(prefix='intent_cache_bench_')
+    try:
+        encode = StubEncoder().encode
+        snapshot = KnowledgeBaseStore(path, encode, MODEL_NAME, workdir).current
+
+        def respond(query, snapshot, encode_fn):
+            match = match_query(query, snapshot, encode_fn)
+            return match.stage, match.row, match.greeting
+
+        cached_respond = cached(QueryCache(max_size=len(corpus) * 3), respond)
+        messages = [variant for text in corpus for variant in (text + "?", text, text.upper() + "!")]
+        return [text for text in messages
+                if cached_respond(text, snapshot, encode) != respond(text, snapshot, encode)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kb', default='dataset.xlsx')
+    parser.add_argument('--size', type=int, default=20000, help="generated messages on top of the KB questions")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.kb, args.size)
+    mismatches = [t for t in corpus
+                  if legacy_is_gibberish(t) != is_gibberish(t) or legacy_is_greeting(t) != is_greeting(t)]
+    greetings = sum(legacy_is_greeting(t) is not None for t in corpus)
+    print(f"corpus: {len(corpus)} messages ({greetings} greetings)  mismatches: {len(mismatches)}")
+    for text in mismatches[:10]:
+        print(f"  {text!r}: legacy {legacy_is_greeting(text)!r} new {is_greeting(text)!r}")
+
+    sample = corpus[:2000]
+    for label, gib, greet in (('legacy', legacy_is_gibberish, legacy_is_greeting),
+                              ('intent_filter', is_gibberish, is_greeting)):
+        seconds = timeit.timeit(lambda: [gib(t) or greet(t) for t in sample], number=3) / 3
+        print(f"  {label:14s} {seconds / len(sample) * 1e6:8.1f} us/message")
+
+    cache_misses = cache_mismatches(args.kb, corpus)
+    print(f"  query cache: {len(corpus) * 3} messages replayed  cached != uncached: {len(cache_misses)}")
+    for text in cache_misses[:10]:
+        print(f"  {text!r}")
+    return 1 if mismatches or cache_misses else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Startup benchmark: parsing dataset.xlsx vs. memory-mapping the compiled bundle.
+
+    python -m benchmarks.bench_kb_bundle --rows 50000
+
+Each path runs in a fresh interpreter and reports the time to get a ready
+``KnowledgeBase`` + ``LexicalIndex`` (embeddings already cached in both cases)
+and the RSS growth that caused. Uses the offline stub encoder.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import MODEL_NAME, StubEncoder
+from benchmarks.bench_session_memory import write_sheet
+from engine.embedding_cache import EmbeddingCache
+from engine.kb_bundle import load_or_compile
+from engine.knowledge_base import KnowledgeBase, read_sheet
+from engine.lexical_index import LexicalIndex
+
+
+def rss_bytes():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def child(mode, sheet, workdir):
+    cache = EmbeddingCache(os.path.join(workdir, 'cache'), MODEL_NAME)
+    encode = StubEncoder().encode
+    before, start = rss_bytes(), time.perf_counter()
+    if mode == 'xlsx':
+        df = read_sheet(sheet)
+        kb = KnowledgeBase.from_dataframe(df, cache.encode(df['questions'].astype(str).tolist(), encode))
+        lexical = LexicalIndex(kb.questions)
+    else:
+        kb, lexical, _ = load_or_compile(sheet, os.path.join(workdir, 'bundle'), encode, cache)
+    elapsed = time.perf_counter() - start
+    # Touch what a first query touches so lazily mapped pages are counted.
+    kb.answer(len(kb) - 1)
+    lexical.best_match(kb.question(len(kb) // 2))
+    print(json.dumps({'seconds': elapsed, 'rss': rss_bytes() - before}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    workdir = tempfile.mkdtemp(prefix='kb_bundle_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        write_sheet(sheet, args.rows)
+        EmbeddingCache(os.path.join(workdir, 'cache'), MODEL_NAME).encode(
+            read_sheet(sheet)['questions'].astype(str).tolist(), StubEncoder().encode)
+        results = {}
+        # The first bundle run compiles it; the second measures a warm start.
+        for label, mode in (('xlsx parse', 'xlsx'), ('bundle compile', 'bundle'), ('bundle mmap', 'bundle')):
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_kb_bundle', '--child', mode, sheet, workdir],
+                                 check=True, capture_output=True, text=True).stdout
+            results[label] = json.loads(out.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"rows: {args.rows}")
+    for label, r in results.items():
+        print(f"  {label:15s} load {r['seconds']:8.3f}s   RSS +{r['rss'] / 2**20:8.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Fuzzy-stage latency: full ``process.extractOne`` scan vs. ``LexicalIndex``.
+
+    python -m benchmarks.bench_lexical_index --rows 20000 --queries 200
+
+Also checks that both paths return the same row and score for every query.
+"""
+import argparse
+import random
+
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import process
+
+from benchmarks.common import percentile, synthetic_questions, timed
+from engine.lexical_index import LexicalIndex
+
+
+def scan(query, questions):
+    best_match, score = process.extractOne(query, questions, scorer=fuzz.token_sort_ratio)
+    if score > 70:
+        return questions.index(best_match), score
+    return None, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    questions = synthetic_questions(args.rows)
+    index, build = timed(LexicalIndex, questions)
+    queries = [rng.choice(questions)[:-rng.randint(1, 12)] for _ in range(args.queries // 2)]
+    queries += ["printer keeps jamming on the third floor"] * (args.queries - len(queries))
+
+    scan_times, index_times, mismatches = [], [], 0
+    for query in queries:
+        expected, t_scan = timed(scan, query, questions)
+        got, t_index = timed(index.best_match, query)
+        scan_times.append(t_scan * 1e3)
+        index_times.append(t_index * 1e3)
+        mismatches += got != expected
+
+    print(f"rows: {args.rows}  queries: {len(queries)}  index build: {build:.2f}s  mismatches: {mismatches}")
+    for name, times in (('extractOne scan', scan_times), ('LexicalIndex', index_times)):
+        print(f"  {name:16s} p50 {percentile(times, 50):8.2f}ms  p99 {percentile(times, 99):8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
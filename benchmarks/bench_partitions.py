@@ -0,0 +1,94 @@
+"""Latency of category-routed search vs. searching the whole KB.
+
+    python -m benchmarks.bench_partitions --rows 50000 --categories 20
+    python -m benchmarks.bench_partitions --rows 20000 --categories 4 --index-backend int8
+
+Builds a synthetic multi-department KB, then answers paraphrased questions
+once against the whole KB and once routed to the question's own category
+(what a quick reply or the department selector does). Reports p50/p95 of
+both, the one-off cost of building each partition, and how often routing
+changed the answer (the synthetic departments share topics, so the whole-KB
+answer is often a near-duplicate from another department). Also reports the
+memory the partitions keep allocated once built (``tracemalloc``, which sees
+NumPy buffers) next to the size of the KB's vector index. Uses the offline
+stub encoder.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.common import MODEL_NAME, StubEncoder, percentile, synthetic_questions
+from engine import KnowledgeBaseStore, match_query
+
+
+def write_departments_sheet(path, rows, categories):
+    questions = synthetic_questions(rows)
+    pd.DataFrame({
+        'questions': questions,
+        'answers': [f"Answer {i}" for i in range(rows)],
+        'categories': [f"Department {i % categories}" for i in range(rows)],
+        'tags': [f"tag{i % 7}, tag{i % 11}" for i in range(rows)],
+    }).to_excel(path, index=False)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--index-backend', default='brute')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kb_partition_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        questions = write_departments_sheet(sheet, args.rows, args.categories)
+        encode = StubEncoder().encode
+        snapshot = KnowledgeBaseStore(sheet, encode, MODEL_NAME, os.path.join(workdir, 'cache'),
+                                      index_backend=args.index_backend).current
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    build = []
+    tracemalloc.start()
+    held = tracemalloc.get_traced_memory()[0]
+    for c in range(args.categories):
+        start = time.perf_counter()
+        snapshot.search_space(f"Department {c}")
+        build.append((time.perf_counter() - start) * 1e3)
+    held = tracemalloc.get_traced_memory()[0] - held
+    tracemalloc.stop()
+    index = snapshot.vector_index
+    index_bytes = index.nbytes if hasattr(index, 'nbytes') else index.vectors.nbytes
+
+    rng = random.Random(0)
+    sample = rng.sample(range(args.rows), args.queries)
+    queries = []
+    for row in sample:
+        words = questions[row].split()
+        queries.append((" ".join(rng.sample(words, max(3, len(words) * 2 // 3))), f"Department {row % args.categories}"))
+
+    whole = [match_query(q, snapshot, encode) for q, _ in queries]
+    routed = [match_query(q, snapshot, encode, category=c) for q, c in queries]
+    kb = snapshot.knowledge_base
+    changed = [(a, c) for a, b, (_, c) in zip(whole, routed, queries) if (a.stage, a.row) != (b.stage, b.row)]
+    elsewhere = sum(a.row is not None and kb.category(a.row) != c for a, c in changed)
+    print(f"rows: {args.rows}  categories: {args.categories}  queries: {args.queries}  index: {args.index_backend}")
+    print(f"  answers changed by routing: {len(changed)} ({elsewhere} where the whole-KB answer"
+          f" came from another department)")
+    print(f"  partition build  mean {sum(build) / len(build):7.2f}ms  (once per category and snapshot)")
+    print(f"  partitions hold {held / 2**20:7.2f}MiB  (vector index {index_bytes / 2**20:.2f}MiB)")
+    for label, matches in (('whole KB', whole), ('routed', routed)):
+        latencies = [m.elapsed_ms for m in matches]
+        print(f"  {label:9s} p50 {percentile(latencies, 50):7.2f}ms  p95 {percentile(latencies, 95):7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Offline evaluation of the matching pipeline: accuracy, stage hit rates, latency.
+
+    python -m benchmarks.bench_pipeline --stub --json results.json
+    python -m benchmarks.bench_pipeline --stub --fuzzy-threshold 75 --baseline results.json
+    python -m benchmarks.bench_pipeline --queries labeled.jsonl --kb dataset.xlsx
+
+Runs a labeled query set through ``match_query`` (the stages behind the apps'
+``get_bot_response``) and reports accuracy per query kind, how often each
+stage answers and how often it is right, and a latency histogram per stage.
+
+A labeled set is JSONL, one object per query:
+
+    {"query": "...", "expect": "answer", "answer": "<expected KB answer>", "kind": "paraphrase"}
+
+``expect`` is ``answer`` (a fuzzy or semantic match to a row with that
+answer text), ``fallback``, ``gibberish`` or ``greeting``; ``kind`` is a free
+label to group results by. Without ``--queries`` a set is generated
+deterministically from the KB: one perturbed copy of every KB question
+(dropped words, shuffled order, typos, a different lead-in), plus built-in
+out-of-scope, gibberish and greeting queries. ``--write-queries`` saves it for
+hand editing.
+
+``--stub`` uses the offline hashing encoder, so the run needs no model
+download (CI); semantic-stage numbers then reflect the stub, not the model.
+``--json`` writes the results, ``--baseline`` compares against an earlier
+results file and exits 1 when accuracy drops by more than ``--tolerance``.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.common import MODEL_NAME, load_encoder, percentile
+from engine import FALLBACK, FUZZY_THRESHOLD, SEMANTIC_MAX_DISTANCE, STAGES, KnowledgeBaseStore, match_query
+
+EXPECTATIONS = ('answer', FALLBACK, 'gibberish', 'greeting')
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+OUT_OF_SCOPE = [
+    "What's the weather like in Berlin tomorrow?", "Book a table for two at an Italian restaurant",
+    "Who won the football match last night?", "Translate good night into Spanish",
+    "How many calories are in a banana?", "Recommend a movie for the weekend",
+    "What is the capital of Australia?", "Tell me a joke about cats",
+    "When is the next public holiday?", "How do I bake sourdough bread?",
+    "Can you order me a taxi to the airport?", "What's the share price of Apple today?",
+    "Suggest a name for my puppy", "How far is the moon from the earth?",
+    "Write a poem about autumn leaves", "Where can I buy cheap concert tickets?",
+    "How long should I boil an egg?", "Which plants grow well in shade?",
+    "Is it going to snow this weekend?", "Plan a three day trip to Rome",
+]
+GIBBERISH = [
+    "asdfghjkl", "qwe rty uiop", "!!!???", "zxcv bnm", "....", "12345 67890",
+    "#$%&", "a1 b2 c3 d4", "???", "x", "lkjh gfds 99", "%%% ###",
+]
+GREETINGS = [
+    "hello", "hi", "hey", "Hello there!", "good morning", "Good afternoon team",
+    "good evening", "how are you?", "thanks", "thank you so much", "bye", "goodbye for now",
+]
+_LEAD_INS = ("help with", "problem:", "issue -", "please fix", "")
+
+
+def _typo(word, rng):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def _words(question):
+    return question.rstrip('?.!').split()
+
+
+def perturb(question, rng, common):
+    # Only words shared by many KB questions (the phrasing, not the topic) are dropped or replaced,
+    # so the perturbed query still names what it asks about.
+    words = _words(question)
+    droppable = [i for i, w in enumerate(words) if w.lower() in common]
+    op = rng.randrange(4)
+    if op == 0:
+        dropped = set(rng.sample(droppable, min(len(droppable), len(words) // 3)))
+        words = [w for i, w in enumerate(words) if i not in dropped]
+    elif op == 1:
+        words = rng.sample(words, len(words))
+    elif op == 2:
+        for i in rng.sample(range(len(words)), min(2, len(words))):
+            words[i] = _typo(words[i], rng)
+    else:
+        lead = 0
+        while lead < len(words) // 2 and words[lead].lower() in common:
+            lead += 1
+        words = [rng.choice(_LEAD_INS)] + words[lead:]
+    return " ".join(w for w in words if w)
+
+
+def generate_queries(kb, seed=0, common_share=0.05):
+    rng = random.Random(seed)
+    questions = [kb.question(row) for row in range(len(kb))]
+    df = Counter(w for q in questions for w in {w.lower() for w in _words(q)})
+    common = {w for w, n in df.items() if n > common_share * len(questions)}
+    labeled = [{'query': perturb(q, rng, common), 'expect': 'answer', 'answer': kb.answer(row),
+                'kind': 'paraphrase'} for row, q in enumerate(questions)]
+    labeled += [{'query': q, 'expect': FALLBACK, 'kind': 'out_of_scope'} for q in OUT_OF_SCOPE]
+    labeled += [{'query': q, 'expect': 'gibberish', 'kind': 'gibberish'} for q in GIBBERISH]
+    labeled += [{'query': q, 'expect': 'greeting', 'kind': 'greeting'} for q in GREETINGS]
+    return labeled
+
+
+def read_labeled(path):
+    with open(path, encoding='utf-8') as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+    for n, record in enumerate(labeled, 1):
+        if record.get('expect') not in EXPECTATIONS:
+            raise ValueError(f"{path}:{n}: 'expect' must be one of {EXPECTATIONS}")
+        if record['expect'] == 'answer' and not record.get('answer'):
+            raise ValueError(f"{path}:{n}: 'expect': 'answer' needs the expected 'answer' text")
+        record.setdefault('kind', record['expect'])
+    return labeled
+
+
+def is_correct(record, match, kb):
+    if record['expect'] == 'answer':
+        return match.answered and kb.answer(match.row) == record['answer']
+    return match.stage == record['expect']
+
+
+def histogram(latencies):
+    counts = np.histogram(latencies, bins=(0,) + LATENCY_BUCKETS_MS + (np.inf,))[0]
+    labels = [f"le_{b:g}" for b in LATENCY_BUCKETS_MS] + ['inf']
+    return dict(zip(labels, counts.tolist()))
+
+
+def latency_summary(latencies):
+    return {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99), 'mean': float(np.mean(latencies)) if latencies else 0.0,
+            'histogram': histogram(latencies)}
+
+
+def evaluate(labeled, snapshot, encode_fn, top_k=0, fuzzy_threshold=FUZZY_THRESHOLD,
+             semantic_max_distance=SEMANTIC_MAX_DISTANCE):
+    kb = snapshot.knowledge_base
+    results = []
+    for record in labeled:
+        match = match_query(record['query'], snapshot, encode_fn, top_k=top_k, fuzzy_threshold=fuzzy_threshold,
+                            semantic_max_distance=semantic_max_distance)
+        results.append((record, match, is_correct(record, match, kb)))
+
+    kinds = {}
+    for kind in dict.fromkeys(r['kind'] for r in labeled):
+        hits = [ok for r, _, ok in results if r['kind'] == kind]
+        kinds[kind] = {'queries': len(hits), 'accuracy': sum(hits) / len(hits)}
+    stages = {}
+    for stage in STAGES:
+        at_stage = [(m, ok) for _, m, ok in results if m.stage == stage]
+        stages[stage] = {
+            'hits': len(at_stage),
+            'hit_rate': len(at_stage) / len(results),
+            'precision': sum(ok for _, ok in at_stage) / len(at_stage) if at_stage else None,
+            'latency_ms': latency_summary([m.elapsed_ms for m, _ in at_stage]),
+        }
+    confusion = {}
+    for record, match, _ in results:
+        row = confusion.setdefault(record['expect'], Counter())
+        row[match.stage] += 1
+    misses = [{'query': r['query'], 'kind': r['kind'], 'expect': r['expect'], 'stage': m.stage,
+               'answer': kb.answer(m.row) if m.answered else None}
+              for r, m, ok in results if not ok]
+    return {
+        'queries': len(results),
+        'accuracy': sum(ok for _, _, ok in results) / len(results),
+        'latency_ms': latency_summary([m.elapsed_ms for _, m, _ in results]),
+        'kinds': kinds,
+        'stages': stages,
+        'confusion': {expect: dict(row) for expect, row in confusion.items()},
+        'misses': misses,
+    }
+
+
+def print_report(config, report):
+    print(f"queries: {report['queries']}  accuracy: {report['accuracy']:.3f}  encoder: {config['encoder']}  "
+          f"fuzzy > {config['fuzzy_threshold']}  semantic distance <= {config['semantic_max_distance']}")
+    for kind, stats in report['kinds'].items():
+        print(f"  {kind:14s} {stats['queries']:5d} queries  accuracy {stats['accuracy']:.3f}")
+    print(f"  {'stage':10s} {'hits':>6s} {'rate':>7s} {'precision':>10s} {'p50':>9s} {'p95':>9s}")
+    for stage, stats in report['stages'].items():
+        precision = '-' if stats['precision'] is None else f"{stats['precision']:.3f}"
+        print(f"  {stage:10s} {stats['hits']:6d} {stats['hit_rate']:7.1%} {precision:>10s} "
+              f"{stats['latency_ms']['p50']:7.3f}ms {stats['latency_ms']['p95']:7.3f}ms")
+
+
+def compare(report, baseline, tolerance):
+    delta = report['accuracy'] - baseline['report']['accuracy']
+    print(f"vs. baseline: accuracy {delta:+.3f}")
+    for stage, stats in report['stages'].items():
+        before = baseline['report']['stages'].get(stage)
+        if before:
+            print(f"  {stage:10s} hit rate {stats['hit_rate'] - before['hit_rate']:+7.1%}  "
+                  f"p95 {stats['latency_ms']['p95'] - before['latency_ms']['p95']:+8.3f}ms")
+    return delta < -tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kb', default='dataset.xlsx')
+    parser.add_argument('--queries', help="labeled JSONL query set (default: generated from the KB)")
+    parser.add_argument('--write-queries', help="save the labeled query set used to this JSONL file")
+    parser.add_argument('--stub', action='store_true', help="use the offline hashing encoder")
+    parser.add_argument('--cache-dir', help="embedding cache directory (default: a temporary one)")
+    parser.add_argument('--index-backend', default='brute')
+    parser.add_argument('--top-k', type=int, default=0, help="evaluate the hybrid top-k path")
+    parser.add_argument('--fuzzy-threshold', type=float, default=FUZZY_THRESHOLD)
+    parser.add_argument('--semantic-max-distance', type=float, default=SEMANTIC_MAX_DISTANCE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="earlier --json results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.01, help="allowed accuracy drop vs. the baseline")
+    args = parser.parse_args()
+
+    encoder = load_encoder(args.stub)
+    workdir = None if args.cache_dir else tempfile.mkdtemp(prefix='kb_eval_')
+    try:
+        store = KnowledgeBaseStore(args.kb, encoder.encode, MODEL_NAME, args.cache_dir or workdir,
+                                   index_backend=args.index_backend)
+        snapshot = store.current
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    labeled = read_labeled(args.queries) if args.queries else generate_queries(snapshot.knowledge_base, args.seed)
+    if args.write_queries:
+        with open(args.write_queries, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in labeled)
+
+    config = {
+        'kb': os.path.basename(args.kb), 'kb_hash': snapshot.source_hash,
+        'queries': os.path.basename(args.queries) if args.queries else f"generated(seed={args.seed})",
+        'encoder': 'stub' if args.stub else MODEL_NAME, 'index_backend': args.index_backend, 'top_k': args.top_k,
+        'fuzzy_threshold': args.fuzzy_threshold, 'semantic_max_distance': args.semantic_max_distance,
+    }
+    report = evaluate(labeled, snapshot, encoder.encode, args.top_k, args.fuzzy_threshold, args.semantic_max_distance)
+    print_report(config, report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': config, 'report': report}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            print(f"accuracy dropped by more than {args.tolerance}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
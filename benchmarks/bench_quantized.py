@@ -0,0 +1,68 @@
+"""Memory and recall@1 of quantised (float16 / int8) KB vectors vs. float32.
+
+    python -m benchmarks.bench_quantized --sizes 10000 100000 --rerank 0 16 64
+    python -m benchmarks.bench_quantized --data questions --sizes 50000
+
+Builds the ``brute`` float32 index and the ``float16`` / ``int8`` indexes,
+with and without float32 re-ranking of the best ``rerank`` rows, and reports
+the bytes each index holds, recall@1 against the float32 answer and
+per-query latency. A row whose exact similarity ties the float32 answer
+counts as a hit. ``--data random`` uses the noisy random vectors of
+``bench_vector_index``; ``--data questions`` embeds synthetic KB questions and
+partial-question queries with the offline stub encoder, which gives many
+near-ties. Re-ranking reads the float32 rows from the embeddings the index was
+built from (in the app, the memory-mapped bundle); they are not counted as
+index memory.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_hybrid import make_queries
+from benchmarks.bench_vector_index import make_data, run
+from benchmarks.common import StubEncoder, percentile, synthetic_questions, timed
+from engine.vector_index import build_vector_index, normalize_rows
+
+
+def question_data(n, n_queries):
+    encode = StubEncoder().encode
+    return encode(synthetic_questions(n)), encode(make_queries(n, n_queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--rerank', type=int, nargs='+', default=[0, 16])
+    parser.add_argument('--data', choices=('random', 'questions'), default='random')
+    parser.add_argument('--noise', type=float, default=3.0,
+                        help="random data: query noise; higher means closer runner-up rows")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        if args.data == 'random':
+            kb, queries = make_data(n, args.dim, args.queries, noise=args.noise)
+        else:
+            kb, queries = question_data(n, args.queries)
+        baseline = build_vector_index(kb, 'brute')
+        truth, times = run(baseline, queries)
+        exact = normalize_rows(queries) @ baseline.vectors.T
+        best = exact[np.arange(len(queries)), truth]
+        full = baseline.vectors.nbytes
+        print(f"\nKB rows: {n} ({args.data})")
+        print(f"  {'backend':18s} {'memory':>10s} {'saved':>7s} {'recall@1':>9s} {'p50':>9s} {'p95':>9s}")
+        print(f"  {'brute (float32)':18s} {full / 2**20:8.1f}MB {0:6.0%} {1.0:9.3f} "
+              f"{percentile(times, 50):7.3f}ms {percentile(times, 95):7.3f}ms")
+        for backend in ('float16', 'int8'):
+            for rerank in args.rerank:
+                index, _ = timed(build_vector_index, kb, backend, rerank=rerank)
+                found, times = run(index, queries)
+                recall = float(np.mean(exact[np.arange(len(queries)), found] >= best - 1e-6))
+                label = f"{backend}/rerank={rerank}" if rerank else backend
+                print(f"  {label:18s} {index.nbytes / 2**20:8.1f}MB {1 - index.nbytes / full:6.0%} "
+                      f"{recall:9.3f} {percentile(times, 50):7.3f}ms {percentile(times, 95):7.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
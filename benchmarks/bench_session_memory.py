@@ -0,0 +1,88 @@
+"""Memory benchmark: 500 simulated sessions holding the knowledge base.
+
+    python -m benchmarks.bench_session_memory --sessions 500 --rows 5000
+
+Neither setup copies the KB per session. The original app loaded it once with
+``st.cache_resource`` and every session used that one object; modelled here
+as a reference to a shared DataFrame + vector index in each session's state.
+The store's sessions hold a version number into the ``KnowledgeBaseStore``
+instead. Both cost the same few hundred bytes per session on top of the one
+KB: versioning does not save per-session memory, it bounds what reloads keep
+alive. Shared references pin every replaced KB some session still holds,
+while the store retains at most ``retain`` versions. The benchmark reloads
+the sheet mid-run to show sessions moving to the new version. Uses the
+offline stub encoder.
+"""
+import argparse
+import copy
+import gc
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.common import MODEL_NAME, StubEncoder, synthetic_questions
+from engine.kb_store import KnowledgeBaseStore
+
+
+def write_sheet(path, rows, suffix="", answers=None):
+    questions = synthetic_questions(rows)
+    pd.DataFrame({
+        'questions': [q + suffix for q in questions],
+        'answers': answers or [f"Answer {i % 100}" for i in range(rows)],
+        'categories': [f"Category {i % 5}" for i in range(rows)],
+        'tags': ["tag, other" for _ in range(rows)],
+    }).to_excel(path, index=False)
+
+
+def measure(build_sessions):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = build_sessions()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return sessions, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kb_session_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        write_sheet(sheet, args.rows)
+        store = KnowledgeBaseStore(sheet, StubEncoder().encode, MODEL_NAME, os.path.join(workdir, 'cache'))
+        snapshot = store.current
+
+        shared_kb, kb_bytes = measure(lambda: {
+            'df': snapshot.knowledge_base.to_dataframe(), 'vector_index': copy.deepcopy(snapshot.vector_index)})
+        _, shared = measure(lambda: [{'kb': shared_kb} for _ in range(args.sessions)])
+        sessions, pointers = measure(lambda: [{'kb_version': store.version} for _ in range(args.sessions)])
+
+        print(f"rows: {args.rows}  sessions: {args.sessions}")
+        print(f"  the KB, held once in both setups : {kb_bytes / 2**20:8.2f} MiB")
+        print(f"  shared KB reference (original)   : {shared / 2**10:8.1f} KiB  ({shared / args.sessions:.0f} B/session)")
+        print(f"  KB version number                : {pointers / 2**10:8.1f} KiB  ({pointers / args.sessions:.0f} B/session)")
+
+        time.sleep(0.01)
+        write_sheet(sheet, args.rows, suffix=" v2")
+        store.refresh()
+        pinned = sum(store.snapshot(s['kb_version']).version == 1 for s in sessions)
+        for s in sessions:
+            s['kb_version'] = store.version
+        print(f"  after reload: store v{store.version}, {pinned} sessions still resolved v1 until their next message,"
+              f" retained versions {store.versions} (at most {store.retain})")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
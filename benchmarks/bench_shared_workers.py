@@ -0,0 +1,102 @@
+"""Memory of N serving workers: private KB copies vs. one shared, memory-mapped bundle.
+
+    python -m benchmarks.bench_shared_workers --workers 4 --rows 50000
+
+Starts N worker processes at once, each loading the KB the way a serving
+process does (``KnowledgeBaseStore`` + brute-force index) and answering a few
+queries, then reads every worker's ``/proc/<pid>/smaps_rollup`` while all of
+them are alive. ``private`` parses the sheet in each worker (the old
+behaviour); ``bundle`` attaches to the compiled bundle. Reported per worker:
+private memory above a bare interpreter that imported the engine, and memory
+shared with the other workers. Every row has its own answer of a few hundred
+characters, as in a real KB, since answers are the largest text column.
+Linux only; uses the offline stub encoder.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import MODEL_NAME, StubEncoder, synthetic_answers
+from benchmarks.bench_session_memory import write_sheet
+from engine import KnowledgeBaseStore, match_query
+from engine.embedding_cache import EmbeddingCache
+from engine.kb_bundle import compile_bundle
+
+
+def smaps_rollup(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'pss': fields.get('Pss', 0),
+    }
+
+
+def child(mode, sheet, workdir):
+    if mode != 'baseline':
+        encode = StubEncoder().encode
+        store = KnowledgeBaseStore(sheet, encode, MODEL_NAME, os.path.join(workdir, 'cache'),
+                                   use_bundle=(mode == 'bundle'))
+        snapshot = store.current
+        kb = snapshot.knowledge_base
+        for row in range(0, len(kb), max(1, len(kb) // 20)):
+            match_query(" ".join(kb.question(row).split()[::2]), snapshot, encode)
+    print('ready', flush=True)
+    sys.stdin.readline()
+
+
+def run_workers(mode, n, sheet, workdir):
+    workers = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_shared_workers', '--child', mode, sheet,
+                                 workdir], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(n)]
+    try:
+        for worker in workers:
+            if worker.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f"{mode} worker failed to start")
+        return [smaps_rollup(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    workdir = tempfile.mkdtemp(prefix='kb_workers_bench_')
+    try:
+        sheet = os.path.join(workdir, 'kb.xlsx')
+        write_sheet(sheet, args.rows, answers=synthetic_answers(args.rows))
+        cache_dir = os.path.join(workdir, 'cache')
+        # What the pre-fork parent does: compile once, before any worker starts.
+        compile_bundle(sheet, os.path.join(cache_dir, 'bundle'), StubEncoder().encode,
+                       EmbeddingCache(cache_dir, MODEL_NAME))
+        base = run_workers('baseline', 1, sheet, workdir)[0]
+        print(f"rows: {args.rows}  workers: {args.workers}")
+        for mode in ('private', 'bundle'):
+            stats = run_workers(mode, args.workers, sheet, workdir)
+            private = sum(s['private'] - base['private'] for s in stats) / len(stats)
+            shared = sum(s['shared'] - base['shared'] for s in stats) / len(stats)
+            pss = sum(s['pss'] for s in stats)
+            print(f"  {mode:8s} KB private/worker {private / 2**20:8.1f} MiB"
+                  f"  shared/worker {shared / 2**20:8.1f} MiB  total PSS {pss / 2**20:8.1f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Semantic-stage benchmark: recall@1 and per-query latency of each vector index
+backend against the original sklearn ``NearestNeighbors(metric='cosine')`` path.
+
+    python -m benchmarks.bench_vector_index --sizes 1000 10000 50000
+    python -m benchmarks.bench_vector_index --sizes 50000 --backends brute ivf --n-probe 4 16
+
+Uses random unit vectors (dim 384, the all-MiniLM-L6-v2 width) with queries
+drawn as noisy copies of KB rows, so no model is needed.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import percentile, timed
+from engine.vector_index import build_vector_index
+
+
+def make_data(n, dim, n_queries, seed=0, noise=0.6):
+    rng = np.random.default_rng(seed)
+    kb = rng.standard_normal((n, dim)).astype(np.float32)
+    rows = rng.integers(0, n, n_queries)
+    queries = kb[rows] + noise * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return kb, queries
+
+
+def run(index, queries):
+    times, found = [], []
+    for q in queries:
+        (_, indices), elapsed = timed(index.kneighbors, q[None, :])
+        times.append(elapsed * 1e3)
+        found.append(indices[0][0])
+    return np.array(found), times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--backends', nargs='+', default=['brute', 'ivf', 'hnsw'])
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[8])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        kb, queries = make_data(n, args.dim, args.queries)
+        baseline, build = timed(build_vector_index, kb, 'sklearn')
+        truth, times = run(baseline, queries)
+        print(f"\nKB rows: {n}")
+        print(f"  {'backend':14s} {'build':>8s} {'recall@1':>9s} {'p50':>9s} {'p95':>9s}")
+        print(f"  {'sklearn':14s} {build:7.2f}s {1.0:9.3f} {percentile(times, 50):7.3f}ms {percentile(times, 95):7.3f}ms")
+        for backend in args.backends:
+            configs = [(f'ivf/probe={p}', {'n_probe': p}) for p in args.n_probe] if backend == 'ivf' else [(backend, {})]
+            for label, options in configs:
+                try:
+                    index, build = timed(build_vector_index, kb, backend, **options)
+                except ImportError as e:
+                    print(f"  {label:14s} skipped: {e}")
+                    continue
+                found, times = run(index, queries)
+                recall = float(np.mean(found == truth))
+                print(f"  {label:14s} {build:7.2f}s {recall:9.3f} "
+                      f"{percentile(times, 50):7.3f}ms {percentile(times, 95):7.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
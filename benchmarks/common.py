@@ -0,0 +1,88 @@
+"""Shared helpers for the benchmark scripts (synthetic data, offline encoder, timing)."""
+import random
+import time
+import zlib
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+_TOPICS = [
+    "reset password", "unlock account", "vpn connection", "outlook email", "printer offline",
+    "laptop battery", "wifi drops", "sap login", "erp report", "software install",
+    "teams meeting", "shared drive", "monitor flicker", "keyboard not working", "license renewal",
+]
+_TEMPLATES = [
+    "How do I resolve {}?", "I'm facing an issue with {}.", "Need help with {}, please.",
+    "Can someone assist me regarding {}?", "What should I do if {} occurs?",
+]
+_ANSWER_STEPS = [
+    "Open the self-service portal and sign in with your network account.",
+    "Restart the device and make sure it is connected to the corporate network.",
+    "Clear the application cache, then sign out and sign back in.",
+    "Check the IT status page for known incidents before escalating.",
+    "Make sure the client is on the latest version from the software centre.",
+    "Ask your team lead to confirm your access in the approval workflow.",
+    "If the problem persists, raise a ticket with the service desk and attach a screenshot of the error.",
+]
+_WORDS = ("alpha beta gamma delta omega plant line shift office remote site floor team "
+          "vendor portal client server module device account desktop mobile").split()
+
+
+class StubEncoder:
+    """Deterministic hashing bag-of-words encoder standing in for SentenceTransformer.
+
+    Texts that share words get similar vectors, so recall numbers are meaningful,
+    and nothing has to be downloaded.
+    """
+
+    def __init__(self, dim=384, seed=0):
+        self.dim = dim
+        self.seed = seed
+
+    def encode(self, texts, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in str(text).lower().split():
+                h = zlib.crc32(token.strip('?.,!').encode('utf-8'), self.seed)
+                out[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+def load_encoder(stub):
+    if stub:
+        return StubEncoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+
+def synthetic_questions(n, seed=0):
+    rng = random.Random(seed)
+    questions = []
+    for i in range(n):
+        topic = rng.choice(_TOPICS)
+        extra = " ".join(rng.sample(_WORDS, 2))
+        questions.append(rng.choice(_TEMPLATES).format(f"{topic} {extra} {i}"))
+    return questions
+
+
+def synthetic_answers(n, seed=0):
+    """Distinct answers of a few hundred characters, like real KB articles."""
+    rng = random.Random(seed)
+    answers = []
+    for i in range(n):
+        steps = " ".join(rng.sample(_ANSWER_STEPS, 3))
+        answers.append(f"Article KB{i:06d}, {rng.choice(_TOPICS)} ({' '.join(rng.sample(_WORDS, 2))}): {steps}")
+    return answers
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values, dtype=np.float64), q)) if len(values) else 0.0
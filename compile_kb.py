@@ -0,0 +1,34 @@
+"""Compile the knowledge-base sheet into a binary bundle ahead of time.
+
+    python compile_kb.py dataset.xlsx
+    python compile_kb.py dataset.xlsx --encoder-backend onnx-int8 --model-dir models/all-MiniLM-L6-v2
+
+The bundle is keyed on the model and encoder backend; compile it with the
+backend the apps run.
+"""
+import argparse
+import os
+
+from engine.embedding_cache import EmbeddingCache
+from engine.encoders import ENCODER_BACKENDS, TORCH, encoder_cache_key, load_encoder
+from engine.kb_bundle import compile_bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the knowledge-base sheet into a binary bundle.")
+    parser.add_argument('source', nargs='?', default='dataset.xlsx')
+    parser.add_argument('--out', default=os.path.join('.kb_cache', 'bundle'))
+    parser.add_argument('--cache-dir', default='.kb_cache')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--encoder-backend', choices=ENCODER_BACKENDS, default=TORCH)
+    parser.add_argument('--model-dir', help="exported model for the onnx encoder backends")
+    args = parser.parse_args()
+
+    model = load_encoder(args.model, args.encoder_backend, args.model_dir)
+    cache = EmbeddingCache(args.cache_dir, encoder_cache_key(args.model, args.encoder_backend))
+    path = compile_bundle(args.source, args.out, model.encode, cache)
+    print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
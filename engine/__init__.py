@@ -0,0 +1,19 @@
+"""Retrieval engine for the IT support bot: knowledge-base loading, indexes and
+the matching pipeline, importable without Streamlit."""
+from .encoder_service import EncoderService
+from .encoders import ENCODER_BACKENDS, encoder_cache_key, load_encoder
+from .kb_store import KBSnapshot, KnowledgeBaseError, KnowledgeBaseStore
+from .knowledge_base import KnowledgeBase
+from .metrics import METRICS, PipelineMetrics, start_metrics_server
+from .pipeline import (FALLBACK, FUZZY, FUZZY_THRESHOLD, GIBBERISH, GREETING, SEMANTIC, SEMANTIC_MAX_DISTANCE,
+                       STAGES, Candidate, Match, fuse, match_batch, match_query)
+from .query_cache import QueryCache, cached
+from .static_assets import publish_stylesheet
+
+__all__ = [
+    'EncoderService', 'KBSnapshot', 'KnowledgeBase', 'KnowledgeBaseError', 'KnowledgeBaseStore',
+    'ENCODER_BACKENDS', 'encoder_cache_key', 'load_encoder',
+    'METRICS', 'PipelineMetrics', 'start_metrics_server', 'publish_stylesheet',
+    'Candidate', 'Match', 'QueryCache', 'cached', 'fuse', 'match_batch', 'match_query',
+    'STAGES', 'GIBBERISH', 'GREETING', 'FUZZY', 'SEMANTIC', 'FALLBACK', 'FUZZY_THRESHOLD', 'SEMANTIC_MAX_DISTANCE',
+]
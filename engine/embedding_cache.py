@@ -0,0 +1,90 @@
+"""Persistent on-disk cache of knowledge-base question embeddings.
+
+Each model gets its own directory holding ``embeddings.npy`` (float32, one row
+per question in sheet order) and ``manifest.json`` (model name plus a hash of
+every question string). On startup only questions whose hash is not in the
+manifest are encoded; when nothing changed the matrix is memory-mapped as is.
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+MANIFEST_FILE = 'manifest.json'
+EMBEDDINGS_FILE = 'embeddings.npy'
+
+
+def question_key(text):
+    return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, model_name):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r'[^\w.-]+', '_', model_name))
+        self.stats = {'cached': 0, 'encoded': 0}
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILE), encoding='utf-8') as f:
+                manifest = json.load(f)
+            matrix = np.load(os.path.join(self.path, EMBEDDINGS_FILE), mmap_mode='r')
+        except (OSError, ValueError):
+            return [], None
+        keys = manifest.get('keys', [])
+        if manifest.get('model') != self.model_name or matrix.ndim != 2 or matrix.shape[0] != len(keys):
+            return [], None
+        return keys, matrix
+
+    def _save(self, keys, matrix):
+        os.makedirs(self.path, exist_ok=True)
+        # Write to temp files and rename so a crash never leaves a torn cache;
+        # readers still holding the old memory map keep their snapshot. Temp
+        # names are per process, so worker processes saving at once never
+        # write into each other's files.
+        tmp_matrix = os.path.join(self.path, f'{EMBEDDINGS_FILE}.tmp-{os.getpid()}')
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_matrix, os.path.join(self.path, EMBEDDINGS_FILE))
+        tmp_manifest = os.path.join(self.path, f'{MANIFEST_FILE}.tmp-{os.getpid()}')
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model_name, 'dim': int(matrix.shape[1]), 'keys': keys}, f)
+        os.replace(tmp_manifest, os.path.join(self.path, MANIFEST_FILE))
+
+    def encode(self, questions, encode_fn):
+        """Return a float32 (len(questions), dim) matrix, encoding only unseen questions."""
+        keys = [question_key(q) for q in questions]
+        cached_keys, cached = self._load()
+        if cached is not None and cached_keys == keys:
+            self.stats = {'cached': len(keys), 'encoded': 0}
+            return cached
+
+        position = {k: i for i, k in enumerate(cached_keys)}
+        missing = {}
+        for q, k in zip(questions, keys):
+            if k not in position and k not in missing:
+                missing[k] = q
+        new_rows = {}
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            new_rows = dict(zip(missing.keys(), encoded))
+
+        if cached is not None:
+            dim = cached.shape[1]
+        elif new_rows:
+            dim = len(next(iter(new_rows.values())))
+        else:
+            dim = 0
+        matrix = np.empty((len(keys), dim), dtype=np.float32)
+        source = np.array([position.get(k, -1) for k in keys], dtype=np.int64)
+        hit = source >= 0
+        if hit.any():
+            matrix[hit] = cached[source[hit]]
+        for i in np.flatnonzero(~hit):
+            matrix[i] = new_rows[keys[i]]
+
+        self.stats = {'cached': int(hit.sum()), 'encoded': len(missing)}
+        self._save(keys, matrix)
+        return np.load(os.path.join(self.path, EMBEDDINGS_FILE), mmap_mode='r')
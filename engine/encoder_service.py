@@ -0,0 +1,104 @@
+"""Micro-batching query encoder with an LRU cache of query embeddings.
+
+Wraps a ``SentenceTransformer``-style ``encode(list_of_texts)`` callable.
+Concurrent ``encode`` calls from different sessions are queued and a single
+worker thread sends them to the model together: a batch closes when it holds
+``max_batch_size`` texts or ``max_wait_ms`` after its first request arrived.
+One transformer call for N queries is much cheaper than N calls, and
+repeated queries skip the model entirely through the embedding cache.
+
+``EncoderService.encode`` is a drop-in replacement for ``model.encode``.
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EncoderService:
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5.0, cache_size=4096):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self.batches = 0
+        self.batched_texts = 0
+        self.cache_hits = 0
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='encoder-service', daemon=True)
+        self._worker.start()
+
+    def _cached(self, text):
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.cache_hits += 1
+            return vector
+
+    def _remember(self, texts, vectors):
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            for text, vector in zip(texts, vectors):
+                self._cache[text] = vector
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def encode(self, texts):
+        texts = [str(t) for t in texts]
+        vectors = [self._cached(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            future = Future()
+            self._queue.put((missing, future))
+            encoded = dict(zip(missing, future.result()))
+            vectors = [encoded[t] if v is None else v for t, v in zip(texts, vectors)]
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def _collect(self):
+        requests = [self._queue.get()]
+        size = len(requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[0])
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            texts = list(dict.fromkeys(t for batch, _ in requests for t in batch))
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_texts += len(texts)
+            self._remember(texts, vectors)
+            by_text = dict(zip(texts, vectors))
+            for batch, future in requests:
+                future.set_result([by_text[t] for t in batch])
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'mean_batch_size': self.batched_texts / self.batches if self.batches else 0.0,
+            'cache_hits': self.cache_hits,
+            'cache_size': len(self._cache),
+        }
@@ -0,0 +1,163 @@
+"""Pluggable sentence encoders for the KB questions and user queries.
+
+``load_encoder(model_name, backend, model_dir)`` returns an object whose
+``encode(texts)`` maps a list of strings to a float32 matrix, one row per
+text, like ``SentenceTransformer.encode``:
+
+* ``torch``      ``SentenceTransformer(model_name)``, full precision (default);
+* ``onnx``       ONNX Runtime on the model exported to ``model_dir``;
+* ``onnx-int8``  the same graph with weights dynamically quantised to int8.
+
+The ONNX backends run the exported transformer and repeat the model's mean
+pooling and normalisation in numpy. They need ``onnxruntime`` and
+``tokenizers``; ``export_onnx`` (needs torch and sentence-transformers too)
+writes the tokenizer, ``model.onnx`` and ``model.int8.onnx``, see
+``export_encoder.py``.
+
+Every backend gives slightly different vectors, so KB embeddings must come
+from the backend that encodes the queries. ``encoder_cache_key`` names the
+embedding cache and KB bundle after both model and backend (the ``torch``
+key is the bare model name, so existing caches stay valid): switching
+backends re-encodes the KB instead of mixing vectors. ``parity_report``
+compares a backend with the PyTorch model on the same texts.
+"""
+import json
+import os
+
+import numpy as np
+
+from .vector_index import normalize_rows
+
+TORCH = 'torch'
+ONNX = 'onnx'
+ONNX_INT8 = 'onnx-int8'
+ENCODER_BACKENDS = (TORCH, ONNX, ONNX_INT8)
+ONNX_MODEL_FILES = {ONNX: 'model.onnx', ONNX_INT8: 'model.int8.onnx'}
+TOKENIZER_FILE = 'tokenizer.json'
+CONFIG_FILE = 'encoder_config.json'
+# A backend passes when no text's embedding drifts below this cosine similarity to the PyTorch one.
+PARITY_MIN_COSINE = 0.99
+
+
+def encoder_cache_key(model_name, backend=TORCH):
+    """Name for the embedding cache / KB bundle of ``model_name`` encoded by ``backend``."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {list(ENCODER_BACKENDS)}")
+    return model_name if backend == TORCH else f"{model_name}+{backend}"
+
+
+class OnnxEncoder:
+    """Mean-pooled, L2-normalised sentence embeddings from an exported transformer."""
+
+    def __init__(self, model_dir, backend=ONNX, threads=0):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError(f"The '{backend}' encoder backend requires the onnxruntime and tokenizers packages")
+        with open(os.path.join(model_dir, CONFIG_FILE), encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(self.config['max_seq_length'])
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, ONNX_MODEL_FILES[backend]), options,
+                                                    providers=['CPUExecutionProvider'])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        texts = [str(t) for t in texts]
+        out = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        return np.concatenate(out) if out else np.zeros((0, self.config['dim']), dtype=np.float32)
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.zeros((len(encodings), max(len(e.ids) for e in encodings)), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for row, encoding in enumerate(encodings):
+            ids[row, :len(encoding.ids)] = encoding.ids
+            mask[row, :len(encoding.ids)] = 1
+        feed = {'input_ids': ids, 'attention_mask': mask}
+        if 'token_type_ids' in self.inputs:
+            feed['token_type_ids'] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        pooled = np.einsum('bsd,bs->bd', hidden, mask.astype(np.float32)) / mask.sum(axis=1, keepdims=True)
+        return normalize_rows(pooled)
+
+
+def load_sentence_transformer(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def load_encoder(model_name, backend=TORCH, model_dir=None, threads=0):
+    """The encoder for ``backend``; the ONNX backends read ``model_dir``, which
+    must hold an export of ``model_name``."""
+    encoder_cache_key(model_name, backend)
+    if backend == TORCH:
+        return load_sentence_transformer(model_name)
+    if not model_dir:
+        raise ValueError(f"The '{backend}' encoder backend needs the directory of an exported model")
+    encoder = OnnxEncoder(model_dir, backend, threads)
+    if encoder.config.get('model') != model_name:
+        raise ValueError(f"{model_dir} holds an export of '{encoder.config.get('model')}', not '{model_name}'")
+    return encoder
+
+
+def export_onnx(model_name, model_dir, opset=14, quantize=True):
+    """Export ``model_name``'s transformer to ONNX in ``model_dir`` (plus the int8
+    copy when ``quantize``) with its tokenizer; returns the written file names."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = load_sentence_transformer(model_name)
+    modules = list(model)
+    pooling = modules[1] if len(modules) > 1 else None
+    if getattr(pooling, 'pooling_mode_mean_tokens', False) is not True or \
+            type(modules[-1]).__name__ != 'Normalize':
+        raise ValueError(f"'{model_name}' is not a mean-pooled, normalised model; the ONNX encoder cannot replicate it")
+    transformer = modules[0].auto_model.eval()
+    os.makedirs(model_dir, exist_ok=True)
+    model.tokenizer.save_pretrained(model_dir)
+    sample = model.tokenizer(["How do I reset my password?"], return_tensors='pt')
+    names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    axes = {name: {0: 'batch', 1: 'sequence'} for name in names + ['last_hidden_state']}
+    path = os.path.join(model_dir, ONNX_MODEL_FILES[ONNX])
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(sample[name] for name in names), path, input_names=names,
+                          output_names=['last_hidden_state'], dynamic_axes=axes, opset_version=opset)
+    written = [TOKENIZER_FILE, ONNX_MODEL_FILES[ONNX]]
+    if quantize:
+        quantize_dynamic(path, os.path.join(model_dir, ONNX_MODEL_FILES[ONNX_INT8]), weight_type=QuantType.QInt8)
+        written.append(ONNX_MODEL_FILES[ONNX_INT8])
+    with open(os.path.join(model_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'model': model_name, 'max_seq_length': int(model.max_seq_length),
+                   'dim': int(model.get_sentence_embedding_dimension())}, f)
+    return written + [CONFIG_FILE]
+
+
+def parity_report(reference, candidate, k=1):
+    """Compare two embedding matrices of the same texts: per-text cosine
+    similarity between them, the largest change of any pairwise similarity
+    between texts (what KB scores are made of) and how often each text's
+    ``k`` nearest other texts are the same."""
+    reference, candidate = normalize_rows(reference), normalize_rows(candidate)
+    cosine = np.einsum('ij,ij->i', reference, candidate)
+    ref_sim, cand_sim = reference @ reference.T, candidate @ candidate.T
+    others = ~np.eye(len(reference), dtype=bool)
+    delta = float(np.abs(ref_sim - cand_sim)[others].max()) if others.any() else 0.0
+    np.fill_diagonal(ref_sim, -np.inf)
+    np.fill_diagonal(cand_sim, -np.inf)
+    k = min(k, len(reference) - 1)
+    ref_top = np.argsort(-ref_sim, axis=1)[:, :k]
+    cand_top = np.argsort(-cand_sim, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)] if k > 0 else [1.0]
+    return {
+        'texts': len(reference),
+        'min_cosine': float(cosine.min()),
+        'mean_cosine': float(cosine.mean()),
+        'max_similarity_delta': delta,
+        'neighbour_agreement': float(np.mean(overlap)),
+        'passed': bool(cosine.min() >= PARITY_MIN_COSINE),
+    }
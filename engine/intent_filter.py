@@ -0,0 +1,83 @@
+"""Gibberish and greeting pre-filters, compiled once at import.
+
+``is_greeting`` returns the first greeting (in ``GREETINGS`` order) with
+``fuzz.partial_ratio(greeting, text.lower()) > 80``, exactly as before, but
+skips the ``partial_ratio`` calls that provably cannot succeed.
+
+partial_ratio scores the shorter string ``s`` (length m) against windows of
+the longer one. A score above 80 needs a Levenshtein ratio of at least 0.805
+against some window, i.e. a common subsequence of ``L >= 0.805 / 1.195 * m``
+characters (windows truncated at the end of the text included). Each unmatched
+character on either side can split that subsequence only once, so it consists
+of at most ``2 * (m - L) + 1`` contiguous runs, and the two strings must share
+a substring of ``q = ceil(L / (2 * (m - L) + 1))`` characters. For every
+greeting ``q`` and its q-grams are computed once; per message the filter is a
+few substring tests, and only greetings sharing a q-gram with the text are
+scored for real. For "hi", "hey", "sup" and "bye" q is the whole greeting.
+"""
+import math
+import re
+
+from fuzzywuzzy import fuzz
+
+GREETINGS = [
+    "hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening",
+    "how are you", "what's up", "sup", "thank you", "thanks", "bye", "goodbye"
+]
+GREETING_THRESHOLD = 80
+
+_SYMBOLS_ONLY = re.compile(r'[^\w\s]+')
+_MIN_COMMON_SHARE = 0.805 / 1.195
+
+
+def is_gibberish(text):
+    text = text.strip()
+    if len(text) < 2 or len(set(text)) < 3 or _SYMBOLS_ONLY.fullmatch(text):
+        return True
+    words = text.split()
+    if len(words) > 0 and sum(1 for w in words if not w.isalpha()) / len(words) > 0.5:
+        return True
+    return False
+
+
+def _shared_run_length(m):
+    # Shortest common substring any match above the threshold must contain.
+    min_common = math.ceil(_MIN_COMMON_SHARE * m - 1e-9)
+    return math.ceil(min_common / (2 * (m - min_common) + 1))
+
+
+def _qgrams(text, q):
+    return {text[i:i + q] for i in range(len(text) - q + 1)}
+
+
+class GreetingMatcher:
+    def __init__(self, greetings, threshold=GREETING_THRESHOLD):
+        self.threshold = threshold
+        self.greetings = []
+        for greeting in greetings:
+            q = _shared_run_length(len(greeting))
+            self.greetings.append((greeting, len(greeting), tuple(_qgrams(greeting, q))))
+
+    @staticmethod
+    def _may_match(greeting, m, qgrams, text):
+        if len(text) >= m:
+            return any(g in text for g in qgrams)
+        # The text is the shorter string: one of its own q-grams must occur in the greeting.
+        q = _shared_run_length(len(text))
+        return any(text[i:i + q] in greeting for i in range(len(text) - q + 1))
+
+    def match(self, text):
+        text = text.lower()
+        if not text:
+            return None
+        for greeting, m, qgrams in self.greetings:
+            if self._may_match(greeting, m, qgrams, text) and fuzz.partial_ratio(greeting, text) > self.threshold:
+                return greeting
+        return None
+
+
+_GREETING_MATCHER = GreetingMatcher(GREETINGS)
+
+
+def is_greeting(text):
+    return _GREETING_MATCHER.match(text)
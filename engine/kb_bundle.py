@@ -0,0 +1,228 @@
+"""Compiled binary knowledge-base bundle.
+
+``pd.read_excel`` is the slowest part of a cold start, so the sheet is
+compiled once into a directory of raw ``.npy`` arrays and UTF-8 string blobs
+(text columns, interned codes, embeddings and the lexical index) that load
+with ``np.load(mmap_mode='r')``: nothing is parsed, and pages are shared by
+every process reading the same bundle. Embeddings are stored unit-normalised
+so the brute-force vector index searches the mapping itself; N worker
+processes hold one copy of the KB in the page cache, not N.
+
+Layout::
+
+    <bundle_dir>/CURRENT            name of the active build directory
+    <bundle_dir>/<build>/manifest.json
+    <bundle_dir>/<build>/*.npy, *.bin
+
+    <bundle_dir>/LOCK               held (``flock``) while a build compiles
+
+A build is written to a fresh directory and published by atomically
+rewriting ``CURRENT``, so readers never see a half-written bundle. The bundle
+is stale when the source sheet's size/mtime and content hash or the model
+name no longer match the manifest; the store then recompiles from the xlsx.
+Processes sharing a bundle directory (``answer_api.py --processes N``)
+compile one at a time: the first takes ``LOCK`` and compiles, the others wait
+for it and attach to the build it published. Where ``fcntl`` is unavailable
+(Windows) there is no lock and concurrent compiles only cost time: temp names
+are unique per process and a build that already exists is never replaced.
+
+Compile by hand with ``python compile_kb.py dataset.xlsx``.
+"""
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+
+from .knowledge_base import KnowledgeBase, file_digest, read_sheet
+from .lexical_index import LexicalIndex
+from .vector_index import normalize_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FORMAT_VERSION = 2
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = 'LOCK'
+KEEP_BUILDS = 2
+
+
+class StringColumn:
+    """Read-only sequence of strings decoded on access from a UTF-8 blob."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def encode(cls, strings):
+        data = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(data) + 1, dtype=np.int64)
+        np.cumsum([len(d) for d in data], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(data), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def _write_strings(path, name, strings):
+    column = strings if isinstance(strings, StringColumn) else StringColumn.encode(strings)
+    with open(os.path.join(path, name + '.bin'), 'wb') as f:
+        f.write(column.blob.tobytes())
+    np.save(os.path.join(path, name + '.offsets.npy'), column.offsets)
+
+
+def _read_strings(path, name):
+    blob_path = os.path.join(path, name + '.bin')
+    if os.path.getsize(blob_path):
+        blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+    else:
+        blob = np.zeros(0, dtype=np.uint8)
+    return StringColumn(blob, np.load(os.path.join(path, name + '.offsets.npy'), mmap_mode='r'))
+
+
+def _source_info(source_path):
+    stat = os.stat(source_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_digest(source_path)}
+
+
+def current_build(bundle_dir):
+    try:
+        with open(os.path.join(bundle_dir, CURRENT_FILE), encoding='utf-8') as f:
+            path = os.path.join(bundle_dir, f.read().strip())
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+            return path, json.load(f)
+    except (OSError, ValueError):
+        return None, None
+
+
+def is_fresh(manifest, source_path, model_name):
+    if not manifest or manifest.get('format') != FORMAT_VERSION or manifest.get('model') != model_name:
+        return False
+    stat = os.stat(source_path)
+    source = manifest['source']
+    if (stat.st_size, stat.st_mtime_ns) == (source['size'], source['mtime_ns']):
+        return True
+    return file_digest(source_path) == source['sha256']
+
+
+def write_bundle(bundle_dir, knowledge_base, lexical_index, source, model_name):
+    build = f"{source['sha256'][:16]}-v{FORMAT_VERSION}-{model_name.replace('/', '_')}"
+    path = os.path.join(bundle_dir, build)
+    tmp = path + f'.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    kb = knowledge_base
+    _write_strings(tmp, 'questions', kb.questions)
+    _write_strings(tmp, 'answer_texts', kb.answer_texts)
+    _write_strings(tmp, 'category_names', kb.category_names)
+    _write_strings(tmp, 'tag_names', kb.tag_names)
+    _write_strings(tmp, 'lexical_keys', lexical_index.keys)
+    for name in ('answer_codes', 'category_codes', 'tag_codes', 'tag_offsets'):
+        np.save(os.path.join(tmp, name + '.npy'), np.ascontiguousarray(getattr(kb, name)))
+    np.save(os.path.join(tmp, 'embeddings.npy'), normalize_rows(kb.embeddings))
+    np.save(os.path.join(tmp, 'lexical_lengths.npy'), lexical_index.lengths)
+    np.save(os.path.join(tmp, 'lexical_counts.npy'), lexical_index.counts)
+    manifest = {
+        'format': FORMAT_VERSION, 'model': model_name, 'source': source, 'rows': len(kb),
+        'dim': int(kb.embeddings.shape[1]), 'lexical_vocab': lexical_index.vocab,
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # The same sheet, format and model were already built; readers may have
+        # that build mapped, so keep it and drop this copy.
+        shutil.rmtree(tmp, ignore_errors=True)
+    pointer = os.path.join(bundle_dir, f'{CURRENT_FILE}.tmp-{os.getpid()}')
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(build)
+    os.replace(pointer, os.path.join(bundle_dir, CURRENT_FILE))
+    _prune(bundle_dir, build)
+    return path
+
+
+def _prune(bundle_dir, keep):
+    # Open memory maps of a removed build stay valid, so pruning is safe while
+    # older snapshots are still serving.
+    builds = [d for d in os.listdir(bundle_dir)
+              if os.path.isdir(os.path.join(bundle_dir, d)) and '.tmp-' not in d and d != keep]
+    builds.sort(key=lambda d: os.path.getmtime(os.path.join(bundle_dir, d)), reverse=True)
+    for stale in builds[KEEP_BUILDS - 1:]:
+        shutil.rmtree(os.path.join(bundle_dir, stale), ignore_errors=True)
+
+
+def read_bundle(path, manifest):
+    """Memory-map a bundle build into a ``(KnowledgeBase, LexicalIndex)`` pair."""
+    def array(name):
+        return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+    # Questions and answers (the large text columns) stay memory-mapped and
+    # decode per access; only the short name lists become Python strings.
+    knowledge_base = KnowledgeBase.from_arrays(
+        questions=_read_strings(path, 'questions'),
+        answer_texts=_read_strings(path, 'answer_texts'),
+        category_names=tuple(_read_strings(path, 'category_names')),
+        tag_names=tuple(_read_strings(path, 'tag_names')),
+        answer_codes=array('answer_codes'),
+        category_codes=array('category_codes'),
+        tag_codes=array('tag_codes'),
+        tag_offsets=array('tag_offsets'),
+        embeddings=array('embeddings'),
+    )
+    lexical_index = LexicalIndex.from_arrays(
+        _read_strings(path, 'lexical_keys'), array('lexical_lengths'),
+        manifest['lexical_vocab'], array('lexical_counts'))
+    return knowledge_base, lexical_index
+
+
+@contextmanager
+def compile_lock(bundle_dir):
+    """Hold the bundle directory's exclusive compile lock (blocking)."""
+    os.makedirs(bundle_dir, exist_ok=True)
+    with open(os.path.join(bundle_dir, LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _compile(source_path, bundle_dir, encode_fn, cache):
+    source = _source_info(source_path)
+    df = read_sheet(source_path)
+    embeddings = cache.encode(df['questions'].astype(str).tolist(), encode_fn)
+    knowledge_base = KnowledgeBase.from_dataframe(df, embeddings)
+    return write_bundle(bundle_dir, knowledge_base, LexicalIndex(knowledge_base.questions), source, cache.model_name)
+
+
+def compile_bundle(source_path, bundle_dir, encode_fn, cache):
+    """Parse the sheet, encode it through the ``EmbeddingCache`` and write a new bundle build."""
+    with compile_lock(bundle_dir):
+        return _compile(source_path, bundle_dir, encode_fn, cache)
+
+
+def load_or_compile(source_path, bundle_dir, encode_fn, cache):
+    """Return ``(KnowledgeBase, LexicalIndex, manifest)``, recompiling only when the
+    bundle is stale and no other process compiled it while this one waited."""
+    path, manifest = current_build(bundle_dir)
+    if not is_fresh(manifest, source_path, cache.model_name):
+        with compile_lock(bundle_dir):
+            path, manifest = current_build(bundle_dir)
+            if not is_fresh(manifest, source_path, cache.model_name):
+                _compile(source_path, bundle_dir, encode_fn, cache)
+                path, manifest = current_build(bundle_dir)
+    knowledge_base, lexical_index = read_bundle(path, manifest)
+    return knowledge_base, lexical_index, manifest
+
@@ -0,0 +1,235 @@
+"""Hot-reloadable knowledge base.
+
+``KnowledgeBaseStore`` owns the current ``KBSnapshot`` (the array-backed
+``KnowledgeBase`` plus vector and lexical indexes). A background watcher
+polls the sheet's mtime/size, confirms a real change with a content hash,
+rebuilds a new snapshot (only new or edited questions are re-encoded, via
+the embedding cache) and swaps it in with a single reference assignment. Queries that
+already grabbed the old snapshot finish against it undisturbed.
+
+Snapshots are immutable and numbered. The store is the only owner; sessions
+keep just the version number and resolve it with ``snapshot(version)``, so KB
+memory does not grow with the number of sessions. ``search_space`` narrows a
+snapshot to one category and/or tag filter; those partitions are built on
+first use and kept per snapshot (LRU bounded by ``PARTITION_CACHE_BYTES``;
+a partition holds only its row ids, see ``partitions``).
+
+A store created without an encoder (``encode_fn=None``) starts lexical-only:
+its snapshots have no vector index and the pipeline stops at the fuzzy stage.
+It reads the compiled bundle when that is fresh and the sheet otherwise,
+without encoding anything, so a front-end can serve before the model has
+loaded. ``set_encoder`` then swaps in a full snapshot as the next version.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+from .kb_bundle import current_build, is_fresh, load_or_compile, read_bundle
+from .knowledge_base import KnowledgeBase, KnowledgeBaseError, file_digest, read_sheet
+from .lexical_index import LexicalIndex
+from .partitions import build_partition
+from .vector_index import build_vector_index
+
+logger = logging.getLogger(__name__)
+
+# Row ids kept for cached partitions, per snapshot (int32: 4 bytes a row).
+PARTITION_CACHE_BYTES = 16 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class KBSnapshot:
+    version: int
+    knowledge_base: KnowledgeBase
+    vector_index: object            # None for a lexical-only snapshot
+    lexical_index: LexicalIndex
+    source_hash: str
+    loaded_at: float
+
+    _partitions: OrderedDict = field(default_factory=OrderedDict, init=False, repr=False, compare=False)
+    _partition_lock: object = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def answer(self, row):
+        return self.knowledge_base.answer(row)
+
+    def search_space(self, category=None, tags=()):
+        """The indexes to search: this snapshot, or the partition of rows in
+        ``category`` carrying any of ``tags``. A filter matching no rows
+        searches the whole KB."""
+        if not category and not tags:
+            return self
+        key = (category, tuple(sorted(tags)))
+        with self._partition_lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                self._partitions.move_to_end(key)
+                return partition
+        rows = self.knowledge_base.select_rows(category, tags)
+        if not len(rows):
+            return self
+        partition = build_partition(self.lexical_index, self.vector_index, rows)
+        _freeze(partition.rows)
+        with self._partition_lock:
+            self._partitions[key] = partition
+            # The newest partition stays even when it alone is over the bound.
+            while len(self._partitions) > 1 and \
+                    sum(p.nbytes for p in self._partitions.values()) > PARTITION_CACHE_BYTES:
+                self._partitions.popitem(last=False)
+        return partition
+
+
+def _freeze(*objects):
+    # Mark every array reachable from the snapshot read-only so a session can
+    # never mutate state shared with all other sessions.
+    for obj in objects:
+        if obj is None:
+            continue
+        arrays = [obj] if isinstance(obj, np.ndarray) else list(vars(obj).values())
+        for value in arrays:
+            if isinstance(value, np.ndarray) and value.flags.writeable:
+                value.setflags(write=False)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class KnowledgeBaseStore:
+    def __init__(self, path, encode_fn, model_name, cache_dir, index_backend='brute', index_options=None,
+                 retain=2, use_bundle=True):
+        self.path = path
+        self.bundle_dir = os.path.join(cache_dir, 'bundle') if use_bundle else None
+        self.encode_fn = encode_fn
+        self.index_backend = index_backend
+        self.index_options = index_options or {}
+        self.retain = retain
+        self.cache = EmbeddingCache(cache_dir, model_name)
+        self.last_error = None
+        self.last_reload = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._listeners = []
+        self._signature = _file_signature(path)
+        self._snapshot = self._build(1, file_digest(path))
+        self._history = OrderedDict([(1, self._snapshot)])
+
+    @property
+    def current(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    @property
+    def versions(self):
+        return list(self._history)
+
+    def snapshot(self, version=None):
+        """Return the snapshot for ``version`` while it is retained, else the current one."""
+        if version is None:
+            return self._snapshot
+        return self._history.get(version, self._snapshot)
+
+    def _build(self, version, source_hash):
+        if self.encode_fn is None:
+            return self._build_lexical(version, source_hash)
+        if self.bundle_dir:
+            # Memory-map the compiled bundle; the sheet is parsed only when it is stale.
+            knowledge_base, lexical_index, _ = load_or_compile(self.path, self.bundle_dir, self.encode_fn, self.cache)
+        else:
+            df = read_sheet(self.path)
+            embeddings = self.cache.encode(df['questions'].astype(str).tolist(), self.encode_fn)
+            knowledge_base = KnowledgeBase.from_dataframe(df, embeddings)
+            lexical_index = LexicalIndex(knowledge_base.questions)
+        vector_index = build_vector_index(knowledge_base.embeddings, self.index_backend, **self.index_options)
+        _freeze(knowledge_base, vector_index, lexical_index)
+        return KBSnapshot(version, knowledge_base, vector_index, lexical_index, source_hash, time.time())
+
+    def _build_lexical(self, version, source_hash):
+        path, manifest = current_build(self.bundle_dir) if self.bundle_dir else (None, None)
+        if is_fresh(manifest, self.path, self.cache.model_name):
+            knowledge_base, lexical_index = read_bundle(path, manifest)
+        else:
+            knowledge_base = KnowledgeBase.from_dataframe(read_sheet(self.path))
+            lexical_index = LexicalIndex(knowledge_base.questions)
+        _freeze(knowledge_base, lexical_index)
+        return KBSnapshot(version, knowledge_base, None, lexical_index, source_hash, time.time())
+
+    def _swap(self, snapshot, start):
+        self._snapshot = snapshot
+        self._history[snapshot.version] = snapshot
+        while len(self._history) > self.retain:
+            self._history.popitem(last=False)
+        self.last_reload = dict(self.cache.stats, version=snapshot.version,
+                                rows=len(snapshot.knowledge_base), seconds=time.perf_counter() - start)
+        logger.info("Knowledge base reloaded: %s", self.last_reload)
+
+    def set_encoder(self, encode_fn):
+        """Use ``encode_fn`` from now on and swap in a snapshot built with it
+        (embeddings and vector index) as the next version, even when the sheet
+        is unchanged, so nothing cached against a lexical-only version lingers."""
+        with self._lock:
+            self.encode_fn = encode_fn
+            start = time.perf_counter()
+            signature = _file_signature(self.path)
+            snapshot = self._build(self._snapshot.version + 1, file_digest(self.path))
+            self._signature = signature
+            self._swap(snapshot, start)
+        self._notify(snapshot)
+        return snapshot
+
+    def refresh(self):
+        """Reload the sheet if it changed on disk. Returns True when a new snapshot was swapped in."""
+        with self._lock:
+            signature = _file_signature(self.path)
+            if signature == self._signature:
+                return False
+            source_hash = file_digest(self.path)
+            if source_hash == self._snapshot.source_hash:
+                self._signature = signature
+                return False
+            start = time.perf_counter()
+            snapshot = self._build(self._snapshot.version + 1, source_hash)
+            self._signature = signature
+            self._swap(snapshot, start)
+        self._notify(snapshot)
+        return True
+
+    def subscribe(self, callback):
+        """Call ``callback(snapshot)`` now and after every reload (on the watcher thread)."""
+        self._listeners.append(callback)
+        callback(self._snapshot)
+
+    def _notify(self, snapshot):
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception:
+                logger.exception("Knowledge base reload listener failed")
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the previous snapshot; a half-saved sheet is retried next poll.
+                self.last_error = e
+                logger.warning("Knowledge base reload failed: %s", e)
+
+    def start_watching(self, interval=5.0):
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                             name='kb-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
@@ -0,0 +1,155 @@
+"""Compact, array-backed knowledge base used in the query path.
+
+Built once from the sheet and never mutated. Rows are addressed by integer
+id (the sheet row order); answers, categories and tags are interned, so the
+per-row data is a handful of small integer arrays plus the float32
+embedding matrix, and ``answer(row)`` is two array lookups with nothing
+allocated.
+
+Rows are also indexed the other way round, built on first use: the rows of
+each category, and an inverted tag index (rows carrying each tag), both in
+CSR layout, for routing a query to part of the KB.
+"""
+import hashlib
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = {'questions', 'answers', 'categories', 'tags'}
+
+
+class KnowledgeBaseError(Exception):
+    pass
+
+
+def read_sheet(path):
+    df = pd.read_excel(path)
+    if not REQUIRED_COLUMNS.issubset(df.columns):
+        raise KnowledgeBaseError(f"Missing required columns: {REQUIRED_COLUMNS}")
+    return df
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _intern(values):
+    names, codes = [], []
+    position = {}
+    for value in values:
+        code = position.get(value)
+        if code is None:
+            code = position[value] = len(names)
+            names.append(value)
+        codes.append(code)
+    return tuple(names), np.asarray(codes, dtype=np.int32)
+
+
+def split_tags(value):
+    if not isinstance(value, str):
+        return []
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+
+class KnowledgeBase:
+    def __init__(self, questions, answers, categories, tags, embeddings=None):
+        self.questions = tuple(str(q) for q in questions)
+        self.ids = np.arange(len(self.questions), dtype=np.int32)
+        self.answer_texts, self.answer_codes = _intern(str(a) for a in answers)
+        self.category_names, self.category_codes = _intern(str(c) for c in categories)
+
+        # Tags are a CSR layout: row i owns tag_codes[tag_offsets[i]:tag_offsets[i + 1]].
+        tag_ids, offsets, flat = {}, [0], []
+        for row_tags in tags:
+            for tag in dict.fromkeys(split_tags(row_tags)):
+                flat.append(tag_ids.setdefault(tag, len(tag_ids)))
+            offsets.append(len(flat))
+        self.tag_names = tuple(tag_ids)
+        self.tag_codes = np.asarray(flat, dtype=np.int32)
+        self.tag_offsets = np.asarray(offsets, dtype=np.int64)
+
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if len(embeddings) != len(self.questions):
+                raise ValueError(f"Got {len(embeddings)} embeddings for {len(self.questions)} questions")
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_arrays(cls, **columns):
+        """Rebuild from already-interned columns (e.g. a memory-mapped bundle)."""
+        kb = cls.__new__(cls)
+        kb.__dict__.update(columns)
+        kb.ids = np.arange(len(kb.questions), dtype=np.int32)
+        return kb
+
+    @classmethod
+    def from_dataframe(cls, df, embeddings=None):
+        return cls(df['questions'].tolist(), df['answers'].tolist(), df['categories'].tolist(),
+                   df['tags'].tolist(), embeddings)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def question(self, row):
+        return self.questions[row]
+
+    def answer(self, row):
+        return self.answer_texts[self.answer_codes[row]]
+
+    def category(self, row):
+        return self.category_names[self.category_codes[row]]
+
+    def tags(self, row):
+        codes = self.tag_codes[self.tag_offsets[row]:self.tag_offsets[row + 1]]
+        return [self.tag_names[c] for c in codes]
+
+    @staticmethod
+    def _group_rows(codes, rows, n_groups):
+        # CSR: rows of group g are grouped[offsets[g]:offsets[g + 1]], ascending.
+        order = np.argsort(codes, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=n_groups))))
+        return np.asarray(rows[order], dtype=np.int32), offsets
+
+    @cached_property
+    def _category_rows(self):
+        return self._group_rows(self.category_codes, self.ids, len(self.category_names))
+
+    @cached_property
+    def _tag_rows(self):
+        row_of_tag = np.repeat(self.ids, np.diff(self.tag_offsets))
+        return self._group_rows(self.tag_codes, row_of_tag, len(self.tag_names))
+
+    def rows_in_category(self, name):
+        if name not in self.category_names:
+            return np.zeros(0, dtype=np.int32)
+        code = self.category_names.index(name)
+        rows, offsets = self._category_rows
+        return rows[offsets[code]:offsets[code + 1]]
+
+    def rows_with_tag(self, name):
+        if name not in self.tag_names:
+            return np.zeros(0, dtype=np.int32)
+        code = self.tag_names.index(name)
+        rows, offsets = self._tag_rows
+        return rows[offsets[code]:offsets[code + 1]]
+
+    def select_rows(self, category=None, tags=()):
+        """Rows in ``category`` (any category if None) carrying any of ``tags`` (any row if empty)."""
+        rows = self.rows_in_category(category) if category else self.ids
+        if tags:
+            tagged = np.unique(np.concatenate([self.rows_with_tag(t) for t in tags]))
+            rows = np.intersect1d(rows, tagged, assume_unique=True)
+        return rows
+
+    def to_dataframe(self):
+        return pd.DataFrame({
+            'questions': list(self.questions),
+            'answers': [self.answer(i) for i in self.ids],
+            'categories': [self.category(i) for i in self.ids],
+            'tags': [", ".join(self.tags(i)) for i in self.ids],
+        })
@@ -0,0 +1,100 @@
+"""Precomputed lexical index for the fuzzy-match stage.
+
+Reproduces ``process.extractOne(query, questions, scorer=fuzz.token_sort_ratio)``
+followed by ``questions.index(best_match)`` without scanning every question:
+
+* each question is normalised and token-sorted once, exactly the way
+  ``extractOne`` does it per call;
+* a per-question character-count matrix gives an upper bound on the
+  Levenshtein ratio (the longest common subsequence can never exceed the
+  character multiset overlap), computed for all rows in one NumPy pass;
+* only rows whose bound can beat the threshold are scored, best bound first,
+  stopping as soon as no remaining row can beat the best score found.
+
+Scores, the ``> threshold`` cut and the first-row-wins tie-breaking are
+identical to the original scan. ``rows`` (sorted row ids) restricts a search
+to part of the KB without copying the index.
+"""
+import heapq
+
+import numpy as np
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import utils
+
+
+def sort_key(text):
+    processed = utils.full_process(str(text), force_ascii=True)
+    return " ".join(sorted(processed.split())).strip()
+
+
+class LexicalIndex:
+    def __init__(self, questions):
+        self.keys = [sort_key(q) for q in questions]
+        self.lengths = np.fromiter((len(k) for k in self.keys), dtype=np.int32, count=len(self.keys))
+        vocab = sorted(set("".join(self.keys)))
+        self.char_ids = {c: i for i, c in enumerate(vocab)}
+        self.counts = np.zeros((len(self.keys), len(vocab)), dtype=np.uint16)
+        for row, key in enumerate(self.keys):
+            for c in key:
+                self.counts[row, self.char_ids[c]] += 1
+
+    @classmethod
+    def from_arrays(cls, keys, lengths, vocab, counts):
+        index = cls.__new__(cls)
+        index.keys = keys
+        index.lengths = lengths
+        index.char_ids = {c: i for i, c in enumerate(vocab)}
+        index.counts = counts
+        return index
+
+    @property
+    def vocab(self):
+        return "".join(self.char_ids)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _query_counts(self, key):
+        counts = np.zeros(len(self.char_ids), dtype=np.uint16)
+        for c in key:
+            i = self.char_ids.get(c)
+            if i is not None:
+                counts[i] += 1
+        return counts
+
+    def upper_bounds(self, key, rows=None):
+        counts, lengths = (self.counts, self.lengths) if rows is None else (self.counts[rows], self.lengths[rows])
+        overlap = np.minimum(counts, self._query_counts(key)).sum(axis=1, dtype=np.int64)
+        return 200.0 * overlap / np.maximum(lengths + len(key), 1)
+
+    def top_matches(self, query, k=5, threshold=0, rows=None):
+        """Return up to ``k`` ``(row_id, score)`` pairs scoring above ``threshold``,
+        best first, lower row ids first on ties. ``rows`` limits the search to
+        those (sorted) row ids."""
+        key = sort_key(query)
+        if not key or not len(self.keys if rows is None else rows) or k < 1:
+            return []
+        bounds = self.upper_bounds(key, rows)
+        candidates = np.flatnonzero(bounds > threshold)
+        # Highest bound first; stable sort keeps lower row ids first on ties.
+        candidates = candidates[np.argsort(-bounds[candidates], kind='stable')]
+        best = []  # min-heap of (score, -row): best[0] is the k-th best so far
+        for position in candidates:
+            if len(best) == k and bounds[position] < best[0][0] - 0.5:
+                break
+            row = position if rows is None else rows[position]
+            score = fuzz.ratio(key, self.keys[row])
+            if score <= threshold:
+                continue
+            item = (score, -int(row))
+            if len(best) < k:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+        return [(-row, score) for score, row in sorted(best, reverse=True)]
+
+    def best_match(self, query, threshold=70, rows=None):
+        """Return ``(row_id, score)`` of the best token-sort match scoring above
+        ``threshold``, or ``(None, 0)`` when no question can."""
+        matches = self.top_matches(query, 1, threshold, rows)
+        return matches[0] if matches else (None, 0)
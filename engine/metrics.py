@@ -0,0 +1,220 @@
+"""Latency metrics for the matching pipeline, with a Prometheus text exporter.
+
+The pipeline records into the process-wide ``METRICS`` registry:
+
+* ``step``     time spent in each step of a query: ``route`` (choosing the
+               category / tag partition), ``gibberish``, ``greeting``, ``fuzzy``
+               (lexical scan), ``candidates`` (lexical top-k for suggestions),
+               ``encode``, ``knn``, ``fuse`` (hybrid top-k) and
+               ``answer`` (front-ends looking up the answer text);
+* ``request``  total matching time, labelled by the stage that answered;
+* ``response`` what a front-end's caller waited for, cache hits included.
+
+Front-ends also record start-up milestones with ``mark_startup`` (e.g.
+``first_interaction``: the page is usable; ``semantic_ready``: the model and
+vector index have loaded), exported as one gauge per event.
+
+Each histogram keeps cumulative bucket counts for the exporter and a rolling
+window (``window_s``, in ``slots`` sub-windows) that ``quantile`` reads, so
+p50/p95 follow current load. Recording is a ``perf_counter`` call, a bisect
+and a few additions under an uncontended lock.
+
+``render_prometheus`` produces the text exposition format; ``answer_api``
+serves it at ``/metrics`` and ``start_metrics_server`` serves it from a
+background thread for the Streamlit apps. Metrics are per process.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_S = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                     0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW_S = 300.0
+PREFIX = 'helpdesk_bot'
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_S, window_s=WINDOW_S, slots=10, clock=time.monotonic):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.clock = clock
+        self._slot_s = window_s / slots
+        self._slots = [[0] * len(self.counts) for _ in range(slots)]
+        self._slot_ids = [None] * slots
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        bucket = bisect_left(self.bounds, seconds)
+        slot_id = int(self.clock() // self._slot_s)
+        slot = slot_id % len(self._slots)
+        with self._lock:
+            if self._slot_ids[slot] != slot_id:
+                self._slots[slot] = [0] * len(self.counts)
+                self._slot_ids[slot] = slot_id
+            self._slots[slot][bucket] += 1
+            self.counts[bucket] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def window_counts(self):
+        oldest = int(self.clock() // self._slot_s) - len(self._slots) + 1
+        merged = [0] * len(self.counts)
+        with self._lock:
+            for slot_id, counts in zip(self._slot_ids, self._slots):
+                if slot_id is not None and slot_id >= oldest:
+                    merged = [a + b for a, b in zip(merged, counts)]
+        return merged
+
+    def quantile(self, q):
+        """Estimated ``q`` quantile (0..1) in seconds over the rolling window, or
+        None without observations. Interpolates linearly inside a bucket."""
+        counts = self.window_counts()
+        total = sum(counts)
+        if not total:
+            return None
+        target = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= target:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (target - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class PipelineMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS_S, window_s=WINDOW_S, clock=time.monotonic):
+        self.buckets = buckets
+        self.window_s = window_s
+        self.clock = clock
+        self.steps = {}
+        self.requests = {}
+        self.response = self._new()
+        self.startup = {}
+        self._lock = threading.Lock()
+
+    def _new(self):
+        return LatencyHistogram(self.buckets, self.window_s, clock=self.clock)
+
+    def _histogram(self, family, label):
+        histogram = family.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(label, self._new())
+        return histogram
+
+    def observe(self, step, seconds):
+        self._histogram(self.steps, step).observe(seconds)
+
+    def observe_request(self, stage, seconds):
+        self._histogram(self.requests, stage).observe(seconds)
+
+    def observe_response(self, seconds):
+        self.response.observe(seconds)
+
+    def mark_startup(self, event, seconds):
+        """Record how long start-up took to reach ``event``; only the first mark counts."""
+        with self._lock:
+            self.startup.setdefault(event, seconds)
+
+    @contextmanager
+    def timed(self, step):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(step, time.perf_counter() - start)
+
+    def response_percentiles(self, quantiles=(0.5, 0.95)):
+        return tuple(self.response.quantile(q) for q in quantiles)
+
+    def render_prometheus(self, prefix=PREFIX):
+        lines = []
+        families = (
+            ('step', 'Time spent in each matching step.', 'step', self.steps),
+            ('request', 'Total matching time by the stage that answered.', 'stage', self.requests),
+            ('response', 'Time callers waited for an answer, cache hits included.', None, {None: self.response}),
+        )
+        for name, help_text, label, histograms in families:
+            metric = f"{prefix}_{name}_latency_seconds"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for value, histogram in sorted(histograms.items(), key=lambda item: item[0] or ''):
+                counts, total, count = histogram.snapshot()
+                labels = f'{label}="{value}",' if label else ''
+                cumulative = 0
+                for bound, n in zip(histogram.bounds + (float('inf'),), counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f'{metric}_bucket{{{labels}le="{le}"}} {cumulative}')
+                suffix = f"{{{labels.rstrip(',')}}}" if labels else ''
+                lines.append(f"{metric}_sum{suffix} {total:.9g}")
+                lines.append(f"{metric}_count{suffix} {count}")
+        if self.startup:
+            metric = f"{prefix}_startup_seconds"
+            lines += [f"# HELP {metric} Seconds from start-up to each milestone.", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{event="{event}"}} {seconds:.6g}' for event, seconds in sorted(self.startup.items())]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = PipelineMetrics()
+
+
+class StageTimer:
+    """Splits one query's time into steps: ``lap(step)`` records the time since
+    the previous lap (or the start)."""
+    __slots__ = ('metrics', 'start', 'last')
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, step):
+        now = time.perf_counter()
+        self.metrics.observe(step, now - self.last)
+        self.last = now
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1e3
+
+
+def start_metrics_server(port, host='127.0.0.1', metrics=METRICS):
+    """Serve ``GET /metrics`` from a daemon thread, on the loopback interface
+    unless ``host`` says otherwise. Returns the server, or None when the port
+    cannot be bound (e.g. another process already exports)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        logger.warning("Metrics exporter not started on port %s: %s", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return server
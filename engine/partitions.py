@@ -0,0 +1,62 @@
+"""Views of a subset of the KB rows: a category partition or a tag filter.
+
+A ``Partition`` looks like a snapshot to the pipeline (``lexical_index`` and
+``vector_index`` attributes) but a routed query only scores the selected
+rows. It holds nothing but their row ids: searches go to the snapshot's own
+indexes with ``rows=``, which gather the selected rows per query instead of
+keeping a copy, so the configured vector backend (quantised, memory-mapped)
+applies inside a partition too. Results are KB row ids, so everything
+downstream is unchanged.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+class _RowsLexicalIndex:
+    def __init__(self, index, rows):
+        self.index = index
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def top_matches(self, query, k=5, threshold=0):
+        return [(int(row), score) for row, score in self.index.top_matches(query, k, threshold, rows=self.rows)]
+
+    def best_match(self, query, threshold=70):
+        row, score = self.index.best_match(query, threshold, rows=self.rows)
+        return (None, 0) if row is None else (int(row), score)
+
+
+class _RowsVectorIndex:
+    def __init__(self, index, rows):
+        self.index = index
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def kneighbors(self, X, n_neighbors=1):
+        return self.index.kneighbors(X, n_neighbors, rows=self.rows)
+
+
+@dataclass(frozen=True)
+class Partition:
+    rows: np.ndarray
+    lexical_index: _RowsLexicalIndex
+    vector_index: Optional[_RowsVectorIndex]   # None for a lexical-only snapshot
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes
+
+
+def build_partition(lexical_index, vector_index, rows):
+    rows = np.asarray(rows, dtype=np.int32)
+    vector = None if vector_index is None else _RowsVectorIndex(vector_index, rows)
+    return Partition(rows, _RowsLexicalIndex(lexical_index, rows), vector)
@@ -0,0 +1,218 @@
+"""The matching pipeline behind every front-end, free of any UI code.
+
+A query is answered by the first stage that accepts it:
+
+* ``gibberish`` too short, symbols only or mostly non-words;
+* ``greeting``  fuzzy match against the greeting list;
+* ``fuzzy``     token-sort match against the KB questions above
+                ``FUZZY_THRESHOLD``;
+* ``semantic``  nearest question by embedding, within
+                ``SEMANTIC_MAX_DISTANCE`` cosine distance;
+* ``fallback``  the nearest question was too far away.
+
+Stages return a ``Match``; turning it into user-facing text is up to the
+front-end. ``match_batch`` gives the same matches for many queries at once,
+with one encode and one nearest-neighbour call for everything that reaches
+the semantic stage.
+
+With ``top_k`` set, a query the fuzzy stage does not accept also gets
+``Match.candidates`` ("did you mean" alternatives, which only unanswered
+queries need): the lexical top-k down to ``CANDIDATE_LEXICAL_THRESHOLD`` and
+the vector top-k, fused with reciprocal rank fusion. The stages run exactly
+as without ``top_k``, so the stage and answer are the same and answered
+queries cost the same.
+
+``category`` and ``tags`` route a query to part of the KB: only the rows in
+that category carrying any of the tags are searched (see
+``KBSnapshot.search_space``).
+
+Without an encoder (``encode_fn=None``, e.g. while the model is still
+loading) or a vector index (a lexical-only snapshot), a query stops after the
+fuzzy stage: what it does not accept falls back. Those matches have
+``lexical_only`` set so front-ends can flag them.
+
+``fuzzy_threshold`` and ``semantic_max_distance`` override the two cut-offs
+per call (threshold tuning); candidates never need a higher token-sort score
+than the fuzzy stage.
+
+Every step and every finished query is timed into ``metrics.METRICS``.
+"""
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import numpy as np
+
+from .intent_filter import is_gibberish, is_greeting
+from .metrics import METRICS, StageTimer
+
+FUZZY_THRESHOLD = 70
+SEMANTIC_MAX_DISTANCE = 0.45
+# Lexical rows below this token-sort score are not worth suggesting.
+CANDIDATE_LEXICAL_THRESHOLD = 65
+RRF_K = 60
+
+GIBBERISH = 'gibberish'
+GREETING = 'greeting'
+FUZZY = 'fuzzy'
+SEMANTIC = 'semantic'
+FALLBACK = 'fallback'
+STAGES = (GIBBERISH, GREETING, FUZZY, SEMANTIC, FALLBACK)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    row: int
+    score: float                        # reciprocal rank fusion score
+    lexical: Optional[int] = None       # token-sort ratio, when in the lexical top-k
+    similarity: Optional[float] = None  # cosine similarity, when in the vector top-k
+
+
+@dataclass(frozen=True)
+class Match:
+    stage: str
+    row: Optional[int] = None      # KB row of the answer (fuzzy, semantic; nearest row for fallback)
+    score: Optional[float] = None  # token-sort ratio (fuzzy) or cosine similarity (semantic, fallback)
+    greeting: Optional[str] = None
+    elapsed_ms: float = 0.0
+    candidates: tuple = ()         # fused top-k ``Candidate``s, best first, when asked for (not for fuzzy hits)
+    lexical_only: bool = False     # decided without the semantic stage (no encoder / vector index yet)
+
+    @property
+    def answered(self):
+        return self.stage in (FUZZY, SEMANTIC)
+
+
+def _match_intent(query, timer):
+    gibberish = is_gibberish(query)
+    timer.lap(GIBBERISH)
+    if gibberish:
+        return Match(GIBBERISH)
+    greet = is_greeting(query)
+    timer.lap(GREETING)
+    if greet:
+        return Match(GREETING, greeting=greet)
+    return None
+
+
+def _match_text(query, index, timer, fuzzy_threshold=FUZZY_THRESHOLD):
+    # Every stage before the semantic one; None means "needs an embedding".
+    match = _match_intent(query, timer)
+    if match is None:
+        row, score = index.lexical_index.best_match(query, threshold=fuzzy_threshold)
+        timer.lap(FUZZY)
+        if row is not None:
+            match = Match(FUZZY, row, score)
+    return match
+
+
+def _lexical_candidates(query, index, top_k, timer, fuzzy_threshold):
+    threshold = min(CANDIDATE_LEXICAL_THRESHOLD, fuzzy_threshold)
+    lexical = index.lexical_index.top_matches(query, top_k, threshold)
+    timer.lap('candidates')
+    return lexical
+
+
+def _lexical_only(query, index, top_k, timer, fuzzy_threshold=FUZZY_THRESHOLD):
+    # The stages up to fuzzy; a query that needs the semantic stage falls back.
+    match = _match_text(query, index, timer, fuzzy_threshold)
+    if match is None:
+        candidates = fuse(_lexical_candidates(query, index, top_k, timer, fuzzy_threshold), (), top_k) \
+            if top_k else ()
+        match = Match(FALLBACK, candidates=candidates)
+    return replace(match, elapsed_ms=timer.elapsed_ms(), lexical_only=True)
+
+
+def _finish(match):
+    METRICS.observe_request(match.stage, match.elapsed_ms / 1e3)
+    return match
+
+
+def _semantic(distance, row, elapsed_ms, candidates=(), max_distance=SEMANTIC_MAX_DISTANCE):
+    distance = float(distance)
+    stage = FALLBACK if distance > max_distance else SEMANTIC
+    return Match(stage, int(row), round(1.0 - distance, 4), elapsed_ms=elapsed_ms, candidates=candidates)
+
+
+def fuse(lexical, semantic, k):
+    """Reciprocal rank fusion of ``[(row, token_sort_score)]`` and
+    ``[(row, cosine_similarity)]`` rankings into the top ``k`` ``Candidate``s."""
+    fused = {}
+    for rank, (row, score) in enumerate(lexical, 1):
+        fused[row] = [1.0 / (RRF_K + rank), score, None]
+    for rank, (row, similarity) in enumerate(semantic, 1):
+        entry = fused.setdefault(row, [0.0, None, None])
+        entry[0] += 1.0 / (RRF_K + rank)
+        entry[2] = similarity
+    ranked = sorted(fused.items(), key=lambda item: (-item[1][0], item[0]))[:k]
+    return tuple(Candidate(row, round(score, 6), lexical, similarity)
+                 for row, (score, lexical, similarity) in ranked)
+
+
+def _hybrid(query, index, encode_fn, top_k, timer, fuzzy_threshold, max_distance):
+    # Only for queries the fuzzy stage did not accept.
+    lexical = _lexical_candidates(query, index, top_k, timer, fuzzy_threshold)
+    vectors = encode_fn([query])
+    timer.lap('encode')
+    distances, indices = index.vector_index.kneighbors(vectors, n_neighbors=top_k)
+    timer.lap('knn')
+    found = (indices[0] >= 0) & np.isfinite(distances[0])
+    semantic = [(int(row), round(1.0 - float(d), 4)) for row, d in zip(indices[0][found], distances[0][found])]
+    candidates = fuse(lexical, semantic, top_k)
+    timer.lap('fuse')
+    return _semantic(distances[0][0], indices[0][0], timer.elapsed_ms(), candidates, max_distance)
+
+
+def match_query(query, snapshot, encode_fn, top_k=0, category=None, tags=(),
+                fuzzy_threshold=FUZZY_THRESHOLD, semantic_max_distance=SEMANTIC_MAX_DISTANCE):
+    timer = StageTimer()
+    index = snapshot.search_space(category, tags)
+    timer.lap('route')
+    if encode_fn is None or index.vector_index is None:
+        return _finish(_lexical_only(query, index, top_k, timer, fuzzy_threshold))
+    match = _match_text(query, index, timer, fuzzy_threshold)
+    if match is None:
+        if top_k:
+            return _finish(_hybrid(query, index, encode_fn, top_k, timer, fuzzy_threshold, semantic_max_distance))
+        vectors = encode_fn([query])
+        timer.lap('encode')
+        distances, indices = index.vector_index.kneighbors(vectors)
+        timer.lap('knn')
+        return _finish(_semantic(distances[0][0], indices[0][0], timer.elapsed_ms(), (), semantic_max_distance))
+    return _finish(Match(match.stage, match.row, match.score, match.greeting, timer.elapsed_ms()))
+
+
+def match_batch(queries, snapshot, encode_fn, category=None, tags=(),
+                fuzzy_threshold=FUZZY_THRESHOLD, semantic_max_distance=SEMANTIC_MAX_DISTANCE):
+    """``match_query`` for many queries; semantic rows are charged an equal share
+    of the batch's encode + search time (recorded as one ``encode`` and one
+    ``knn`` step per batch)."""
+    timer = StageTimer()
+    index = snapshot.search_space(category, tags)
+    timer.lap('route')
+    if encode_fn is None or index.vector_index is None:
+        return [_finish(_lexical_only(query, index, 0, StageTimer(), fuzzy_threshold)) for query in queries]
+    matches = [None] * len(queries)
+    semantic, elapsed = [], []
+    for i, query in enumerate(queries):
+        timer = StageTimer()
+        match = _match_text(query, index, timer, fuzzy_threshold)
+        elapsed.append(timer.elapsed_ms())
+        if match is None:
+            semantic.append(i)
+        else:
+            matches[i] = _finish(Match(match.stage, match.row, match.score, match.greeting, elapsed[i]))
+
+    if semantic:
+        timer = StageTimer()
+        texts = list(dict.fromkeys(queries[i] for i in semantic))
+        vectors = encode_fn(texts)
+        timer.lap('encode')
+        distances, indices = index.vector_index.kneighbors(vectors)
+        timer.lap('knn')
+        shared = timer.elapsed_ms() / len(semantic)
+        position = {text: j for j, text in enumerate(texts)}
+        for i in semantic:
+            j = position[queries[i]]
+            matches[i] = _finish(_semantic(distances[j][0], indices[j][0], elapsed[i] + shared, (),
+                                           semantic_max_distance))
+    return matches
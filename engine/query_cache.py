@@ -0,0 +1,131 @@
+"""Bounded LRU + TTL cache of bot responses keyed by normalised query text.
+
+Helpdesk traffic is highly repetitive, so the full matching pipeline only
+runs for queries not seen recently. Entries belong to one KB version: the
+first lookup with a newer version drops everything, and lookups for an older
+(retired) version bypass the cache. Pinned entries (the quick-reply buttons)
+never expire or get evicted within their version. An optional ``scope``
+(e.g. the category a query was routed to) is part of the key.
+
+The intent filters see what the key folds away: "vpn?" is gibberish while
+"vpn" is not, and punctuation can change which greeting matches. ``cached``
+therefore runs them first: gibberish is answered without the cache and the
+greeting a query matched is part of its key, so a cached answer is always
+the one the pipeline would give.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .intent_filter import is_gibberish, is_greeting
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    text = _PUNCTUATION.sub(" ", str(text).casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _key(query, scope):
+    text = normalize_query(query)
+    return (scope, text) if text and scope else text
+
+
+class QueryCache:
+    def __init__(self, max_size=1024, ttl=600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def _use_version(self, version):
+        # Caller holds the lock. Returns False for a version older than the cache's.
+        if self.version is None or version > self.version:
+            self.version = version
+            self._entries.clear()
+            self._pinned.clear()
+        return version == self.version
+
+    def get(self, version, query, scope=None):
+        key = _key(query, scope)
+        with self._lock:
+            if key and self._use_version(version):
+                if key in self._pinned:
+                    self.hits += 1
+                    return self._pinned[key]
+                entry = self._entries.get(key)
+                if entry is not None:
+                    expires_at, value = entry
+                    if expires_at > self.clock():
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return value
+                    del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, version, query, value, scope=None):
+        key = _key(query, scope)
+        with self._lock:
+            if not key or not self._use_version(version):
+                return
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pin(self, version, query, value, scope=None):
+        key = _key(query, scope)
+        with self._lock:
+            if key and self._use_version(version):
+                self._pinned[key] = value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version, 'size': len(self._entries), 'pinned': len(self._pinned),
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _scope(query, filters):
+    scope = [(name, tuple(value) if isinstance(value, list) else value) for name, value in filters.items() if value]
+    greeting = is_greeting(query)
+    if greeting:
+        scope.append(('greeting', greeting))
+    return tuple(sorted(scope))
+
+
+def cached(cache, respond):
+    """Wrap ``respond(query, snapshot, *args, **filters)`` so repeated queries are
+    served from ``cache``; keyword filters (category, tags) are part of the key.
+    ``cached_respond.pin(...)`` computes an answer and pins it. Gibberish is
+    never cached."""
+    def cached_respond(query, snapshot, *args, **filters):
+        if is_gibberish(query):
+            return respond(query, snapshot, *args, **filters)
+        scope = _scope(query, filters)
+        value = cache.get(snapshot.version, query, scope)
+        if value is None:
+            value = respond(query, snapshot, *args, **filters)
+            cache.put(snapshot.version, query, value, scope)
+        return value
+
+    def pin(query, snapshot, *args, **filters):
+        if not is_gibberish(query):
+            cache.pin(snapshot.version, query, respond(query, snapshot, *args, **filters), _scope(query, filters))
+
+    cached_respond.pin = pin
+    return cached_respond
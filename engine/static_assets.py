@@ -0,0 +1,46 @@
+"""Content-hashed static files for the Streamlit front-ends.
+
+The theme CSS used to be injected as a ``<style>`` block on every script run,
+so every rerun re-sent it over the websocket. ``publish_stylesheet`` instead
+minifies a stylesheet once per process and writes it to the app's ``static/``
+directory as ``<name>.<hash>.css``, which Streamlit serves at
+``app/static/<file>`` when ``server.enableStaticServing`` is on. The page
+then only carries a short ``@import`` of that URL, and the browser fetches
+the file once. A changed stylesheet gets a new name, so a cached copy is
+never stale; older builds of the same stylesheet are removed.
+"""
+import hashlib
+import os
+import re
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+
+
+def minify_css(css):
+    """Drop comments, indentation and blank lines; the rules are unchanged."""
+    lines = (line.strip() for line in _COMMENT.sub('', css).splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def publish_stylesheet(source, static_dir):
+    """Write the minified ``source`` stylesheet into ``static_dir`` under a
+    content-hashed name and return that file name."""
+    with open(source, encoding='utf-8') as f:
+        css = minify_css(f.read()).encode('utf-8')
+    stem = os.path.splitext(os.path.basename(source))[0]
+    name = f"{stem}.{hashlib.sha256(css).hexdigest()[:12]}.css"
+    os.makedirs(static_dir, exist_ok=True)
+    path = os.path.join(static_dir, name)
+    if not os.path.exists(path):
+        tmp = path + f'.tmp-{os.getpid()}'
+        with open(tmp, 'wb') as f:
+            f.write(css)
+        os.replace(tmp, path)
+    stale = re.compile(re.escape(stem) + r'\.[0-9a-f]{12}\.css')
+    for other in os.listdir(static_dir):
+        if other != name and stale.fullmatch(other):
+            try:
+                os.remove(os.path.join(static_dir, other))
+            except OSError:
+                pass
+    return name
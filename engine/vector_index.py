@@ -0,0 +1,252 @@
+"""Vector indexes for the semantic fallback stage.
+
+Every backend exposes the subset of the ``sklearn.neighbors.NearestNeighbors``
+API the app uses -- ``kneighbors(X, n_neighbors)`` returning cosine
+*distances* and row indices -- so they are interchangeable:
+
+* ``brute``   exact search: rows are L2-normalised float32 once, a query is a
+              single matrix-vector product. Rows that are already unit length
+              (the bundle stores them that way) are searched in place, so a
+              memory-mapped matrix stays shared between processes.
+* ``ivf``     approximate: spherical k-means partitions the rows into lists;
+              a query scores the centroids and searches only ``n_probe`` lists.
+* ``hnsw``    approximate, needs the optional ``hnswlib`` package.
+* ``float16`` / ``int8``
+              exact scan over a quantised copy of the rows (2x / 4x smaller
+              than float32; int8 keeps one scale per row), optionally
+              re-ranking the best ``rerank`` rows against the float32 rows.
+* ``sklearn`` the original ``NearestNeighbors(metric='cosine')`` path, kept
+              as the baseline for benchmarks.
+
+``kneighbors(X, n_neighbors, rows=...)`` searches only the given rows (a
+category / tag partition) and returns their row ids. The selected rows of the
+backend's own matrix -- shared, memory-mapped or quantised -- are gathered
+``chunk_rows`` at a time per query, so a partition never holds a copy; for
+``ivf`` and ``sklearn`` that is an exact scan, ``hnsw`` filters its graph
+search.
+"""
+from functools import partial
+
+import numpy as np
+
+
+def normalize_rows(x):
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    norms = np.sqrt(np.einsum('ij,ij->i', x, x))
+    if np.allclose(norms, 1.0, atol=1e-4):
+        # Already unit rows (e.g. a memory-mapped bundle): use them in place, no private copy.
+        return x
+    norms[norms == 0] = 1.0
+    return x / norms[:, None]
+
+
+def _scores_at(queries, matrix, rows, scales=None, chunk_rows=4096, normalize=False):
+    """Scores of ``queries`` against ``matrix[rows]`` (times ``scales[rows]``),
+    without materialising the whole selection."""
+    scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+    for start in range(0, len(rows), chunk_rows):
+        block = rows[start:start + chunk_rows]
+        vectors = normalize_rows(matrix[block]) if normalize else np.asarray(matrix[block], dtype=np.float32)
+        part = queries @ vectors.T
+        if scales is not None:
+            part *= scales[block]
+        scores[:, start:start + len(block)] = part
+    return scores
+
+
+def _nearest(scores, n_neighbors, rows=None):
+    indices = _top_k(scores, n_neighbors)
+    distances = 1.0 - np.take_along_axis(scores, indices, axis=1)
+    return distances, (indices if rows is None else rows[indices])
+
+
+def _top_k(scores, k):
+    """Row-wise indices of the k highest scores, best first."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+class BruteForceIndex:
+    def __init__(self, embeddings):
+        self.vectors = normalize_rows(embeddings)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def kneighbors(self, X, n_neighbors=1, rows=None):
+        queries = normalize_rows(X)
+        scores = queries @ self.vectors.T if rows is None else _scores_at(queries, self.vectors, rows)
+        return _nearest(scores, n_neighbors, rows)
+
+
+class IVFIndex:
+    def __init__(self, embeddings, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        vectors = normalize_rows(embeddings)
+        n = len(vectors)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = n_probe
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, self.n_lists, replace=False)]
+        for _ in range(n_iter):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, vectors)
+            empty = np.bincount(assign, minlength=self.n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        # Store rows grouped by list so probing a list is a contiguous slice.
+        self.order = np.argsort(assign, kind='stable')
+        self.vectors = vectors[self.order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=self.n_lists))))
+        self.centroids = centroids
+        self.position = np.argsort(self.order).astype(np.int32)  # row id -> position in self.vectors
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def kneighbors(self, X, n_neighbors=1, rows=None):
+        queries = normalize_rows(X)
+        if rows is not None:
+            return _nearest(_scores_at(queries, self.vectors, self.position[rows]), n_neighbors, rows)
+        probes = _top_k(queries @ self.centroids.T, min(self.n_probe, self.n_lists))
+        distances = np.full((len(queries), n_neighbors), np.inf, dtype=np.float32)
+        indices = np.zeros((len(queries), n_neighbors), dtype=np.int64)
+        for q, lists in enumerate(probes):
+            rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            scores = self.vectors[rows] @ queries[q]
+            best = _top_k(scores[None, :], n_neighbors)[0]
+            distances[q, :len(best)] = 1.0 - scores[best]
+            indices[q, :len(best)] = self.order[rows[best]]
+        return distances, indices
+
+
+class HNSWIndex:
+    def __init__(self, embeddings, M=16, ef_construction=200, ef=64):
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("The 'hnsw' vector index backend requires the hnswlib package")
+        vectors = normalize_rows(embeddings)
+        self.index = hnswlib.Index(space='cosine', dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=ef_construction, M=M)
+        self.index.add_items(vectors, np.arange(len(vectors)))
+        self.index.set_ef(ef)
+        self.size = len(vectors)
+
+    def __len__(self):
+        return self.size
+
+    def kneighbors(self, X, n_neighbors=1, rows=None):
+        if rows is None:
+            labels, distances = self.index.knn_query(normalize_rows(X), k=min(n_neighbors, self.size))
+        else:
+            allowed = np.zeros(self.size, dtype=bool)
+            allowed[rows] = True
+            # Filtered search (hnswlib >= 0.7) takes one thread.
+            labels, distances = self.index.knn_query(normalize_rows(X), k=min(n_neighbors, len(rows)),
+                                                     num_threads=1, filter=lambda label: allowed[label])
+        return distances, labels.astype(np.int64)
+
+
+class QuantizedIndex:
+    """Brute-force search over float16 or int8 (per-row scale) copies of the rows.
+
+    Scores are computed ``chunk_rows`` rows at a time in float32, so the
+    quantised matrix is the only full copy held. With ``rerank`` set, the best
+    ``rerank`` rows are re-scored against the original embeddings; for a
+    memory-mapped bundle only those rows' pages are read.
+    """
+
+    def __init__(self, embeddings, dtype='int8', rerank=0, chunk_rows=4096):
+        if dtype not in ('float16', 'int8'):
+            raise ValueError(f"Unknown quantised dtype '{dtype}', expected 'float16' or 'int8'")
+        self.embeddings = embeddings if rerank else None
+        self.rerank = rerank
+        self.chunk_rows = chunk_rows
+        n, dim = np.shape(embeddings)
+        self.codes = np.empty((n, dim), dtype=dtype)
+        self.scales = np.empty(n, dtype=np.float32) if dtype == 'int8' else None
+        for start in range(0, n, chunk_rows):
+            block = normalize_rows(embeddings[start:start + chunk_rows])
+            if self.scales is None:
+                self.codes[start:start + len(block)] = block
+                continue
+            scales = np.abs(block).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.codes[start:start + len(block)] = np.rint(block / scales[:, None])
+            self.scales[start:start + len(block)] = scales
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def _scores(self, queries, rows=None):
+        if rows is not None:
+            return _scores_at(queries, self.codes, rows, self.scales, self.chunk_rows)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_rows):
+            stop = start + self.chunk_rows
+            block = queries @ self.codes[start:stop].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[start:stop]
+            scores[:, start:stop] = block
+        return scores
+
+    def kneighbors(self, X, n_neighbors=1, rows=None):
+        queries = normalize_rows(X)
+        scores = self._scores(queries, rows)
+        if not self.rerank:
+            return _nearest(scores, n_neighbors, rows)
+        shortlist = _top_k(scores, max(n_neighbors, self.rerank))
+        if rows is not None:
+            shortlist = rows[shortlist]
+        vectors = normalize_rows(self.embeddings[shortlist.ravel()]).reshape(*shortlist.shape, -1)
+        rescored = np.einsum('qkd,qd->qk', vectors, queries)
+        best = _top_k(rescored, n_neighbors)
+        return 1.0 - np.take_along_axis(rescored, best, axis=1), np.take_along_axis(shortlist, best, axis=1)
+
+
+class SklearnIndex:
+    def __init__(self, embeddings):
+        from sklearn.neighbors import NearestNeighbors
+        self.embeddings = embeddings
+        self.model = NearestNeighbors(n_neighbors=1, metric='cosine')
+        self.model.fit(embeddings)
+
+    def __len__(self):
+        return self.model.n_samples_fit_
+
+    def kneighbors(self, X, n_neighbors=1, rows=None):
+        if rows is not None:
+            return _nearest(_scores_at(normalize_rows(X), self.embeddings, rows, normalize=True), n_neighbors, rows)
+        return self.model.kneighbors(X, n_neighbors=n_neighbors)
+
+
+VECTOR_INDEX_BACKENDS = {
+    'brute': BruteForceIndex,
+    'ivf': IVFIndex,
+    'hnsw': HNSWIndex,
+    'float16': partial(QuantizedIndex, dtype='float16'),
+    'int8': partial(QuantizedIndex, dtype='int8'),
+    'sklearn': SklearnIndex,
+}
+
+
+def build_vector_index(embeddings, backend='brute', **options):
+    try:
+        cls = VECTOR_INDEX_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown vector index backend '{backend}', "
+                         f"expected one of {sorted(VECTOR_INDEX_BACKENDS)}")
+    return cls(embeddings, **options)
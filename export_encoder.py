@@ -0,0 +1,53 @@
+"""Export the sentence encoder to ONNX and check it against the PyTorch model.
+
+    python export_encoder.py --model-dir models/all-MiniLM-L6-v2
+    python export_encoder.py --model-dir models/all-MiniLM-L6-v2 --check-only
+
+Writes the tokenizer, ``model.onnx`` and its dynamically quantised int8 copy
+``model.int8.onnx`` to ``--model-dir``, then encodes every KB question with
+the PyTorch model and with each ONNX backend and prints the parity report:
+cosine similarity of each question's embedding to the PyTorch one, the
+largest change of any question-to-question similarity and how often a
+question's nearest other question stays the same. Exits with status 1 when a
+backend's lowest cosine is below ``PARITY_MIN_COSINE``.
+
+To switch, set ``ENCODER_BACKEND`` in the apps (``--encoder-backend`` for the
+command-line tools); the KB is re-encoded with that backend on the next start.
+"""
+import argparse
+import sys
+
+from engine.encoders import ONNX, ONNX_INT8, PARITY_MIN_COSINE, export_onnx, load_encoder, parity_report
+from engine.knowledge_base import read_sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sentence encoder to ONNX and check its parity.")
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--model-dir', required=True)
+    parser.add_argument('--kb', default='dataset.xlsx', help="sheet whose questions the parity check encodes")
+    parser.add_argument('--check-only', action='store_true', help="only run the parity check on an existing export")
+    parser.add_argument('--no-int8', action='store_true', help="skip the int8 quantised copy")
+    args = parser.parse_args()
+
+    backends = [ONNX] if args.no_int8 else [ONNX, ONNX_INT8]
+    if not args.check_only:
+        files = export_onnx(args.model, args.model_dir, quantize=not args.no_int8)
+        print(f"Wrote {', '.join(files)} to {args.model_dir}")
+
+    questions = read_sheet(args.kb)['questions'].astype(str).tolist()
+    reference = load_encoder(args.model).encode(questions)
+    failed = False
+    print(f"Parity vs. PyTorch on {len(questions)} KB questions (pass: min cosine >= {PARITY_MIN_COSINE}):")
+    for backend in backends:
+        report = parity_report(reference, load_encoder(args.model, backend, args.model_dir).encode(questions))
+        failed |= not report['passed']
+        print(f"  {backend:10s} min cosine {report['min_cosine']:.5f}  mean {report['mean_cosine']:.5f}  "
+              f"max similarity delta {report['max_similarity_delta']:.4f}  "
+              f"nearest question agreement {report['neighbour_agreement']:.1%}  "
+              f"{'ok' if report['passed'] else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,242 +1,57 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.neighbors import NearestNeighbors
 import time
-import re
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
+RUN_STARTED = time.perf_counter()  # start-up milestones are timed from the first run's start
+import streamlit as st
+import html
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from engine import (GIBBERISH, GREETING, METRICS, EncoderService, KnowledgeBaseError, KnowledgeBaseStore,
+                    QueryCache, cached, encoder_cache_key, load_encoder, match_query, publish_stylesheet,
+                    start_metrics_server)
 
 # --- Configuration for Pre-loaded Knowledge Base ---
 KNOWLEDGE_BASE_PATH = 'dataset.xlsx'
-
-st.markdown("""
-<style>
-/* Ensure the very root HTML and body are black */
-html, body {
-    background-color: #000000 !important; /* Strict background color */
-    color: white !important;
-}
-
-/* Target Streamlit's main content area */
-.stApp {
-    background-color: #000000 !important; /* Strict background color for the app container */
-}
-
-/* Your existing .main style, updated to the desired background */
-.main {
-    background: #000000 !important; /* Use your desired dark background here */
-    border-radius: 20px !important;
-    padding: 3.5rem !important;
-    max-width: 640px !important;
-    margin: 2.5rem auto;
-}
-.stSidebar > div:first-child {
-    background-color: #1F1F1F !important;
-    border-right: 2px solid white;
-}
-
-/* --- BUTTON STYLING FIXES --- */
-
-/* Style only the Start Chat button */
-.start-chat-btn {
-    background: linear-gradient(90deg, #e53935 0%, #b71c1c 100%) !important;
-    color: white !important;
-    border-radius: 25px !important;
-    padding: 1.5rem 3rem !important;
-    font-size: 1.4rem !important;
-    border: 3px solid #fff !important;
-    font-weight: bold !important;
-    transition: transform 0.2s !important;
-    min-width: 200px !important;
-    margin: auto auto !important;
-    display: block !important;
-}
-#stBaseButton-secondary{
-margin : auto !important;
-}
-
-
-.start-chat-btn:hover {
-    transform: scale(1.08) !important;
-    color: white !important;
-}
-
-
-/* 2. QUICK REPLY & FEEDBACK BUTTONS: New rule to apply your desired style */
-.quick-reply-buttons .stButton > button,
-.feedback-buttons .stButton > button {
-    display: inline-block !important;
-    background: #fff !important;
-    color: #e53935 !important;
-    border-radius: 18px !important;
-    padding: 0.5rem 1.1rem !important;
-    margin: 0.15rem !important;
-    cursor: pointer !important;
-    font-size: 0.98rem !important;
-    border: 1.5px solid #e53935 !important;
-    font-weight: 500 !important;
-    transition: background 0.2s, color 0.2s !important;
-    width: auto !important;
-}
-
-.quick-reply-buttons .stButton > button:hover,
-.feedback-buttons .stButton > button:hover {
-    background: #e53935 !important;
-    color: #fff !important;
-}
-
-/* --- END OF BUTTON STYLING FIXES --- */
-
-
-.chat-bubble {
-    padding: 1rem 1.5rem;
-    border-radius: 20px;
-    margin-bottom: 14px;
-    max-width: 75%;
-    animation: fadeInUp 0.3s;
-    position: relative;
-    word-break: break-word;
-    font-size: 1.08rem;
-    display: flex;
-    align-items: center;
-}
-.user-bubble {
-    background: #fff;
-    color: #111;
-    align-self: flex-end;
-    margin-left: auto;
-    margin-right: 0;
-    border: 1.5px solid #e53935;
-}
-.bot-bubble {
-    background: linear-gradient(90deg, #e53935 0%, #b71c1c 100%);
-    color: #fff;
-    align-self: flex-start;
-    margin-right: auto;
-    margin-left: 0;
-    border: 1.5px solid #fff;
-}
-.avatar {
-    width: 38px; height: 38px; border-radius: 75%; margin: 0 10px;
-    background: #3d3d3d;
-    box-shadow: 0 2px 8px rgba(229,57,53,0.12);
-    font-size: 1.7rem;
-    text-align: center;
-    line-height: 38px;
-    border: 2px solid #ff0000;
-    display: flex; align-items: center; justify-content: center;
-}
-.user-row {
-    display: flex; flex-direction: row; align-items: flex-end; justify-content: flex-end;
-}
-.bot-row {
-    display: flex; flex-direction: row; align-items: flex-end; justify-content: flex-start;
-}
-.input-bar {
-    background: transparent !important;
-    border-radius: 20px;
-    box-shadow: 0 2px 8px rgba(229,57,53,0.12);
-    margin-top: 0.5rem;
-    display: flex;
-    align-items: center;
-    padding: 0.3rem 0.8rem;
-}
-.input-bar input {
-    background: transparent !important;
-    border: 3px solid #ffffff !important;
-    color: #fff;
-    width: 100%;
-    padding: 0.7rem 0.8rem;
-    outline: none;
-    font-size: 1rem;
-}
-.send-btn {
-    background: linear-gradient(90deg, #e53935 0%, #b71c1c 100%);
-    color: #fff;
-    border: none;
-    border-radius: 50%;
-    width: 46px !important;
-    height: 38px;
-    font-size: 1.2rem;
-    cursor: pointer;
-    margin-left: 8px;
-    transition: background 0.2s;
-    display: flex; align-items: center; justify-content: center;
-}
-.send-btn:hover {
-    background: #fff;
-    color: #e53935;
-    border: 1.5px solid #ff00;
-}
-
-/* Enhanced Sidebar Title */
-.sidebar-title {
-    font-size: 5.5rem;
-    color: #EE4B2B;
-    font-weight: 900;
-    text-align: center;
-    margin: 0.5rem 0 1.5rem 0;
-    letter-spacing: 0.05em;
-    width: 100%;
-    line-height: 1.2;
-    animation: rotate3D 5s infinite linear;
-    transform-style: preserve-3d;
-    perspective: 800px;
-    text-shadow:
-        0 0 5px rgba(238, 75, 43, 0.5),
-        0 0 10px rgba(238, 75, 43, 0.4),
-        0 0 15px rgba(238, 75, 43, 0.3),
-        1px 1px 2px rgba(0,0,0,0.8);
-}
-
-@keyframes rotate3D {
-    0% { transform: rotateY(0deg) scale(1); }
-    25% { transform: rotateY(90deg) scale(1.05); }
-    50% { transform: rotateY(180deg) scale(1); }
-    75% { transform: rotateY(270deg) scale(1.05); }
-    100% { transform: rotateY(360deg) scale(1); }
+MODEL_NAME = "all-MiniLM-L6-v2"
+ENCODER_BACKEND = 'torch'  # 'torch' (PyTorch), 'onnx' / 'onnx-int8' (ONNX Runtime, exported with export_encoder.py)
+ENCODER_MODEL_DIR = os.path.join('models', MODEL_NAME)  # the exported model, for the onnx backends
+EMBEDDING_CACHE_DIR = '.kb_cache'
+KB_RELOAD_INTERVAL_S = 5.0
+VECTOR_INDEX_BACKEND = 'brute'  # 'brute' (exact), 'ivf' / 'hnsw' (approximate), 'float16' / 'int8' (quantised), 'sklearn'
+RESPONSE_WORKERS = 4
+RESPONSE_POLL_INTERVAL_S = 0.25
+SIDEBAR_STATS_INTERVAL_S = 10.0
+MIN_TYPING_DELAY_S = 0.0  # cosmetic, applied in the browser only
+CHAT_END_DELAY_S = 2.0
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL_S = 600.0
+ENCODER_MAX_BATCH_SIZE = 32
+ENCODER_MAX_WAIT_MS = 5.0
+ENCODER_CACHE_SIZE = 4096
+SUGGESTION_COUNT = 3  # "did you mean" questions offered when nothing matches
+WARMING_UP_NOTE = "<br><br><i>⏳ Smart search is still starting up, so only close matches to known questions are answered for now.</i>"
+QUICK_REPLIES = ["Reset password", "VPN issues", "Software install"]
+QUICK_REPLY_CATEGORIES = {  # KB category each quick reply is answered from
+    "Reset password": "Password & Access",
+    "VPN issues": "Network & Connectivity",
+    "Software install": "Software & Apps",
 }
+ALL_DEPARTMENTS = "All departments"
+CHAT_WINDOW_MESSAGES = 30  # messages rendered; "Load earlier messages" pages back CHAT_PAGE_SIZE more
+CHAT_PAGE_SIZE = 30
+MAX_HISTORY_MESSAGES = 200  # per session; older messages are dropped
+METRICS_PORT = 9108  # Prometheus text exporter (GET /metrics); None disables
+METRICS_HOST = '127.0.0.1'  # local scrapers only; '0.0.0.0' exposes it on every interface
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STYLESHEET_PATH = os.path.join(APP_DIR, 'styles', 'main.css')
+STATIC_DIR = os.path.join(APP_DIR, 'static')  # served at app/static/ (server.enableStaticServing)
+
+# Theme CSS: minified once into a content-hashed file under static/, so a rerun
+# only re-sends this import, not the stylesheet.
+@st.cache_resource
+def load_stylesheet():
+    return publish_stylesheet(STYLESHEET_PATH, STATIC_DIR)
 
-/* Main Chatbot Title Enhancement */
-.elegant-heading {
-    font-size: 4.5rem !important;
-    font-weight: 900;
-    text-align: center;
-    margin-top: -40px !important;
-    color: #ffffff;
-    animation: fadeInUp 2.0s ease-out;
-}
-
-@keyframes fadeInUp {
-    0% { opacity: 0; transform: translateY(20px); }
-    100% { opacity: 1; transform: translateY(0); }
-}
-.transparent-spacer1 {
-height: 150px;           /* Adjust the vertical space */
-background: transparent;    /* Ensures it's see-through */
-}
-.transparent-spacer2 {
-height: 70px;           /* Adjust the vertical space */
-background: transparent;    /* Ensures it's see-through */
-}
-.typing-indicator {
-    display: flex; align-items: center; margin-bottom: 1.1rem;
-}
-.typing-dots span {
-    height: 10px; width: 10px; margin: 0 2px;
-    background: #e53935; border-radius: 25%; display: inline-block;
-    animation: blink 1.2s infinite both;
-}
-.typing-dots span:nth-child(2) { animation-delay: 0.2s; }
-.typing-dots span:nth-child(3) { animation-delay: 0.4s; }
-@keyframes blink {
-    0%, 80%, 100% { opacity: 0.2; }
-    40% { opacity: 1; }
-}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(f'<style>@import url("app/static/{load_stylesheet()}");</style>', unsafe_allow_html=True)
 
 # -------------------------------
 # Page Configuration
@@ -248,62 +63,62 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
-# -------------------------------
-# Model Loading (Cached)
-# -------------------------------
-@st.cache_resource
-def load_sentence_transformer():
-    return SentenceTransformer("all-MiniLM-L6-v2")
-
-model = load_sentence_transformer()
-
 # --- Pre-load Knowledge Base ---
+# The store is shared by every session and hot-reloads the sheet when it changes;
+# each script run reads the snapshot that is current at that moment. It starts
+# lexical-only (no encoder), so the page renders before the model has loaded.
 @st.cache_resource
 def load_knowledge_base(path):
     try:
-        df = pd.read_excel(path)
-        required_columns = {'questions', 'answers', 'categories', 'tags'}
-        if not required_columns.issubset(df.columns):
-            st.error(f"❌ **Error:** Missing required columns: {required_columns}")
-            st.stop()
-        embeddings = model.encode(df['questions'].tolist())
-        nn_model = NearestNeighbors(n_neighbors=1, metric='cosine')
-        nn_model.fit(np.array(embeddings))
-        return df, nn_model
+        # KB embeddings are cached per model and backend, so they match the query encoder.
+        store = KnowledgeBaseStore(path, None, encoder_cache_key(MODEL_NAME, ENCODER_BACKEND), EMBEDDING_CACHE_DIR,
+                                   index_backend=VECTOR_INDEX_BACKEND)
     except FileNotFoundError:
         st.error(f"❌ File not found at '{path}'")
         st.stop()
+    except KnowledgeBaseError as e:
+        st.error(f"❌ **Error:** {e}")
+        st.stop()
     except Exception as e:
         st.error(f"❌ Error loading KB: {e}")
         st.stop()
+    store.start_watching(KB_RELOAD_INTERVAL_S)
+    return store
 
-if 'df' not in st.session_state or 'nn_model' not in st.session_state:
-    st.session_state.df, st.session_state.nn_model = load_knowledge_base(KNOWLEDGE_BASE_PATH)
-    st.session_state.knowledge_base_loaded = True
+kb_store = load_knowledge_base(KNOWLEDGE_BASE_PATH)
+st.session_state.knowledge_base_loaded = True
 
 # -------------------------------
-# Helper Functions
+# Model Loading (Background)
 # -------------------------------
-def is_gibberish(text):
-    text = text.strip()
-    if len(text) < 2 or re.fullmatch(r'[^\w\s]+', text) or len(set(text)) < 3:
-        return True
-    words = text.split()
-    if len(words) > 0 and sum(1 for w in words if not w.isalpha()) / len(words) > 0.5:
-        return True
-    return False
-
-def is_greeting(text):
-    greetings = [
-        "hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening",
-        "how are you", "what's up", "sup", "thank you", "thanks", "bye", "goodbye"
-    ]
-    text = text.lower()
-    for greet in greetings:
-        if fuzz.partial_ratio(greet, text) > 80:
-            return greet
-    return None
+# The encoder (ENCODER_BACKEND) loads on a background thread, then the KB store
+# swaps in a snapshot with embeddings and the vector index. Until then answers
+# come from the greeting and fuzzy stages only and are flagged with WARMING_UP_NOTE.
+@st.cache_resource
+def load_semantic_stage():
+    stage = {"encoder": None, "ready": False, "error": None}
+
+    def load():
+        try:
+            model = load_encoder(MODEL_NAME, ENCODER_BACKEND, ENCODER_MODEL_DIR)
+            # Per-query encodes from all sessions go through one micro-batching service.
+            stage["encoder"] = EncoderService(model.encode, ENCODER_MAX_BATCH_SIZE, ENCODER_MAX_WAIT_MS,
+                                              ENCODER_CACHE_SIZE)
+            kb_store.set_encoder(model.encode)
+            stage["ready"] = True
+            METRICS.mark_startup("semantic_ready", time.perf_counter() - RUN_STARTED)
+        except Exception as e:
+            # Keep answering from the fuzzy stage; the sidebar shows why.
+            stage["error"] = e
+
+    threading.Thread(target=load, name="semantic-stage", daemon=True).start()
+    return stage
+
+semantic = load_semantic_stage()
 
+# -------------------------------
+# Helper Functions
+# -------------------------------
 def get_greeting_response(greet):
     responses = {
         "hello": "Hello! 👋 How can I help you today?",
@@ -323,46 +138,173 @@ def get_greeting_response(greet):
     }
     return responses.get(greet, "Hello! How can I help you?")
 
-def get_bot_response(user_query, df, nn_model, model):
-    if is_gibberish(user_query):
+def session_kb():
+    # Sessions hold only a KB version number; a reloaded KB is adopted between
+    # messages, so every answer is computed against exactly one snapshot.
+    if st.session_state.kb_version != kb_store.version and st.session_state.pending_response is None:
+        st.session_state.kb_version = kb_store.version
+    return kb_store.snapshot(st.session_state.kb_version)
+
+def did_you_mean(match, kb):
+    if not match.candidates:
+        return ""
+    questions = "".join(f"<br>• {html.escape(kb.knowledge_base.question(c.row))}" for c in match.candidates)
+    return f"<br><br>Did you mean:{questions}"
+
+def get_bot_response(user_query, kb, model, category=None):
+    # model is None (or kb lexical-only) while the semantic stage is loading.
+    encode = model.encode if model is not None else None
+    match = match_query(user_query, kb, encode, top_k=SUGGESTION_COUNT, category=category)
+    if match.stage == GIBBERISH:
         return "I'm sorry, I couldn't understand that. Could you please rephrase your question?"
+    if match.stage == GREETING:
+        return get_greeting_response(match.greeting)
+    note = WARMING_UP_NOTE if match.lexical_only else ""
+    if not match.answered:
+        return "I'm sorry, I couldn't understand that. Could you please rephrase your question?" + did_you_mean(match, kb) + note
+    with METRICS.timed("answer"):
+        return kb.answer(match.row) + note
+
+def bubble_html(role, content, reveal=""):
+    if role == "user":
+        return f"""<div class="user-row"><div class="chat-bubble user-bubble">{content}</div><div class="avatar">🧑‍💻</div></div>"""
+    return f"""<div class="bot-row"{reveal}><div class="avatar">🤖</div><div class="chat-bubble bot-bubble">{content}</div></div>"""
+
+def typing_html(delay=0):
+    cosmetic = f' cosmetic" style="--delay: {delay}s;' if delay else ""
+    return f"""<div class="typing-indicator{cosmetic}"><div class="avatar">🤖</div><div class="typing-dots"><span></span><span></span><span></span></div></div>"""
+
+def message_html(msg):
+    # Built once and kept on the message; a rerun only re-joins the visible window.
+    if "html" not in msg:
+        msg["html"] = bubble_html(msg["role"], msg["content"])
+    return msg["html"]
 
-    greet = is_greeting(user_query)
-    if greet:
-        return get_greeting_response(greet)
+def render_chat(messages):
+    if len(messages) > st.session_state.history_window and st.button("Load earlier messages", key="load_earlier"):
+        st.session_state.history_window += CHAT_PAGE_SIZE
+    parts = []
+    for msg in messages[-st.session_state.history_window:]:
+        # A fresh answer may carry a cosmetic delay, played once by the browser.
+        delay = msg.pop("delay", 0)
+        if delay:
+            reveal = f' style="animation: revealAfterDelay 0.3s ease-out {delay}s both;"'
+            parts += [typing_html(delay), bubble_html(msg["role"], msg["content"], reveal)]
+        else:
+            parts.append(message_html(msg))
+    # One markdown element for the whole window instead of one per message.
+    st.markdown(f'<div class="chat-history">{"".join(parts)}</div>', unsafe_allow_html=True)
 
-    questions = df['questions'].tolist()
-    best_match, score = process.extractOne(user_query, questions, scorer=fuzz.token_sort_ratio)
+def show_typing(delay=0):
+    st.markdown(typing_html(delay), unsafe_allow_html=True)
 
-    if score > 70:
-        idx = questions.index(best_match)
-        return df.iloc[idx]['answers']
+def add_message(message):
+    messages = st.session_state.messages
+    messages.append(message)
+    del messages[:-MAX_HISTORY_MESSAGES]
+
+# -------------------------------
+# Background Response Worker
+# -------------------------------
+# Retrieval runs on a shared thread pool; the script run only renders the typing
+# indicator and a small fragment polls the future, so no script thread blocks.
+@st.cache_resource
+def get_response_executor():
+    return ThreadPoolExecutor(max_workers=RESPONSE_WORKERS, thread_name_prefix="bot-response")
+
+@st.fragment(run_every=RESPONSE_POLL_INTERVAL_S)
+def await_bot_response():
+    future = st.session_state.pending_response
+    if future is None or not future.done():
+        return
+    st.session_state.pending_response = None
+    message = {"role": "bot", "content": future.result()}
+    if MIN_TYPING_DELAY_S > 0:
+        message["delay"] = MIN_TYPING_DELAY_S
+    add_message(message)
+    st.session_state.feedback_request = True
+    st.session_state.show_typing = False
+    # The answer changes both the chat pane and the feedback bar: rerun the app.
+    st.rerun()
+
+def start_response():
+    last_user_msg = next((msg for msg in reversed(st.session_state.messages) if msg["role"] == "user"), None)
+    department = st.session_state.get("department", ALL_DEPARTMENTS)
+    category = last_user_msg.get("category") or (None if department == ALL_DEPARTMENTS else department)
+    st.session_state.pending_response = get_response_executor().submit(
+        timed_bot_response, last_user_msg["content"], session_kb(), semantic["encoder"], category=category)
+
+@st.fragment(run_every=CHAT_END_DELAY_S)
+def close_chat_after_delay():
+    if time.time() - st.session_state.chat_ended_at < CHAT_END_DELAY_S:
+        return
+    for key in ['messages', 'feedback_request', 'show_typing', 'chat_started', 'show_quick_replies', 'pending_response',
+                'history_window']:
+        st.session_state[key] = defaults[key]
+    st.session_state.chat_ended = False
+    st.rerun()
 
-    query_embed = model.encode([user_query])
-    distances, indices = nn_model.kneighbors(query_embed)
-    best_idx = indices[0][0]
+# -------------------------------
+# Query Cache
+# -------------------------------
+@st.cache_resource
+def load_query_cache():
+    cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_S)
 
-    if distances[0][0] > 0.45:
-        return "I'm sorry, I couldn't understand that. Could you please rephrase your question?"
+    # Quick-reply answers are computed once per KB version, at load and on every
+    # reload, so pressing one never reaches the matching pipeline.
+    respond = cached(cache, get_bot_response)
 
-    return df.iloc[best_idx]['answers']
+    def pin_quick_replies(kb):
+        for reply in QUICK_REPLIES:
+            respond.pin(reply, kb, semantic["encoder"], category=QUICK_REPLY_CATEGORIES.get(reply))
 
-def render_chat(messages):
-    for msg in messages:
-        if msg["role"] == "user":
-            st.markdown(f"""<div class="user-row"><div class="chat-bubble user-bubble">{msg['content']}</div><div class="avatar">🧑‍💻</div></div>""", unsafe_allow_html=True)
-        else:
-            st.markdown(f"""<div class="bot-row"><div class="avatar">🤖</div><div class="chat-bubble bot-bubble">{msg['content']}</div></div>""", unsafe_allow_html=True)
+    kb_store.subscribe(pin_quick_replies)
+    return cache
 
-def show_typing():
-    st.markdown("""<div class="typing-indicator"><div class="avatar">🤖</div><div class="typing-dots"><span></span><span></span><span></span></div></div>""", unsafe_allow_html=True)
+query_cache = load_query_cache()
+cached_bot_response = cached(query_cache, get_bot_response)
+
+def timed_bot_response(*args, **kwargs):
+    # What the session waits for, cache hits included; feeds the sidebar p50/p95.
+    start = time.perf_counter()
+    try:
+        return cached_bot_response(*args, **kwargs)
+    finally:
+        METRICS.observe_response(time.perf_counter() - start)
+
+# -------------------------------
+# Metrics Exporter
+# -------------------------------
+@st.cache_resource
+def load_metrics_exporter():
+    return start_metrics_server(METRICS_PORT, METRICS_HOST) if METRICS_PORT else None
+
+load_metrics_exporter()
+
+def format_latency(seconds):
+    if seconds is None:
+        return "–"
+    return f"{seconds * 1e3:.1f} ms" if seconds < 1 else f"{seconds:.2f} s"
 
 # -------------------------------
 # Sidebar Configuration
 # -------------------------------
+@st.fragment(key="sidebar_stats", run_every=SIDEBAR_STATS_INTERVAL_S)
+def sidebar_stats():
+    p50, p95 = METRICS.response_percentiles()
+    st.caption(f"Response time (last {METRICS.window_s / 60:g} min): p50 {format_latency(p50)} · p95 {format_latency(p95)}")
+    if semantic["error"] is not None:
+        st.warning(f"Smart search is unavailable, answering close matches only: {semantic['error']}")
+    elif not semantic["ready"]:
+        st.caption("⏳ Smart search is starting up; answering close matches only.")
+
 with st.sidebar:
     st.markdown('<div class="sidebar-title">HCIL</div>', unsafe_allow_html=True)
+    st.selectbox("Department", [ALL_DEPARTMENTS, *kb_store.current.knowledge_base.category_names], key="department",
+                 help="Search only this part of the knowledge base.")
     st.info("Say 'bye', 'quit', or 'end' to close the chat.")
+    sidebar_stats()
 
 # -------------------------------
 # Session State Initialization
@@ -372,10 +314,14 @@ defaults = {
     'messages': [],
     'chat_ended': False,
     'feedback_request': False,
-    'quick_replies': ["Reset password", "VPN issues", "Software install"],
+    'quick_replies': QUICK_REPLIES,
     'show_typing': False,
     'chat_started': False,
-    'show_quick_replies': False
+    'show_quick_replies': False,
+    'pending_response': None,
+    'kb_version': None,
+    'chat_ended_at': 0.0,
+    'history_window': CHAT_WINDOW_MESSAGES
 }
 for key, val in defaults.items():
     if key not in st.session_state:
@@ -385,6 +331,91 @@ st.markdown("<h1 class='elegant-heading'>🤖 HCIL IT Helpdesk Chatbot</h1>", un
 st.markdown('<div class="transparent-spacer1"></div>', unsafe_allow_html=True)
 
 
+# -------------------------------
+# Chat Actions
+# -------------------------------
+# Buttons act in on_click callbacks that name the fragments their change touches,
+# so a click reruns only those fragments; ending the chat reruns the whole app.
+def send_quick_reply(reply):
+    add_message({"role": "user", "content": reply, "category": QUICK_REPLY_CATEGORIES.get(reply)})
+    st.session_state.show_typing = True
+    st.session_state.show_quick_replies = False
+    start_response()
+    st.rerun(["chat_pane", "quick_reply_bar", "feedback_bar", "sidebar_stats"])
+
+def give_feedback(response):
+    add_message({"role": "bot", "content": response})
+    st.session_state.feedback_request = False
+    st.rerun(["chat_pane", "feedback_bar"])
+
+def send_message():
+    user_input = st.session_state.input_bar
+    if not user_input.strip():
+        return
+    add_message({"role": "user", "content": user_input})
+    if user_input.lower().strip() in ["bye", "quit", "end"]:
+        add_message({"role": "bot", "content": "Thank you for chatting, &nbsp;<b><span style='font-size:1.0em;color:#ffff;'>Mata Ne!</span></b>&nbsp;(see you later)👋"})
+        st.session_state.chat_ended = True
+        st.session_state.chat_ended_at = time.time()
+        st.session_state.feedback_request = False
+        st.session_state.show_typing = False
+        st.session_state.show_quick_replies = False
+        st.rerun()
+    st.session_state.show_typing = True
+    st.session_state.show_quick_replies = False
+    start_response()
+    st.rerun(["chat_pane", "quick_reply_bar", "feedback_bar", "input_form", "sidebar_stats"])
+
+# -------------------------------
+# Chat Fragments
+# -------------------------------
+@st.fragment(key="chat_pane")
+def chat_pane():
+    render_chat(st.session_state.messages)
+
+    if st.session_state.chat_ended:
+        close_chat_after_delay()
+
+    if st.session_state.show_typing:
+        show_typing()
+        await_bot_response()
+
+@st.fragment(key="quick_reply_bar")
+def quick_reply_bar():
+    if not st.session_state.show_quick_replies:
+        return
+    # 3. WRAP a container around the Quick Reply buttons
+    st.markdown('<div class="quick-reply-buttons" style="margin-bottom:3rem;">', unsafe_allow_html=True)
+    for reply in st.session_state.quick_replies:
+        st.button(reply, key=f"quick_{reply}", on_click=send_quick_reply, args=(reply,))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment(key="feedback_bar")
+def feedback_bar():
+    if st.session_state.feedback_request:
+        # 3. WRAP a container around the Feedback buttons
+        st.markdown('<div class="feedback-buttons">', unsafe_allow_html=True)
+        st.markdown("#### Was this helpful?")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.button("👍", use_container_width=True, on_click=give_feedback,
+                    args=("Great! Let me know if there is something else that I can help you with.",))
+        col2.button("👎", use_container_width=True, on_click=give_feedback,
+                    args=("I apologize. Could you please rephrase your question?",))
+        col3.button("🤔", use_container_width=True, on_click=give_feedback, args=("I'm trying my best! 😅",))
+        col4.button("❤️", use_container_width=True, on_click=give_feedback, args=("Thank you for your feedback! 😊",))
+        st.markdown('</div>', unsafe_allow_html=True)
+    elif not st.session_state.show_quick_replies:
+        st.markdown('<div class="transparent-spacer2"></div>', unsafe_allow_html=True)
+
+@st.fragment(key="input_form")
+def input_form():
+    with st.form("chat_input_form", clear_on_submit=True):
+        col1, col2 = st.columns([8, 1])
+        with col1:
+            st.text_input("user_input", placeholder="Type here...", key="input_bar", label_visibility="collapsed")
+        with col2:
+            st.form_submit_button("Send", on_click=send_message)
+
 # -------------------------------
 # Chat App Flow
 # -------------------------------
@@ -409,39 +440,8 @@ if not st.session_state.chat_started:
 
 else:
     if st.session_state.knowledge_base_loaded:
-        render_chat(st.session_state.messages)
-
-        if st.session_state.chat_ended:
-            time.sleep(2)
-            for key in ['messages', 'feedback_request', 'show_typing', 'chat_started', 'show_quick_replies']:
-                st.session_state[key] = defaults[key]
-            st.session_state.chat_ended = False
-            st.rerun()
-
-        if st.session_state.show_typing:
-            show_typing()
-
-        if st.session_state.show_quick_replies:
-            # 3. WRAP a container around the Quick Reply buttons
-            st.markdown('<div class="quick-reply-buttons" style="margin-bottom:3rem;">', unsafe_allow_html=True)
-            for reply in st.session_state.quick_replies:
-                if st.button(reply, key=f"quick_{reply}"):
-                    st.session_state.messages.append({"role": "user", "content": reply})
-                    st.session_state.show_typing = True
-                    st.session_state.show_quick_replies = False
-                    st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
-
-
-        if st.session_state.show_typing:
-            time.sleep(1.2)
-            last_user_msg = next((msg["content"] for msg in reversed(st.session_state.messages) if msg["role"] == "user"), None)
-            if last_user_msg:
-                response = get_bot_response(last_user_msg, st.session_state.df, st.session_state.nn_model, model)
-                st.session_state.messages.append({"role": "bot", "content": response})
-                st.session_state.feedback_request = True
-                st.session_state.show_typing = False
-                st.rerun()
+        chat_pane()
+        quick_reply_bar()
     else:
         st.info("Trying to load the knowledge base...")
 
@@ -449,48 +449,8 @@ else:
 # Input Bar + Feedback
 # -------------------------------
 if st.session_state.chat_started and not st.session_state.chat_ended:
-    if st.session_state.feedback_request:
-        # 3. WRAP a container around the Feedback buttons
-        st.markdown('<div class="feedback-buttons">', unsafe_allow_html=True)
-        st.markdown("#### Was this helpful?")
-        col1, col2, col3, col4 = st.columns(4)
-        if col1.button("👍", use_container_width=True): 
-            st.session_state.messages.append({"role": "bot", "content": "Great! Let me know if there is something else that I can help you with."});
-            st.session_state.feedback_request = False;
-            st.rerun()
-        if col2.button("👎", use_container_width=True): 
-            st.session_state.messages.append({"role": "bot", "content": "I apologize. Could you please rephrase your question?"}); 
-            st.session_state.feedback_request = False; 
-            st.rerun()
-        if col3.button("🤔", use_container_width=True): 
-            st.session_state.messages.append({"role": "bot", "content": "I'm trying my best! 😅"}); 
-            st.session_state.feedback_request = False; 
-            st.rerun()
-        if col4.button("❤️", use_container_width=True): 
-            st.session_state.messages.append({"role": "bot", "content": "Thank you for your feedback! 😊"}); 
-            st.session_state.feedback_request = False; 
-            st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+    feedback_bar()
+    input_form()
 
-    if st.session_state.feedback_request == False and st.session_state.show_quick_replies == False:
-        st.markdown('<div class="transparent-spacer2"></div>', unsafe_allow_html=True)
-    
-    with st.form("chat_input_form", clear_on_submit=True):
-        col1, col2 = st.columns([8, 1])
-        with col1:
-            user_input = st.text_input("user_input", placeholder="Type here...", key="input_bar", label_visibility="collapsed")
-        with col2:
-            send_clicked = st.form_submit_button("Send")
-        
-        if send_clicked and user_input.strip():
-            user_input_clean = user_input.lower().strip()
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            if user_input_clean in ["bye", "quit", "end"]:
-                st.session_state.messages.append({"role": "bot", "content": "Thank you for chatting, &nbsp;<b><span style='font-size:1.0em;color:#ffff;'>Mata Ne!</span></b>&nbsp;(see you later)👋"})
-                st.session_state.chat_ended = True
-                st.session_state.feedback_request = False
-                st.session_state.show_typing = False
-            else:
-                st.session_state.show_typing = True
-                st.session_state.show_quick_replies = False
-            st.rerun()
+# The first run to get here has drawn a usable page.
+METRICS.mark_startup("first_interaction", time.perf_counter() - RUN_STARTED)
@@ -1,12 +1,13 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.neighbors import NearestNeighbors
 import time
-import re
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
+RUN_STARTED = time.perf_counter()  # start-up milestones are timed from the first run's start
+import streamlit as st
+import html
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from engine import (GIBBERISH, GREETING, METRICS, EncoderService, KnowledgeBaseError, KnowledgeBaseStore,
+                    QueryCache, cached, encoder_cache_key, load_encoder, match_query, publish_stylesheet,
+                    start_metrics_server)
 import random
 from datetime import datetime
 
@@ -23,585 +24,106 @@ st.set_page_config(
 
 # --- Configuration for Pre-loaded Knowledge Base ---
 KNOWLEDGE_BASE_PATH = 'dataset.xlsx'
-
-# Advanced CSS with Elite-Level UI Features
-st.markdown("""
-<style>
-/* Import Google Fonts */
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&family=JetBrains+Mono:wght@400;600&display=swap');
-
-/* CSS Variables for Theme */
-:root {
-    /* Primary gradient: bright → deep red */
-    --primary-gradient: linear-gradient(135deg, #e53935 0%, #b71c1c 100%);
-    
-    /* Secondary gradient: soft coral → crimson */
-    --secondary-gradient: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
-    
-    /* Subtle red-tinted glassmorphism */
-    --glass-bg: rgba(229, 57, 53, 0.06);     /* faint red overlay */
-    --glass-border: rgba(229, 57, 53, 0.25); /* stronger red border tint */
-    
-    /* Red neon glow */
-    --neon-glow: 0 0 20px rgba(229, 57, 53, 0.5);
-    
-    /* Text colors on black */
-    --text-primary: #ffffff;                /* white for main text */
-    --text-secondary: rgba(255, 255, 255, 0.8); /* softer gray-white */
-}
-
-/* --- UNIFIED BACKGROUND AND GLOBAL STYLES --- */
-body {
-    font-family: 'Inter', sans-serif !important;
-    color: var(--text-primary) !important;
-}
-
-/* FINAL VERSION: With Accessibility Check */
-@media (prefers-reduced-motion: no-preference) {
-    [data-testid="stAppViewContainer"] {
-        background-image:
-            /* Particle layers */
-            radial-gradient(circle at 20% 30%, rgba(229, 57, 53, 0.35) 0%, transparent 6%),
-            radial-gradient(circle at 60% 70%, rgba(191, 18, 18, 0.35) 0%, transparent 7%),
-            radial-gradient(circle at 80% 20%, rgba(239, 68, 68, 0.35) 0%, transparent 5%),
-            radial-gradient(circle at 30% 80%, rgba(244, 63, 94, 0.28) 0%, transparent 6%),
-            radial-gradient(circle at 75% 40%, rgba(220, 38, 38, 0.28) 0%, transparent 7%),
-            /* Base background layer */
-            #000000;
-        
-        background-size: 160% 160%;
-        animation: floatParticles 20s ease-in-out infinite;
-    }
-
-    @keyframes floatParticles {
-      0%, 100% { background-position: 0% 50%; }
-      50%      { background-position: 100% 50%; }
-    }
-
-    /* You can also wrap other animations here */
-    @keyframes mainFadeIn {
-        from { opacity: 0; transform: translateY(30px) scale(0.95); }
-        to   { opacity: 1; transform: translateY(0)    scale(1);    }
-    }
-}
-
-
-.stApp {
-    background: #000000 !important;
-}
-
-
-/* --- MAIN CONTAINER AND OTHER STYLES --- */
-.main {
-    background: linear-gradient(135deg, rgba(255,255,255,0.03) 0%, rgba(255,255,255,0.01) 100%) !important;
-    backdrop-filter: blur(20px) saturate(200%);
-    -webkit-backdrop-filter: blur(20px) saturate(200%);
-    border: 1px solid var(--glass-border);
-    border-radius: 30px !important;
-    padding: 2.5rem !important;
-    max-width: 800px !important;
-    margin: 2rem auto;
-    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3),
-        inset 0 1px 0 rgba(255, 255, 255, 0.1),
-        0 0 100px rgba(229, 57, 53, 0.12);
-    position: relative;
-    z-index: 1;
-    animation: mainFadeIn 1s ease-out;
-}
-
-@keyframes mainFadeIn {
-    from { opacity: 0; transform: translateY(30px) scale(0.95); }
-    to   { opacity: 1; transform: translateY(0)    scale(1);    }
-}
-
-/* Sidebar Styling – Black with Red Accent */
-.stSidebar > div:first-child {
-    background: linear-gradient(180deg, rgba(20, 20, 20, 0.95) 0%, rgba(10, 10, 10, 0.95) 100%) !important;
-    backdrop-filter: blur(10px);
-    
-    /* changed to red-accented border */
-    border-right: 1px solid rgba(229, 57, 53, 0.6);
-    
-    /* subtle red glow instead of plain black shadow */
-    box-shadow: 
-        5px 0 20px rgba(0, 0, 0, 0.5),
-        0 0 15px rgba(229, 57, 53, 0.25);
-}
-
-
-/* Elite Title with Neon Effect – Red + Fixed Top */
-.sidebar-title {
-    position: sticky;             /* stick to its container while scrolling */
-    top: 0 !important;                       /* pin to top of sidebar */
-    z-index: 5;                  /* stay above sidebar content */
-    margin-bottom: 1rem; 
-    padding-bottom: 0.5rem;
-    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-    font-size: 4rem;
-    font-weight: 900;
-    text-align: center;
-    margin: 0.7rem 0;
-    
-    /* red animated gradient */
-    background: linear-gradient(45deg, #b71c1c, #e53935, #ef4444, #f87171);
-    background-size: 300% 300%;
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-
-    animation: gradientShift 3s ease infinite;
-    filter: drop-shadow(0 0 30px rgba(229, 57, 53, 0.5));
-    letter-spacing: 0.1em;
-    text-transform: uppercase;
-
-    padding: 0.5rem 0;            /* small buffer so it doesn’t overlap */
-    background-color: rgba(0, 0, 0, 0.85); /* subtle black bg so text stays readable */
-}
-
-/* Main Title Enhancement – Red Gradient + Glow */
-.elegant-heading {
-    font-size: 3.5rem !important;
-    font-weight: 800;
-    text-align: center;
-    margin: 2rem 0 3rem 0 !important;
-
-    /* red gradient text */
-    background: linear-gradient(135deg, #b71c1c 0%, #e53935 50%, #f87171 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-
-    position: relative;
-    animation: titlePulse 2s ease-in-out infinite;
-    letter-spacing: -0.02em;
-}
-
-@keyframes titlePulse {
-    0%, 100% { 
-        filter: brightness(1) drop-shadow(0 0 20px rgba(229, 57, 53, 0.5));  /* soft red glow */
-    }
-    50% { 
-        filter: brightness(1.2) drop-shadow(0 0 40px rgba(229, 57, 53, 0.8)); /* stronger red glow */
-    }
-}
-
-
-/* Start Chat Button - Premium Design (Red Theme) */
-.start-chat-btn {
-    background: var(--primary-gradient) !important;  /* uses red gradient from :root */
-    color: white !important;
-    border-radius: 60px !important;
-    padding: 1.2rem 3.5rem !important;
-    font-size: 1.2rem !important;
-    font-weight: 600 !important;
-    border: none !important;
-    position: relative;
-    overflow: hidden;
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-    text-transform: uppercase;
-    letter-spacing: 0.1em;
-
-    /* swapped purple shadow → red glow */
-    box-shadow: 
-        0 10px 30px rgba(229, 57, 53, 0.4),
-        inset 0 1px 0 rgba(255, 255, 255, 0.2);
-}
-
-.start-chat-btn::before {
-    content: '';
-    position: absolute;
-    top: 50%;
-    left: 50%;
-    width: 0;
-    height: 0;
-    border-radius: 50%;
-    background: rgba(255, 255, 255, 0.3);
-    transform: translate(-50%, -50%);
-    transition: width 0.6s, height 0.6s;
-}
-
-.start-chat-btn:hover {
-    transform: translateY(-3px) scale(1.05) !important;
-
-    /* hover glow → deeper red */
-    box-shadow: 
-        0 20px 40px rgba(229, 57, 53, 0.6),
-        inset 0 1px 0 rgba(255, 255, 255, 0.3);
-}
-
-.start-chat-btn:hover::before {
-    width: 300px;
-    height: 300px;
-}
-
-
-/* Chat Bubbles - Glass Design */
-.chat-bubble {
-    padding: 1.2rem 1.8rem;
-    border-radius: 24px;
-    margin-bottom: 1.2rem;
-    max-width: 75%;
-    position: relative;
-    font-size: 1.05rem;
-    line-height: 1.6;
-    animation: messageSlide 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-    transition: transform 0.2s ease;
-}
-
-@keyframes messageSlide {
-    from {
-        opacity: 0;
-        transform: translateY(20px) scale(0.95);
-    }
-    to {
-        opacity: 1;
-        transform: translateY(0) scale(1);
-    }
-}
-
-/* USER messages – Red gradient */
-.user-bubble {
-    background: linear-gradient(135deg, rgba(229, 57, 53, 0.9) 0%, rgba(183, 28, 28, 0.9) 100%);
-    color: white;
-    margin-left: auto;
-
-    /* red glow */
-    box-shadow: 
-        0 8px 24px rgba(229, 57, 53, 0.35),
-        inset 0 1px 0 rgba(255, 255, 255, 0.2);
-
-    border: 1px solid rgba(255, 255, 255, 0.1);
-    backdrop-filter: blur(10px);
-}
-
-/* BOT messages – frosted glass */
-.bot-bubble {
-    background: linear-gradient(135deg, rgba(255, 255, 255, 0.08) 0%, rgba(255, 255, 255, 0.05) 100%);
-    color: var(--text-primary);
-    border: 1px solid rgba(255, 255, 255, 0.15);
-    backdrop-filter: blur(20px);
-
-    /* subtle shadow to stand out from black bg */
-    box-shadow: 
-        0 8px 24px rgba(0, 0, 0, 0.25),
-        inset 0 1px 0 rgba(255, 255, 255, 0.1);
-}
-
-/* Hover effect – slight nudge */
-.chat-bubble:hover {
-    transform: translateX(2px);
-}
-
-/* Avatar Design */
-.avatar {
-    width: 45px;
-    height: 45px;
-    border-radius: 50%;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    font-size: 1.5rem;
-    margin: 0 12px;
-    position: relative;
-    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
-}
-
-/* User avatar – matches primary red gradient */
-.user-avatar {
-    background: var(--primary-gradient);
-    border: 2px solid rgba(255, 255, 255, 0.2);
-    animation: avatarPulse 2s ease-in-out infinite;
-}
-
-/* Bot avatar – deep red gradient */
-.bot-avatar {
-    background: linear-gradient(135deg, #e53935 0%, #b71c1c 100%);
-    border: 2px solid rgba(255, 255, 255, 0.2);
-    animation: avatarRotate 3s linear infinite;
-}
-
-/* User avatar pulse – red glow instead of blue */
-@keyframes avatarPulse {
-    0%, 100% { box-shadow: 0 0 0 0 rgba(229, 57, 53, 0.4); }
-    50%      { box-shadow: 0 0 0 10px rgba(229, 57, 53, 0); }
-}
-
-/* Bot avatar spin */
-@keyframes avatarRotate {
-    from { transform: rotate(0deg); }
-    to   { transform: rotate(360deg); }
-}
-
-/* Quick Reply & Feedback Buttons */
-.quick-reply-buttons .stButton > button,
-.feedback-buttons .stButton > button {
-    background: rgba(255, 255, 255, 0.05) !important;   /* frosted glass */
-    color: var(--text-primary) !important;              /* white text */
-    border: 1px solid rgba(255, 255, 255, 0.2) !important;
-    border-radius: 50px !important;
-    padding: 0.6rem 1.5rem !important;
-    margin: 0.3rem !important;
-    font-weight: 500 !important;
-    backdrop-filter: blur(10px);
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-    position: relative;
-    overflow: hidden;
-}
-
-/* Ripple glow effect from red gradient */
-.quick-reply-buttons .stButton > button::before,
-.feedback-buttons .stButton > button::before {
-    content: '';
-    position: absolute;
-    top: 50%; left: 50%;
-    width: 0; height: 0;
-    background: var(--primary-gradient);    /* red gradient ripple */
-    border-radius: 50%;
-    transform: translate(-50%, -50%);
-    transition: width 0.5s, height 0.5s;
-    z-index: -1;
-}
-
-/* Hover: red glow + stronger red border */
-.quick-reply-buttons .stButton > button:hover,
-.feedback-buttons .stButton > button:hover {
-    transform: translateY(-2px) scale(1.05) !important;
-    box-shadow: 0 8px 20px rgba(229, 57, 53, 0.4) !important;   /* red aura */
-    border-color: rgba(229, 57, 53, 0.5) !important;           /* red border */
-}
-
-.quick-reply-buttons .stButton > button:hover::before,
-.feedback-buttons .stButton > button:hover::before {
-    width: 200px;
-    height: 200px;
-}
-
-
-/* Input Field - Modern Design */
-.stTextInput > div > div > input {
-    background: rgba(255, 255, 255, 0.03) !important;        /* frosted glass input */
-    border: 1px solid rgba(255, 255, 255, 0.1) !important;
-    border-radius: 15px !important;
-    color: var(--text-primary) !important;                   /* white text */
-    padding: 0.8rem 1.2rem !important;
-    font-size: 1rem !important;
-    backdrop-filter: blur(10px);
-    transition: all 0.3s ease !important;
-}
-
-/* Focus state → red border + red glow */
-.stTextInput > div > div > input:focus {
-    border-color: rgba(229, 57, 53, 0.6) !important;         /* red border highlight */
-    box-shadow: 0 0 20px rgba(229, 57, 53, 0.3) !important;  /* red glow */
-    background: rgba(255, 255, 255, 0.05) !important;
-}
-
-/* Send Button */
-.stButton > button[kind="secondary"] {
-    background: var(--primary-gradient) !important;          /* red gradient */
-    color: white !important;
-    border: none !important;
-    border-radius: 12px !important;
-    padding: 0.8rem 1.2rem !important;
-    font-weight: 600 !important;
-    transition: all 0.3s cubic-bezier(0.4,0,0.2,1) !important;
-}
-
-/* Hover → red glow */
-.stButton > button[kind="secondary"]:hover {
-    transform: scale(1.05) !important;
-    box-shadow: 0 10px 25px rgba(229, 57, 53, 0.5) !important;
-}
-
-/* Typing Indicator - Premium Animation */
-.typing-indicator {
-    display: flex;
-    align-items: center;
-    padding: 1rem 0;
-}
-
-.typing-dots {
-    display: flex;
-    gap: 4px;
-    padding: 0 1rem;
-}
-
-.typing-dots span {
-    width: 12px;
-    height: 12px;
-    background: var(--primary-gradient);          /* red gradient */
-    border-radius: 50%;
-    animation: typingPulse 1.4s infinite ease-in-out;
-
-    /* red glow instead of purple */
-    box-shadow: 0 0 10px rgba(229, 57, 53, 0.5);
-}
-
-.typing-dots span:nth-child(1) { animation-delay: 0s; }
-.typing-dots span:nth-child(2) { animation-delay: 0.2s; }
-.typing-dots span:nth-child(3) { animation-delay: 0.4s; }
-
-@keyframes typingPulse {
-    0%, 80%, 100% { 
-        transform: scale(0.8);
-        opacity: 0.5;
-    }
-    40% { 
-        transform: scale(1.2);
-        opacity: 1;
-    }
-}
-
-/* Info Messages */
-.stAlert {
-    background: rgba(255, 255, 255, 0.03) !important;
-    border: 1px solid rgba(255, 255, 255, 0.1) !important;
-    border-radius: 15px !important;
-    backdrop-filter: blur(10px);
-    color: var(--text-primary) !important;
-}
-
-/* Scrollbar Styling */
-::-webkit-scrollbar {
-    width: 8px;
-    height: 8px;
-}
-
-::-webkit-scrollbar-track {
-    background: rgba(255, 255, 255, 0.02);
-    border-radius: 10px;
-}
-
-/* Red scrollbar thumb */
-::-webkit-scrollbar-thumb {
-    background: linear-gradient(135deg, rgba(229, 57, 53, 0.5), rgba(191, 18, 18, 0.5));
-    border-radius: 10px;
-}
-
-::-webkit-scrollbar-thumb:hover {
-    background: linear-gradient(135deg, rgba(229, 57, 53, 0.7), rgba(191, 18, 18, 0.7));
-}
-
-/* Loading Animation */
-.loading-wave {
-    display: inline-block;
-    animation: wave 1.5s ease-in-out infinite;
-}
-
-@keyframes wave {
-    0%, 100% { transform: translateY(0); }
-    50%      { transform: translateY(-10px); }
-}
-
-/* Spacer Divs */
-.transparent-spacer1 { height: 100px; background: transparent; }
-.transparent-spacer2 { height: 50px; background: transparent; }
-
-/* Hide Streamlit Elements */
-footer { visibility: hidden; }
-.stDeployButton { display: none; }
-
-/* Custom Animations */
-@keyframes float {
-    0%, 100% { transform: translateY(0px); }
-    50%      { transform: translateY(-10px); }
-}
-
-/* Glow animation → red glow */
-@keyframes glow {
-    0%, 100% { box-shadow: 0 0 20px rgba(229, 57, 53, 0.5); }
-    50%      { box-shadow: 0 0 40px rgba(229, 57, 53, 0.8); }
-}
-
-/* Responsive Design */
-@media (max-width: 768px) {
-    .elegant-heading { font-size: 2.5rem !important; }
-    .sidebar-title   { font-size: 3rem; }
-    .chat-bubble     { max-width: 85%; }
-    .main            { padding: 1.5rem !important; margin: 1rem !important; }
-}
-
-/* Performance Optimizations */
-* {
-    -webkit-font-smoothing: antialiased;
-    -moz-osx-font-smoothing: grayscale;
-}
-
-/* Status Indicator (system online ping) */
-.status-indicator {
-    display: inline-block;
-    width: 8px;
-    height: 8px;
-    background: #4ade80;  /* green means online */
-    border-radius: 50%;
-    animation: statusPulse 2s ease-in-out infinite;
-    margin-left: 8px;
-}
-
-@keyframes statusPulse {
-    0%, 100% { box-shadow: 0 0 0 0 rgba(74, 222, 128, 0.4); }
-    50%      { box-shadow: 0 0 0 8px rgba(74, 222, 128, 0); }
-}
-</style>
-""", unsafe_allow_html=True)
-
-
-# -------------------------------
-# Model Loading (Cached)
-# -------------------------------
+MODEL_NAME = "all-MiniLM-L6-v2"
+ENCODER_BACKEND = 'torch'  # 'torch' (PyTorch), 'onnx' / 'onnx-int8' (ONNX Runtime, exported with export_encoder.py)
+ENCODER_MODEL_DIR = os.path.join('models', MODEL_NAME)  # the exported model, for the onnx backends
+EMBEDDING_CACHE_DIR = '.kb_cache'
+KB_RELOAD_INTERVAL_S = 5.0
+VECTOR_INDEX_BACKEND = 'brute'  # 'brute' (exact), 'ivf' / 'hnsw' (approximate), 'float16' / 'int8' (quantised), 'sklearn'
+RESPONSE_WORKERS = 4
+RESPONSE_POLL_INTERVAL_S = 0.25
+SIDEBAR_STATS_INTERVAL_S = 10.0
+MIN_TYPING_DELAY_S = 0.0  # cosmetic, applied in the browser only
+CHAT_END_DELAY_S = 2.0
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL_S = 600.0
+ENCODER_MAX_BATCH_SIZE = 32
+ENCODER_MAX_WAIT_MS = 5.0
+ENCODER_CACHE_SIZE = 4096
+SUGGESTION_COUNT = 3  # "did you mean" questions offered when nothing matches
+WARMING_UP_NOTE = "<br><br><i>⏳ Smart search is still warming up, so only close matches to known questions are answered for now.</i>"
+QUICK_REPLIES = ["Reset Password", "VPN Issues", "Software Install", "Hardware Problems"]
+QUICK_REPLY_CATEGORIES = {  # KB category each quick reply is answered from
+    "Reset Password": "Password & Access",
+    "VPN Issues": "Network & Connectivity",
+    "Software Install": "Software & Apps",
+    "Hardware Problems": "Hardware Support",
+}
+ALL_DEPARTMENTS = "All departments"
+CHAT_WINDOW_MESSAGES = 30  # messages rendered; "Load earlier messages" pages back CHAT_PAGE_SIZE more
+CHAT_PAGE_SIZE = 30
+MAX_HISTORY_MESSAGES = 200  # per session; older messages are dropped
+METRICS_PORT = 9108  # Prometheus text exporter (GET /metrics); None disables
+METRICS_HOST = '127.0.0.1'  # local scrapers only; '0.0.0.0' exposes it on every interface
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STYLESHEET_PATH = os.path.join(APP_DIR, 'styles', 'updated_main.css')
+STATIC_DIR = os.path.join(APP_DIR, 'static')  # served at app/static/ (server.enableStaticServing)
+
+# Theme CSS: minified once into a content-hashed file under static/, so a rerun
+# only re-sends this import, not the stylesheet.
 @st.cache_resource
-def load_sentence_transformer():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+def load_stylesheet():
+    return publish_stylesheet(STYLESHEET_PATH, STATIC_DIR)
+
+st.markdown(f'<style>@import url("app/static/{load_stylesheet()}");</style>', unsafe_allow_html=True)
 
-model = load_sentence_transformer()
 
 # --- Pre-load Knowledge Base ---
+# The store is shared by every session and hot-reloads the sheet when it changes;
+# each script run reads the snapshot that is current at that moment. It starts
+# lexical-only (no encoder), so the page renders before the model has loaded.
 @st.cache_resource
 def load_knowledge_base(path):
     try:
-        df = pd.read_excel(path)
-        required_columns = {'questions', 'answers', 'categories', 'tags'}
-        if not required_columns.issubset(df.columns):
-            st.error(f"⚠️ **Error:** Missing required columns: {required_columns}")
-            st.stop()
-        embeddings = model.encode(df['questions'].tolist())
-        nn_model = NearestNeighbors(n_neighbors=1, metric='cosine')
-        nn_model.fit(np.array(embeddings))
-        return df, nn_model
+        # KB embeddings are cached per model and backend, so they match the query encoder.
+        store = KnowledgeBaseStore(path, None, encoder_cache_key(MODEL_NAME, ENCODER_BACKEND), EMBEDDING_CACHE_DIR,
+                                   index_backend=VECTOR_INDEX_BACKEND)
     except FileNotFoundError:
         st.error(f"⚠️ File not found at '{path}'")
         st.stop()
+    except KnowledgeBaseError as e:
+        st.error(f"⚠️ **Error:** {e}")
+        st.stop()
     except Exception as e:
         st.error(f"⚠️ Error loading KB: {e}")
         st.stop()
+    store.start_watching(KB_RELOAD_INTERVAL_S)
+    return store
 
-if 'df' not in st.session_state or 'nn_model' not in st.session_state:
-    st.session_state.df, st.session_state.nn_model = load_knowledge_base(KNOWLEDGE_BASE_PATH)
-    st.session_state.knowledge_base_loaded = True
+kb_store = load_knowledge_base(KNOWLEDGE_BASE_PATH)
+st.session_state.knowledge_base_loaded = True
 
 # -------------------------------
-# Helper Functions
+# Model Loading (Background)
 # -------------------------------
-def is_gibberish(text):
-    text = text.strip()
-    if len(text) < 2 or re.fullmatch(r'[^\w\s]+', text) or len(set(text)) < 3:
-        return True
-    words = text.split()
-    if len(words) > 0 and sum(1 for w in words if not w.isalpha()) / len(words) > 0.5:
-        return True
-    return False
-
-def is_greeting(text):
-    greetings = [
-        "hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening",
-        "how are you", "what's up", "sup", "thank you", "thanks", "bye", "goodbye"
-    ]
-    text = text.lower()
-    for greet in greetings:
-        if fuzz.partial_ratio(greet, text) > 80:
-            return greet
-    return None
+# The encoder (ENCODER_BACKEND) loads on a background thread, then the KB store
+# swaps in a snapshot with embeddings and the vector index. Until then answers
+# come from the greeting and fuzzy stages only and are flagged with WARMING_UP_NOTE.
+@st.cache_resource
+def load_semantic_stage():
+    stage = {"encoder": None, "ready": False, "error": None}
+
+    def load():
+        try:
+            model = load_encoder(MODEL_NAME, ENCODER_BACKEND, ENCODER_MODEL_DIR)
+            # Per-query encodes from all sessions go through one micro-batching service.
+            stage["encoder"] = EncoderService(model.encode, ENCODER_MAX_BATCH_SIZE, ENCODER_MAX_WAIT_MS,
+                                              ENCODER_CACHE_SIZE)
+            kb_store.set_encoder(model.encode)
+            stage["ready"] = True
+            METRICS.mark_startup("semantic_ready", time.perf_counter() - RUN_STARTED)
+        except Exception as e:
+            # Keep answering from the fuzzy stage; the sidebar shows why.
+            stage["error"] = e
+
+    threading.Thread(target=load, name="semantic-stage", daemon=True).start()
+    return stage
+
+semantic = load_semantic_stage()
 
+# -------------------------------
+# Helper Functions
+# -------------------------------
 def get_greeting_response(greet):
     responses = {
         "hello": "Hello! 👋 Welcome to HCIL IT Support. How may I assist you today?",
@@ -621,62 +143,174 @@ def get_greeting_response(greet):
     }
     return responses.get(greet, "Hello! How can I help you?")
 
-def get_bot_response(user_query, df, nn_model, model):
-    if is_gibberish(user_query):
+def session_kb():
+    # Sessions hold only a KB version number; a reloaded KB is adopted between
+    # messages, so every answer is computed against exactly one snapshot.
+    if st.session_state.kb_version != kb_store.version and st.session_state.pending_response is None:
+        st.session_state.kb_version = kb_store.version
+    return kb_store.snapshot(st.session_state.kb_version)
+
+def did_you_mean(match, kb):
+    if not match.candidates:
+        return ""
+    questions = "".join(f"<br>• {html.escape(kb.knowledge_base.question(c.row))}" for c in match.candidates)
+    return f"<br><br>💡 Did you mean:{questions}"
+
+def get_bot_response(user_query, kb, model, category=None):
+    # model is None (or kb lexical-only) while the semantic stage is loading.
+    encode = model.encode if model is not None else None
+    match = match_query(user_query, kb, encode, top_k=SUGGESTION_COUNT, category=category)
+    if match.stage == GIBBERISH:
         return "🤔 I couldn't quite understand that. Could you please rephrase your question?"
+    if match.stage == GREETING:
+        return get_greeting_response(match.greeting)
+    note = WARMING_UP_NOTE if match.lexical_only else ""
+    if not match.answered:
+        return "🤔 I couldn't find a specific answer. Could you provide more details or try rephrasing?" + did_you_mean(match, kb) + note
+    with METRICS.timed("answer"):
+        return kb.answer(match.row) + note
+
+def bubble_html(role, content, reveal=""):
+    if role == "user":
+        return f"""<div class="user-row" style="display: flex; justify-content: flex-end; align-items: flex-end;"><div class="chat-bubble user-bubble">{content}</div><div class="avatar user-avatar">👨‍💻</div></div>"""
+    return f"""<div class="bot-row" style="display: flex; justify-content: flex-start; align-items: flex-end;{reveal}"><div class="avatar bot-avatar">🤖</div><div class="chat-bubble bot-bubble">{content}</div></div>"""
+
+def typing_html(delay=0):
+    cosmetic = f' cosmetic" style="--delay: {delay}s;' if delay else ""
+    return f"""<div class="typing-indicator{cosmetic}"><div class="avatar bot-avatar">🤖</div><div class="typing-dots"><span></span><span></span><span></span></div></div>"""
+
+def message_html(msg):
+    # Built once and kept on the message; a rerun only re-joins the visible window.
+    if "html" not in msg:
+        msg["html"] = bubble_html(msg["role"], msg["content"])
+    return msg["html"]
+
+def render_chat(messages):
+    if len(messages) > st.session_state.history_window and st.button("Load earlier messages", key="load_earlier"):
+        st.session_state.history_window += CHAT_PAGE_SIZE
+    parts = []
+    for msg in messages[-st.session_state.history_window:]:
+        # A fresh answer may carry a cosmetic delay, played once by the browser.
+        delay = msg.pop("delay", 0)
+        if delay:
+            reveal = f' animation: revealAfterDelay 0.3s ease-out {delay}s both;'
+            parts += [typing_html(delay), bubble_html(msg["role"], msg["content"], reveal)]
+        else:
+            parts.append(message_html(msg))
+    # One markdown element for the whole window instead of one per message.
+    st.markdown(f'<div class="chat-history">{"".join(parts)}</div>', unsafe_allow_html=True)
+
+def show_typing(delay=0):
+    st.markdown(typing_html(delay), unsafe_allow_html=True)
 
-    greet = is_greeting(user_query)
-    if greet:
-        return get_greeting_response(greet)
+def add_message(message):
+    messages = st.session_state.messages
+    messages.append(message)
+    del messages[:-MAX_HISTORY_MESSAGES]
 
-    questions = df['questions'].tolist()
-    best_match, score = process.extractOne(user_query, questions, scorer=fuzz.token_sort_ratio)
+# -------------------------------
+# Background Response Worker
+# -------------------------------
+# Retrieval runs on a shared thread pool; the script run only renders the typing
+# indicator and a small fragment polls the future, so no script thread blocks.
+@st.cache_resource
+def get_response_executor():
+    return ThreadPoolExecutor(max_workers=RESPONSE_WORKERS, thread_name_prefix="bot-response")
+
+@st.fragment(run_every=RESPONSE_POLL_INTERVAL_S)
+def await_bot_response():
+    future = st.session_state.pending_response
+    if future is None or not future.done():
+        return
+    st.session_state.pending_response = None
+    message = {"role": "bot", "content": future.result()}
+    if MIN_TYPING_DELAY_S > 0:
+        message["delay"] = MIN_TYPING_DELAY_S
+    add_message(message)
+    st.session_state.feedback_request = True
+    st.session_state.show_typing = False
+    # The answer changes both the chat pane and the feedback bar: rerun the app.
+    st.rerun()
+
+def start_response():
+    last_user_msg = next((msg for msg in reversed(st.session_state.messages) if msg["role"] == "user"), None)
+    department = st.session_state.get("department", ALL_DEPARTMENTS)
+    category = last_user_msg.get("category") or (None if department == ALL_DEPARTMENTS else department)
+    st.session_state.pending_response = get_response_executor().submit(
+        timed_bot_response, last_user_msg["content"], session_kb(), semantic["encoder"], category=category)
+
+@st.fragment(run_every=CHAT_END_DELAY_S)
+def close_chat_after_delay():
+    if time.time() - st.session_state.chat_ended_at < CHAT_END_DELAY_S:
+        return
+    for key in ['messages', 'feedback_request', 'show_typing', 'chat_started', 'show_quick_replies', 'pending_response',
+                'history_window']:
+        st.session_state[key] = defaults[key]
+    st.session_state.chat_ended = False
+    st.rerun()
 
-    if score > 70:
-        idx = questions.index(best_match)
-        return df.iloc[idx]['answers']
+# -------------------------------
+# Query Cache
+# -------------------------------
+@st.cache_resource
+def load_query_cache():
+    cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_S)
 
-    query_embed = model.encode([user_query])
-    distances, indices = nn_model.kneighbors(query_embed)
-    best_idx = indices[0][0]
+    # Quick-reply answers are computed once per KB version, at load and on every
+    # reload, so pressing one never reaches the matching pipeline.
+    respond = cached(cache, get_bot_response)
 
-    if distances[0][0] > 0.45:
-        return "🤔 I couldn't find a specific answer. Could you provide more details or try rephrasing?"
+    def pin_quick_replies(kb):
+        for reply in QUICK_REPLIES:
+            respond.pin(reply, kb, semantic["encoder"], category=QUICK_REPLY_CATEGORIES.get(reply))
 
-    return df.iloc[best_idx]['answers']
+    kb_store.subscribe(pin_quick_replies)
+    return cache
 
-def render_chat(messages):
-    for msg in messages:
-        if msg["role"] == "user":
-            st.markdown(f"""
-            <div class="user-row" style="display: flex; justify-content: flex-end; align-items: flex-end;">
-                <div class="chat-bubble user-bubble">{msg['content']}</div>
-                <div class="avatar user-avatar">👨‍💻</div>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="bot-row" style="display: flex; justify-content: flex-start; align-items: flex-end;">
-                <div class="avatar bot-avatar">🤖</div>
-                <div class="chat-bubble bot-bubble">{msg['content']}</div>
-            </div>
-            """, unsafe_allow_html=True)
-
-def show_typing():
-    st.markdown("""
-    <div class="typing-indicator">
-        <div class="avatar bot-avatar">🤖</div>
-        <div class="typing-dots">
-            <span></span>
-            <span></span>
-            <span></span>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+query_cache = load_query_cache()
+cached_bot_response = cached(query_cache, get_bot_response)
+
+def timed_bot_response(*args, **kwargs):
+    # What the session waits for, cache hits included; feeds the sidebar p50/p95.
+    start = time.perf_counter()
+    try:
+        return cached_bot_response(*args, **kwargs)
+    finally:
+        METRICS.observe_response(time.perf_counter() - start)
+
+# -------------------------------
+# Metrics Exporter
+# -------------------------------
+@st.cache_resource
+def load_metrics_exporter():
+    return start_metrics_server(METRICS_PORT, METRICS_HOST) if METRICS_PORT else None
+
+load_metrics_exporter()
+
+def format_latency(seconds):
+    if seconds is None:
+        return "–"
+    return f"{seconds * 1e3:.1f} ms" if seconds < 1 else f"{seconds:.2f} s"
 
 # -------------------------------
 # Sidebar Configuration
 # -------------------------------
+@st.fragment(key="sidebar_stats", run_every=SIDEBAR_STATS_INTERVAL_S)
+def sidebar_stats():
+    if semantic["error"] is not None:
+        st.warning(f"⚠️ Smart search is unavailable, answering close matches only: {semantic['error']}")
+    elif not semantic["ready"]:
+        st.caption("⏳ Smart search is warming up; answering close matches only.")
+    if 'messages' in st.session_state and len(st.session_state.messages) > 0:
+        msg_count = len([m for m in st.session_state.messages if m['role'] == 'user'])
+        p50, p95 = METRICS.response_percentiles()
+        st.markdown(f"""
+        <div style="background: rgba(102, 126, 234, 0.1); border-radius: 12px; padding: 0.8rem; margin: 1rem 0; border: 1px solid rgba(102, 126, 234, 0.3);">
+            <p style="margin: 0; font-size: 0.9rem;">Messages: {msg_count}</p>
+            <p style="margin: 0; font-size: 0.9rem;">Response Time: p50 {format_latency(p50)} · p95 {format_latency(p95)}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
 with st.sidebar:
     st.markdown('<div class="sidebar-title">HCIL</span></div>', unsafe_allow_html=True)
     
@@ -689,16 +323,11 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     # Quick Stats
-    if 'messages' in st.session_state and len(st.session_state.messages) > 0:
-        msg_count = len([m for m in st.session_state.messages if m['role'] == 'user'])
-        st.markdown(f"""
-        <div style="background: rgba(102, 126, 234, 0.1); border-radius: 12px; padding: 0.8rem; margin: 1rem 0; border: 1px solid rgba(102, 126, 234, 0.3);">
-            <p style="margin: 0; font-size: 0.9rem;">Messages: {msg_count}</p>
-            <p style="margin: 0; font-size: 0.9rem;">Response Time: ~1.2s</p>
-        </div>
-        """, unsafe_allow_html=True)
+    sidebar_stats()
     
     st.markdown("---")
+    st.selectbox("🗂️ Department", [ALL_DEPARTMENTS, *kb_store.current.knowledge_base.category_names],
+                 key="department", help="Search only this part of the knowledge base.")
     st.info("💡**Pro Tip:** Type 'bye' to end the conversation")
 
 # -------------------------------
@@ -709,10 +338,14 @@ defaults = {
     'messages': [],
     'chat_ended': False,
     'feedback_request': False,
-    'quick_replies': ["Reset Password", "VPN Issues", "Software Install", "Hardware Problems"],
+    'quick_replies': QUICK_REPLIES,
     'show_typing': False,
     'chat_started': False,
-    'show_quick_replies': False
+    'show_quick_replies': False,
+    'pending_response': None,
+    'kb_version': None,
+    'chat_ended_at': 0.0,
+    'history_window': CHAT_WINDOW_MESSAGES
 }
 for key, val in defaults.items():
     if key not in st.session_state:
@@ -724,6 +357,134 @@ st.markdown(""" <div style="display: flex; justify-content: center; align-items:
 
 st.markdown('<div class="transparent-spacer1"></div>', unsafe_allow_html=True)
 
+# -------------------------------
+# Chat Actions
+# -------------------------------
+# Buttons act in on_click callbacks that name the fragments their change touches,
+# so a click reruns only those fragments; ending the chat reruns the whole app.
+def send_quick_reply(reply):
+    add_message({"role": "user", "content": reply, "category": QUICK_REPLY_CATEGORIES.get(reply)})
+    st.session_state.show_typing = True
+    st.session_state.show_quick_replies = False
+    start_response()
+    st.rerun(["chat_pane", "quick_reply_bar", "feedback_bar", "sidebar_stats"])
+
+def give_feedback(response):
+    add_message({"role": "bot", "content": response})
+    st.session_state.feedback_request = False
+    st.rerun(["chat_pane", "feedback_bar"])
+
+def send_message():
+    user_input = st.session_state.input_bar
+    if not user_input.strip():
+        return
+    user_input_clean = user_input.lower().strip()
+    add_message({"role": "user", "content": user_input})
+
+    if user_input_clean in ["bye", "quit", "exit", "end"]:
+        farewell_messages = [
+            "Thank you for using HCIL IT Support! <b>Mata ne!</b> 🌟 Have an amazing day!",
+            "It was great helping you! <b>Mata ne!</b> ✨ See you next time!",
+            "Thanks for choosing HCIL! <b>Goodbye!</b> 🚀 Stay awesome!"
+        ]
+        add_message({
+            "role": "bot", 
+            "content": random.choice(farewell_messages)
+        })
+        st.session_state.chat_ended = True
+        st.session_state.chat_ended_at = time.time()
+        st.session_state.feedback_request = False
+        st.session_state.show_typing = False
+        st.session_state.show_quick_replies = False
+        st.rerun()
+    st.session_state.show_typing = True
+    st.session_state.show_quick_replies = False
+    start_response()
+    st.rerun(["chat_pane", "quick_reply_bar", "feedback_bar", "input_form", "sidebar_stats"])
+
+# -------------------------------
+# Chat Fragments
+# -------------------------------
+@st.fragment(key="chat_pane")
+def chat_pane():
+    # Chat History
+    render_chat(st.session_state.messages)
+
+    if st.session_state.chat_ended:
+        close_chat_after_delay()
+
+    # Process typing animation
+    if st.session_state.show_typing:
+        show_typing()
+        await_bot_response()
+
+# Quick Replies with Enhanced Design
+@st.fragment(key="quick_reply_bar")
+def quick_reply_bar():
+    if not st.session_state.show_quick_replies:
+        return
+    st.markdown("""
+    <div style="margin: 1.5rem 0;">
+        <p style="color: rgba(255, 255, 255, 1.0); font-size: 1.0rem; margin-bottom: 0.4rem;">
+            Quick Actions:
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown('<div class="quick-reply-buttons">', unsafe_allow_html=True)
+    cols = st.columns(len(st.session_state.quick_replies))
+    for idx, (col, reply) in enumerate(zip(cols, st.session_state.quick_replies)):
+        with col:
+            st.button(reply, key=f"quick_{idx}", use_container_width=True, on_click=send_quick_reply, args=(reply,))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment(key="feedback_bar")
+def feedback_bar():
+    if not st.session_state.feedback_request:
+        return
+    # Spacer when feedback request is shown
+    st.markdown('<div class="transparent-spacer2"></div>', unsafe_allow_html=True)
+    st.markdown("""
+    <div style="background: linear-gradient(135deg, rgba(102, 126, 234, 0.1), rgba(118, 75, 162, 0.1)); 
+                border-radius: 20px; padding: 0.8rem; margin: 1.0rem 0; 
+                border: 1px solid rgba(229, 57, 53, 0.3);">
+        <p style="color: rgba(255, 255, 255, 0.9); font-size: 1.5rem; margin-bottom: 0rem; text-align: center;">
+            ✨ Was this response helpful?
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown('<div class="feedback-buttons">', unsafe_allow_html=True)
+    col1, col2, col3, col4 = st.columns(4)
+
+    feedback_options = [
+        ("😊 Perfect", "Excellent! I'm here if you need anything else! ✨"),
+        ("🤔 Unclear", "Let me try to explain differently. Could you provide more details? 💭"),
+        ("👎 Not Helpful", "I apologize. Let me connect you with better resources. 🔄"),
+        ("💬 More Help", "Sure! What else would you like to know? 💡")
+    ]
+
+    for col, (btn_text, response) in zip([col1, col2, col3, col4], feedback_options):
+        with col:
+            st.button(btn_text, use_container_width=True, on_click=give_feedback, args=(response,))
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+# Modern Input Form
+@st.fragment(key="input_form")
+def input_form():
+    with st.form("chat_input_form", clear_on_submit=True):
+        col1, col2 = st.columns([6, 1])
+        with col1:
+            st.text_input(
+                "user_input", 
+                placeholder="Type your message here......", 
+                key="input_bar", 
+                label_visibility="collapsed"
+            )
+        with col2:
+            st.form_submit_button("Send ▶️", use_container_width=True, on_click=send_message)
+
 # -------------------------------
 # Chat App Flow
 # -------------------------------
@@ -756,52 +517,8 @@ if not st.session_state.chat_started:
 
 else:
     if st.session_state.knowledge_base_loaded:
-        # Chat History
-        render_chat(st.session_state.messages)
-
-        if st.session_state.chat_ended:
-            time.sleep(2)
-            for key in ['messages', 'feedback_request', 'show_typing', 'chat_started', 'show_quick_replies']:
-                st.session_state[key] = defaults[key]
-            st.session_state.chat_ended = False
-            st.rerun()
-
-        if st.session_state.show_typing:
-            show_typing()
-
-        # Quick Replies with Enhanced Design
-        if st.session_state.show_quick_replies:
-            st.markdown("""
-            <div style="margin: 1.5rem 0;">
-                <p style="color: rgba(255, 255, 255, 1.0); font-size: 1.0rem; margin-bottom: 0.4rem;">
-                    Quick Actions:
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown('<div class="quick-reply-buttons">', unsafe_allow_html=True)
-            cols = st.columns(len(st.session_state.quick_replies))
-            for idx, (col, reply) in enumerate(zip(cols, st.session_state.quick_replies)):
-                with col:
-                    if st.button(reply, key=f"quick_{idx}", use_container_width=True):
-                        # FIX: no longer chop first word
-                        clean_reply = reply  
-                        st.session_state.messages.append({"role": "user", "content": clean_reply})
-                        st.session_state.show_typing = True
-                        st.session_state.show_quick_replies = False
-                        st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Process typing animation
-        if st.session_state.show_typing:
-            time.sleep(1.2)
-            last_user_msg = next((msg["content"] for msg in reversed(st.session_state.messages) if msg["role"] == "user"), None)
-            if last_user_msg:
-                response = get_bot_response(last_user_msg, st.session_state.df, st.session_state.nn_model, model)
-                st.session_state.messages.append({"role": "bot", "content": response})
-                st.session_state.feedback_request = True
-                st.session_state.show_typing = False
-                st.rerun()
+        chat_pane()
+        quick_reply_bar()
     else:
         st.info("🔄 Loading AI Knowledge Base...")
 
@@ -809,82 +526,14 @@ else:
 # Input Bar + Feedback Section
 # -------------------------------
 if st.session_state.chat_started and not st.session_state.chat_ended:
+    feedback_bar()
 
-    # Spacer when feedback request is shown
-    if st.session_state.feedback_request:
-        st.markdown('<div class="transparent-spacer2"></div>', unsafe_allow_html=True)
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, rgba(102, 126, 234, 0.1), rgba(118, 75, 162, 0.1)); 
-                    border-radius: 20px; padding: 0.8rem; margin: 1.0rem 0; 
-                    border: 1px solid rgba(229, 57, 53, 0.3);">
-            <p style="color: rgba(255, 255, 255, 0.9); font-size: 1.5rem; margin-bottom: 0rem; text-align: center;">
-                ✨ Was this response helpful?
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown('<div class="feedback-buttons">', unsafe_allow_html=True)
-        col1, col2, col3, col4 = st.columns(4)
-        
-        feedback_options = [
-            ("😊 Perfect", "Excellent! I'm here if you need anything else! ✨"),
-            ("🤔 Unclear", "Let me try to explain differently. Could you provide more details? 💭"),
-            ("👎 Not Helpful", "I apologize. Let me connect you with better resources. 🔄"),
-            ("💬 More Help", "Sure! What else would you like to know? 💡")
-        ]
-        
-        for col, (btn_text, response) in zip([col1, col2, col3, col4], feedback_options):
-            with col:
-                if st.button(btn_text, use_container_width=True):
-                    st.session_state.messages.append({"role": "bot", "content": response})
-                    st.session_state.feedback_request = False
-                    st.rerun()
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-
-
-    
-    # Modern Input Form
     st.markdown("""
     <div style="margin-top: 2rem; padding-top: 1rem; border-top: 1px solid rgba(255, 255, 255, 0.1); padding-bottom: 2rem;">
     </div>
     """, unsafe_allow_html=True)
 
-    
-    
-    with st.form("chat_input_form", clear_on_submit=True):
-        col1, col2 = st.columns([6, 1])
-        with col1:
-            user_input = st.text_input(
-                "user_input", 
-                placeholder="Type your message here......", 
-                key="input_bar", 
-                label_visibility="collapsed"
-            )
-        with col2:
-            send_clicked = st.form_submit_button("Send ▶️", use_container_width=True)
-        
-        if send_clicked and user_input.strip():
-            user_input_clean = user_input.lower().strip()
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            if user_input_clean in ["bye", "quit", "exit", "end"]:
-                farewell_messages = [
-                    "Thank you for using HCIL IT Support! <b>Mata ne!</b> 🌟 Have an amazing day!",
-                    "It was great helping you! <b>Mata ne!</b> ✨ See you next time!",
-                    "Thanks for choosing HCIL! <b>Goodbye!</b> 🚀 Stay awesome!"
-                ]
-                st.session_state.messages.append({
-                    "role": "bot", 
-                    "content": random.choice(farewell_messages)
-                })
-                st.session_state.chat_ended = True
-                st.session_state.feedback_request = False
-                st.session_state.show_typing = False
-            else:
-                st.session_state.show_typing = True
-                st.session_state.show_quick_replies = False
-            st.rerun()
+    input_form()
 
 # Footer
 st.markdown("""
@@ -894,3 +543,6 @@ st.markdown("""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+# The first run to get here has drawn a usable page.
+METRICS.mark_startup("first_interaction", time.perf_counter() - RUN_STARTED)